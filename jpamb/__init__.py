@@ -34,6 +34,34 @@ def getcase() -> tuple[jvm.AbsMethodID, Input]:
     return parse_methodid(mid), parse_input(i)
 
 
+def getcases() -> tuple[jvm.AbsMethodID, list[Input]]:
+    """Get a method and a batch of inputs from the program arguments.
+
+    The inputs are either given as arguments, read one per line from stdin
+    if the argument is `-`, or read one per line from a file if the argument
+    is `@file`. The program should print one result per input, in order, e.g.:
+
+        methodid, inputs = jpamb.getcases()
+        for input in inputs:
+            print(run(methodid, input))
+
+    This also accepts the single case of `getcase`.
+    """
+    import sys
+
+    mid = sys.argv[1]
+    args = sys.argv[2:]
+
+    if args == ["-"]:
+        lines = sys.stdin.read().splitlines()
+    elif len(args) == 1 and args[0].startswith("@"):
+        lines = Path(args[0][1:]).read_text().splitlines()
+    else:
+        lines = args
+
+    return parse_methodid(mid), [parse_input(i) for i in lines if i.strip()]
+
+
 def printinfo(
     name: str,
     version: str,
@@ -0,0 +1,146 @@
+"""
+jpamb.casedb
+
+This module provides an indexed store of the cases of a suite, with their
+results and tags, in an SQLite database next to the case file. The store
+makes it possible to select cases without parsing every case in the suite.
+
+"""
+
+from pathlib import Path
+from typing import Iterable
+from loguru import logger
+import os
+import sqlite3
+import tempfile
+
+from jpamb import jvm
+
+SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE cases (
+    id INTEGER PRIMARY KEY,
+    method TEXT NOT NULL,
+    class TEXT NOT NULL,
+    input TEXT NOT NULL,
+    result TEXT NOT NULL,
+    line TEXT NOT NULL
+);
+CREATE INDEX cases_method ON cases (method);
+CREATE INDEX cases_class ON cases (class);
+CREATE INDEX cases_result ON cases (result);
+CREATE TABLE tags (
+    method TEXT NOT NULL,
+    tag TEXT NOT NULL,
+    PRIMARY KEY (method, tag)
+);
+CREATE INDEX tags_tag ON tags (tag);
+"""
+
+
+def build(path: Path, cases, tags: dict, stamp: str):
+    """Write the cases and the tags of their methods to a new database at path.
+
+    The stamp identifies the version of the files the database was built
+    from, see `is_current`.
+    """
+    path.parent.mkdir(exist_ok=True, parents=True)
+    # A unique file, as shards and workers may build the database at once
+    with tempfile.NamedTemporaryFile(
+        dir=path.parent, prefix=path.name, suffix=".tmp", delete=False
+    ) as f:
+        tmp = Path(f.name)
+    try:
+        _write(tmp, cases, tags, stamp)
+        os.replace(tmp, path)
+    finally:
+        tmp.unlink(missing_ok=True)
+    logger.debug(f"Wrote case database {path}")
+
+
+def _write(tmp: Path, cases, tags: dict, stamp: str):
+    with sqlite3.connect(tmp) as db:
+        db.executescript(SCHEMA)
+        db.executemany(
+            "INSERT INTO cases (method, class, input, result, line) VALUES (?, ?, ?, ?, ?)",
+            (
+                (
+                    c.methodid.encode(),
+                    c.methodid.classname.encode(),
+                    c.input.encode(),
+                    c.result,
+                    c.encode(),
+                )
+                for c in cases
+            ),
+        )
+        db.executemany(
+            "INSERT INTO tags (method, tag) VALUES (?, ?)",
+            ((m.encode(), t) for m, ts in tags.items() for t in ts),
+        )
+        db.execute("INSERT INTO meta VALUES ('stamp', ?)", (stamp,))
+    db.close()
+
+
+def is_current(path: Path, stamp: str) -> bool:
+    """Check that the database exists and was built from the stamped files"""
+    if not path.exists():
+        return False
+    try:
+        with sqlite3.connect(f"file:{path}?mode=ro", uri=True) as db:
+            row = db.execute("SELECT value FROM meta WHERE key = 'stamp'").fetchone()
+        db.close()
+    except sqlite3.DatabaseError:
+        return False
+    return row is not None and row[0] == stamp
+
+
+def query(
+    path: Path,
+    tags: Iterable[str] = (),
+    results: Iterable[str] = (),
+    classes: Iterable[jvm.ClassName] = (),
+    methods: Iterable[jvm.Absolute[jvm.MethodID]] = (),
+) -> list[str]:
+    """Select the encoded cases that match all the given filters.
+
+    Every filter matches if the case has any of the given values, and an
+    empty filter matches all cases. A case has the tags of its method.
+    """
+    where = []
+    args = []
+
+    def any_of(column, values):
+        values = list(values)
+        if values:
+            where.append(f"{column} IN ({', '.join('?' * len(values))})")
+            args.extend(values)
+
+    tags = list(tags)
+    if tags:
+        where.append(
+            "method IN (SELECT method FROM tags WHERE tag IN "
+            f"({', '.join('?' * len(tags))}))"
+        )
+        args.extend(tags)
+    any_of("result", results)
+    any_of("class", (c.encode() for c in classes))
+    any_of("method", (m.encode() for m in methods))
+
+    sql = "SELECT line FROM cases"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY id"
+
+    with sqlite3.connect(f"file:{path}?mode=ro", uri=True) as db:
+        lines = [line for (line,) in db.execute(sql, args)]
+    db.close()
+    return lines
+
+
+def all_tags(path: Path) -> list[str]:
+    """All the tags in the database"""
+    with sqlite3.connect(f"file:{path}?mode=ro", uri=True) as db:
+        tags = [t for (t,) in db.execute("SELECT DISTINCT tag FROM tags ORDER BY tag")]
+    db.close()
+    return tags
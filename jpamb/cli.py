@@ -5,29 +5,53 @@ import shutil
 import math
 import sys
 import json
-from inspect import getsourcelines, getsourcefile
-from collections import Counter
-import matplotlib.pyplot as plt
-import matplotlib.colors as colors
+import itertools
 
-from jpamb import model, logger, jvm
+from jpamb import model, logger, jvm, timing, shards
 from jpamb.logger import log
 
 import subprocess
 import dataclasses
 from contextlib import contextmanager
-from typing import IO
+from typing import IO, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from jpamb import workqueue
 
 
 class JpambScore:
     score: float
     time: float
     rel_time: float
+    cputime: float | None
+    maxrss: float | None
 
-    def __init__(self, score, time, rel_time):
+    def __init__(self, score, time, rel_time, cputime=None, maxrss=None):
         self.score = score
         self.time = time
         self.rel_time = rel_time
+        self.cputime = cputime
+        self.maxrss = maxrss
+
+    def metric(self, metric: str) -> float | None:
+        match metric:
+            case "time":
+                return self.time
+            case "relative":
+                return self.rel_time
+            case "cputime":
+                return self.cputime
+            case "maxrss":
+                return self.maxrss
+        raise ValueError(f"Unknown metric {metric!r}")
+
+
+METRIC_LABELS = {
+    "time": "Test Time",
+    "relative": "Analyzer Relative Execution Time",
+    "cputime": "Analyzer CPU Time",
+    "maxrss": "Analyzer Peak Memory (KiB)",
+}
 
 
 def re_parser(ctx_, parms_, expr):
@@ -37,7 +61,131 @@ def re_parser(ctx_, parms_, expr):
         return re.compile(expr)
 
 
+def tag_parser(ctx_, parms_, tags):
+    return tuple(t.upper() for t in tags)
+
+
+def shard_parser(ctx_, parms_, shard):
+    if shard:
+        try:
+            return shards.Shard.decode(shard)
+        except ValueError as e:
+            raise click.BadParameter(str(e))
+
+
+def selected_methods(suite, tags, queries, shard=None, balance=None) -> set | None:
+    """The methods selected by the --tag, --result and --shard options, or None if
+    no methods are deselected."""
+    if not tags and not queries and shard is None:
+        return None
+
+    if tags or queries:
+        selected = {case.methodid for case in suite.query(tags=tags, results=queries)}
+        if not selected:
+            raise click.UsageError("No methods match the given --tag and --result")
+    else:
+        selected = {methodid for methodid, _ in suite.case_methods()}
+
+    if shard is not None:
+        weights = shards.runtimes(json.load(balance)) if balance else None
+        selected = set(shard.select(selected, weights))
+        log.info(f"Running on {len(selected)} methods in shard {shard}")
+        if not selected:
+            log.warning(f"The shard {shard} is empty")
+
+    return selected
+
+
+@dataclasses.dataclass(frozen=True)
+class Usage:
+    """The resources used by a finished child process.
+
+    The times are in nanoseconds, to match the wall-clock time, and the
+    peak resident set size is in kilobytes. Note that on Linux the peak
+    includes the memory of the process that forked the child, so it is
+    never lower than the size of jpamb itself.
+    """
+
+    utime: int
+    stime: int
+    maxrss: int
+
+    @property
+    def cputime(self) -> int:
+        return self.utime + self.stime
+
+    @staticmethod
+    def from_rusage(ru) -> "Usage":
+        maxrss = ru.ru_maxrss
+        if sys.platform == "darwin":
+            # macOS reports the peak in bytes rather than kilobytes
+            maxrss //= 1024
+        return Usage(
+            utime=int(ru.ru_utime * 1e9),
+            stime=int(ru.ru_stime * 1e9),
+            maxrss=maxrss,
+        )
+
+
+def wait(cp: subprocess.Popen, timeout=None) -> tuple[int, Usage | None]:
+    """Wait for the process and collect its resource usage.
+
+    Uses `os.wait4` where available, polling like `Popen.wait` does, so that
+    the usage of exactly this child is reported. On other platforms the
+    usage is `None`.
+    """
+    import os
+    import time
+
+    if hasattr(cp, "wait_usage"):
+        # A process started by a `jpamb.forkserver.ForkServer`
+        from types import SimpleNamespace
+
+        returncode, rusage = cp.wait_usage(timeout)
+        return returncode, Usage.from_rusage(SimpleNamespace(**rusage))
+
+    if not hasattr(os, "wait4"):
+        return cp.wait(timeout), None
+
+    end = None if timeout is None else time.monotonic() + timeout
+    delay = 0.0005
+    while True:
+        pid, status, ru = os.wait4(cp.pid, os.WNOHANG)
+        if pid == cp.pid:
+            cp.returncode = os.waitstatus_to_exitcode(status)
+            return cp.returncode, Usage.from_rusage(ru)
+        if end is not None:
+            remaining = end - time.monotonic()
+            if remaining <= 0:
+                raise subprocess.TimeoutExpired(cp.args, timeout)
+            delay = min(delay, remaining)
+        time.sleep(delay)
+        delay = min(delay * 2, 0.05)
+
+
 def run(cmd: list[str], /, timeout=2.0, logout=None, logerr=None, **kwargs):
+    out, time, _ = measure(cmd, timeout=timeout, logout=logout, logerr=logerr, **kwargs)
+    return (out, time)
+
+
+def measure(
+    cmd: list[str],
+    /,
+    timeout=2.0,
+    logout=None,
+    logerr=None,
+    server=None,
+    idle=None,
+    **kwargs,
+):
+    """Like `run`, but also returns the `Usage` of the process.
+
+    If a `jpamb.forkserver.ForkServer` is given as server, the process is
+    forked from it instead. If idle is given, the process also times out
+    when it prints no line for idle seconds. The `TimeoutExpired` carries
+    the output printed before the timeout, and the usage of the process,
+    which is killed if it ignores being terminated.
+    """
     import threading
     from time import monotonic, perf_counter_ns
 
@@ -55,6 +203,7 @@ def run(cmd: list[str], /, timeout=2.0, logout=None, logerr=None, **kwargs):
     stdout = []
     stderr = []
     tout = None
+    printed = [monotonic()]
     try:
         start = monotonic()
         start_ns = perf_counter_ns()
@@ -64,13 +213,16 @@ def run(cmd: list[str], /, timeout=2.0, logout=None, logerr=None, **kwargs):
         else:
             end = None
 
-        cp = subprocess.Popen(
-            cmd,
-            stderr=subprocess.PIPE,
-            stdout=subprocess.PIPE,
-            text=True,
-            **kwargs,
-        )
+        if server:
+            cp = server.popen(cmd, **kwargs)
+        else:
+            cp = subprocess.Popen(
+                cmd,
+                stderr=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                text=True,
+                **kwargs,
+            )
         assert cp and cp.stdout and cp.stderr
 
         def log_lines(cp):
@@ -85,6 +237,7 @@ def run(cmd: list[str], /, timeout=2.0, logout=None, logerr=None, **kwargs):
             with cp.stdout:
                 for line in iter(cp.stdout.readline, ""):
                     stdout.append(line)
+                    printed[0] = monotonic()
                     logout(line[:-1])
 
         terr = threading.Thread(
@@ -100,9 +253,15 @@ def run(cmd: list[str], /, timeout=2.0, logout=None, logerr=None, **kwargs):
         )
         tout.start()
 
+        while idle and tout.is_alive():
+            tout.join(min(idle, 0.05))
+            now = monotonic()
+            if now - printed[0] > idle or (end and now > end):
+                raise subprocess.TimeoutExpired(cmd, idle)
+
         terr.join(end and end - monotonic())
         tout.join(end and end - monotonic())
-        exitcode = cp.wait(end and end - monotonic())
+        exitcode, usage = wait(cp, end and end - monotonic())
         end_ns = perf_counter_ns()
 
         if exitcode != 0:
@@ -113,20 +272,28 @@ def run(cmd: list[str], /, timeout=2.0, logout=None, logerr=None, **kwargs):
                 output="".join(stdout),
             )
 
-        return ("".join(stdout), end_ns - start_ns)
+        return ("".join(stdout), end_ns - start_ns, usage)
     except subprocess.CalledProcessError as e:
         if tout:
             tout.join()
         e.stderr = "".join(stderr)
         e.stdout = "".join(stdout)
         raise e
-    except subprocess.TimeoutExpired:
+    except subprocess.TimeoutExpired as e:
         if cp:
+            # Reap the child, killing it if it ignores the terminate, so it
+            # does not keep running, and its usage is not lost
             cp.terminate()
+            try:
+                _, e.usage = wait(cp, 1.0)
+            except subprocess.TimeoutExpired:
+                cp.kill()
+                _, e.usage = wait(cp)
             if cp.stdout:
                 cp.stdout.close()
             if cp.stderr:
                 cp.stderr.close()
+        e.output = "".join(stdout)
         raise
 
 
@@ -187,6 +354,24 @@ def resolve_cmd(program, with_python=None):
     return program
 
 
+def start_fork_server(program, enabled):
+    """Start a fork server for the program, if enabled, which is stopped again
+    when the command is done."""
+    if not enabled:
+        return None
+
+    from jpamb import forkserver
+
+    if not forkserver.supported():
+        raise click.UsageError("--fork-server is not supported on this platform")
+    if len(program) != 2 or not str(program[1]).endswith(".py"):
+        raise click.UsageError(
+            "--fork-server only works with a python script, e.g., using --with-python"
+        )
+    log.info(f"Starting a fork server for {program[1]}")
+    return click.get_current_context().with_resource(forkserver.ForkServer(program))
+
+
 @click.group()
 @click.option(
     "-v",
@@ -214,10 +399,22 @@ def cli(ctx, workdir: Path, verbose):
 
 
 @cli.command()
+@click.option(
+    "--jobs",
+    "-j",
+    show_default=True,
+    default=1,
+    help="the number of processes to check the classes and methods with.",
+)
+@click.option(
+    "--quick",
+    is_flag=True,
+    help="only check the classfiles against the hashes of the decompiled manifest.",
+)
 @click.pass_obj
-def checkhealth(suite):
+def checkhealth(suite, jobs, quick):
     """Check that the repository is setup correctly"""
-    suite.checkhealth()
+    suite.checkhealth(jobs=jobs, quick=quick)
 
 
 @cli.command()
@@ -231,6 +428,10 @@ def checkhealth(suite):
     "--fail-fast/--no-fail-fast",
     help="if we should stop after the first error.",
 )
+@click.option(
+    "--fork-server / --no-fork-server",
+    help="fork the python analysis from a process that has already imported its modules.",
+)
 @click.option(
     "--timeout",
     show_default=True,
@@ -250,31 +451,73 @@ def checkhealth(suite):
     type=click.File(mode="w"),
     help="A file to write the report to. (Good for golden testing)",
 )
+@click.option(
+    "--shard",
+    callback=shard_parser,
+    help="only run on the i'th of n deterministic partitions of the methods, e.g., 2/4.",
+)
+@click.option(
+    "--balance",
+    type=click.File(mode="r"),
+    help="with --shard, a previous evaluation report used to balance the shards by runtime.",
+)
+@click.option(
+    "--tag",
+    "-t",
+    "tags",
+    multiple=True,
+    callback=tag_parser,
+    help="only run on methods with one of these tags, e.g., LOOP or ARRAY.",
+)
+@click.option(
+    "--result",
+    "queries",
+    multiple=True,
+    help="only run on methods with a case with one of these results, e.g., 'divide by zero'.",
+)
 @click.argument("PROGRAM", nargs=-1)
 @click.pass_obj
-def test(suite, program, report, filter, fail_fast, with_python, timeout):
+def test(
+    suite,
+    program,
+    report,
+    filter,
+    shard,
+    balance,
+    tags,
+    queries,
+    fail_fast,
+    with_python,
+    fork_server,
+    timeout,
+):
     """Test run a PROGRAM."""
 
     program = resolve_cmd(program, with_python)
+    server = start_fork_server(program, fork_server)
 
     r = Reporter(report)
 
     if not filter:
         with r.context("Info"):
-            out = r.run(program + ("info",), timeout=timeout)
+            out = r.run(program + ("info",), timeout=timeout, server=server)
             info = model.AnalysisInfo.parse(out)
 
             with r.context("Results"):
                 for k, v in sorted(dataclasses.asdict(info).items()):
                     r.output(f"- {k}: {v}")
 
+    selected = selected_methods(suite, tags, queries, shard, balance)
+
     total = 0
     for methodid, correct in suite.case_methods():
         if filter and not filter.search(str(methodid)):
             continue
+        if selected is not None and methodid not in selected:
+            continue
 
         with r.context(f"Case {methodid}"):
-            out = r.run(program + (str(methodid),), timeout=timeout)
+            out = r.run(program + (str(methodid),), timeout=timeout, server=server)
             response = model.Response.parse(out)
             with r.context("Results"):
                 for k, v in sorted(response.predictions.items()):
@@ -297,6 +540,14 @@ def test(suite, program, report, filter, fail_fast, with_python, timeout):
     "--stepwise / --no-stepwise",
     help="continue from last failure",
 )
+@click.option(
+    "--batch / --no-batch",
+    help="run all cases of a method in one process, see `jpamb.getcases`.",
+)
+@click.option(
+    "--fork-server / --no-fork-server",
+    help="fork the python analysis from a process that has already imported its modules.",
+)
 @click.option(
     "--timeout",
     show_default=True,
@@ -316,13 +567,52 @@ def test(suite, program, report, filter, fail_fast, with_python, timeout):
     type=click.File(mode="w"),
     help="A file to write the report to. (Good for golden testing)",
 )
+@click.option(
+    "--shard",
+    callback=shard_parser,
+    help="only run on the i'th of n deterministic partitions of the methods, e.g., 2/4.",
+)
+@click.option(
+    "--balance",
+    type=click.File(mode="r"),
+    help="with --shard, a previous evaluation report used to balance the shards by runtime.",
+)
+@click.option(
+    "--tag",
+    "-t",
+    "tags",
+    multiple=True,
+    callback=tag_parser,
+    help="only run on cases of methods with one of these tags, e.g., LOOP or ARRAY.",
+)
+@click.option(
+    "--result",
+    "queries",
+    multiple=True,
+    help="only run on cases with one of these results, e.g., 'divide by zero'.",
+)
 @click.argument("PROGRAM", nargs=-1)
 @click.pass_obj
-def interpret(suite, program, report, filter, with_python, timeout, stepwise):
+def interpret(
+    suite,
+    program,
+    report,
+    filter,
+    shard,
+    balance,
+    tags,
+    queries,
+    with_python,
+    fork_server,
+    timeout,
+    stepwise,
+    batch,
+):
     """Use PROGRAM as an interpreter."""
 
     r = Reporter(report)
     program = resolve_cmd(program, with_python)
+    server = start_fork_server(program, fork_server)
 
     last_case = None
     if stepwise:
@@ -335,9 +625,78 @@ def interpret(suite, program, report, filter, with_python, timeout, stepwise):
         except IOError:
             last_case = None
 
-    total = 0
-    count = 0
-    for case in suite.cases:
+    cases = suite.cases
+    if tags or queries:
+        cases = suite.query(tags=tags, results=queries)
+        if not cases:
+            raise click.UsageError("No cases match the given --tag and --result")
+    if shard is not None:
+        selected = selected_methods(suite, tags, queries, shard, balance)
+        cases = [case for case in cases if case.methodid in selected]
+
+    def run_case(case):
+        try:
+            out = r.run(
+                program + (case.methodid.encode(), case.input.encode()),
+                timeout=timeout,
+                server=server,
+            )
+            return out.splitlines()[-1].strip()
+        except subprocess.TimeoutExpired:
+            return "*"
+        except subprocess.CalledProcessError as e:
+            log.error(e)
+            return "failure"
+
+    def run_batch(methodid, cases):
+        """The results of the first cases, in one process.
+
+        The results are kept as they are printed. A case that prints no
+        result within the timeout is '*', like when it is run alone, and the
+        cases after it are run in a new process. If the process fails, or
+        prints too few results, the rest have no result.
+        """
+        import tempfile
+
+        rets = []
+        while len(rets) < len(cases):
+            rest = cases[len(rets) :]
+            with tempfile.TemporaryFile("w+") as inputs:
+                inputs.writelines(f"{case.input.encode()}\n" for case in rest)
+                inputs.seek(0)
+                try:
+                    out = r.run(
+                        program + (methodid.encode(), "-"),
+                        timeout=None,
+                        idle=timeout,
+                        stdin=inputs,
+                        server=server,
+                    )
+                except subprocess.TimeoutExpired as e:
+                    done = lines(e.output)
+                    if len(done) >= len(rest):
+                        # Every case has a result, but the process did not stop
+                        return rets + done[-len(rest) :]
+                    rets += done + ["*"]
+                    continue
+                except subprocess.CalledProcessError as e:
+                    log.warning(f"Running the rest of {methodid} one by one: {e}")
+                    return rets + lines(e.stdout)[: len(rest) - 1]
+            done = lines(out)
+            if len(done) < len(rest):
+                log.warning(
+                    f"Expected {len(rest)} results from {methodid}, but got "
+                    f"{len(done)}, running the rest one by one"
+                )
+                return rets + done
+            return rets + done[-len(rest) :]
+        return rets
+
+    def lines(out):
+        return [line.strip() for line in (out or "").splitlines() if line.strip()]
+
+    todo = []
+    for case in cases:
         if last_case and last_case != case:
             continue
         last_case = None
@@ -345,32 +704,206 @@ def interpret(suite, program, report, filter, with_python, timeout, stepwise):
         if filter and not filter.search(str(case)):
             continue
 
-        with r.context(f"Case {case}"):
-            try:
-                out = r.run(
-                    program + (case.methodid.encode(), case.input.encode()),
-                    timeout=timeout,
-                )
-                ret = out.splitlines()[-1].strip()
-            except subprocess.TimeoutExpired:
-                ret = "*"
-            except subprocess.CalledProcessError as e:
-                log.error(e)
-                ret = "failure"
-            r.output(f"Expected {case.result!r} and got {ret!r}")
-            if case.result == ret:
-                total += 1
-            elif stepwise:
-                with open(".jpamb-stepwise", "w") as f:
-                    f.write(case.encode())
-                sys.exit(-1)
-            count += 1
+        todo.append(case)
+
+    total = 0
+    count = 0
+    for methodid, group in itertools.groupby(todo, key=lambda case: case.methodid):
+        group = list(group)
+        rets = []
+        if batch:
+            with r.context(f"Batch {methodid}"):
+                rets = run_batch(methodid, group)
+
+        for i, case in enumerate(group):
+            with r.context(f"Case {case}"):
+                ret = rets[i] if i < len(rets) else run_case(case)
+                r.output(f"Expected {case.result!r} and got {ret!r}")
+                if case.result == ret:
+                    total += 1
+                elif stepwise:
+                    with open(".jpamb-stepwise", "w") as f:
+                        f.write(case.encode())
+                    sys.exit(-1)
+                count += 1
 
     Path(".jpamb-stepwise").unlink(True)
 
     r.output(f"Total {total}/{count}")
 
 
+@dataclasses.dataclass(frozen=True)
+class Evaluation:
+    """The settings of an evaluation of a program, see `evaluate`."""
+
+    program: tuple[str, ...]
+    timeout: float
+    iterations: int
+    adaptive: bool
+    precision: float
+    max_iterations: int
+    max_time: float
+    kernel: str
+    calibration_interval: float
+
+    @staticmethod
+    def from_json(json: dict) -> "Evaluation":
+        return Evaluation(**{**json, "program": tuple(json["program"])})
+
+    def to_json(self) -> dict:
+        return dataclasses.asdict(self)
+
+    def calibrator(self) -> timing.Calibrator:
+        return timing.Calibrator(
+            interval=self.calibration_interval,
+            sample=lambda: timing.kernel_time(self.kernel),
+        )
+
+    def method(
+        self, methodid, correct, calibrator: timing.Calibrator, server=None
+    ) -> dict:
+        """Run the program repeatedly on a method, and return its results."""
+        from time import monotonic
+
+        log.success(f"Running on {methodid}")
+        results = []
+
+        _score = 0
+        _time = 0
+        _relative = 0
+        _utime = 0
+        _stime = 0
+        _maxrss = 0
+        has_usage = True
+        times = []
+        started = monotonic()
+        for i in range(self.max_iterations if self.adaptive else self.iterations):
+            if self.adaptive and i >= self.iterations:
+                summary = timing.Summary.of(times)
+                if summary.rel_ci <= self.precision:
+                    log.info(f"Stopping after {i} iterations, ±{summary.rel_ci:.1%}")
+                    break
+                if monotonic() - started >= self.max_time:
+                    log.warning(
+                        f"Out of time after {i} iterations, ±{summary.rel_ci:.1%}"
+                    )
+                    break
+            log.info(f"Running on {methodid}, iter {i}")
+            calibrator.tick()
+            out, time, usage = measure(
+                self.program + (str(methodid),),
+                logerr=log.debug,
+                timeout=self.timeout,
+                server=server,
+            )
+            calibration = calibrator.estimate()
+            response = model.Response.parse(out)
+            score = response.score(correct)
+            relative = math.log10(time / calibration)
+
+            result = {k: v.wager for k, v in response.predictions.items()}
+
+            results.append(
+                {
+                    "iteration": i,
+                    "response": result,
+                    "score": score,
+                    "time": time,
+                    "relative": relative,
+                    "calibration": calibration,
+                    "nearest": calibrator.nearest(),
+                    "utime": usage and usage.utime,
+                    "stime": usage and usage.stime,
+                    "cputime": usage and usage.cputime,
+                    "maxrss": usage and usage.maxrss,
+                }
+            )
+
+            _score += score
+            _relative += relative
+            _time += time
+            times.append(time)
+            if usage is None:
+                has_usage = False
+            else:
+                _utime += usage.utime
+                _stime += usage.stime
+                _maxrss = max(_maxrss, usage.maxrss)
+
+        n = len(results)
+        summary = timing.Summary.of(times)
+        return {
+            "score": _score / n,
+            "time": _time / n,
+            "relative": _relative / n,
+            "utime": _utime / n if has_usage else None,
+            "stime": _stime / n if has_usage else None,
+            "cputime": (_utime + _stime) / n if has_usage else None,
+            "maxrss": _maxrss if has_usage else None,
+            "median": summary.median,
+            "mad": summary.mad,
+            "ci": summary.to_json()["ci"],
+            "iterations": results,
+        }
+
+
+def work(
+    queue: "workqueue.WorkQueue", evaluation: Evaluation, calibrator, server=None
+) -> int:
+    """Complete tasks from the queue until it is empty, and return the count."""
+    count = 0
+    while claimed := queue.claim():
+        name, task = claimed
+        calibrations, drifts = calibrator.calibrations, calibrator.drifts
+        result = evaluation.method(
+            task["method"], frozenset(task["correct"]), calibrator, server
+        )
+        queue.complete(
+            name,
+            {
+                "method": task["method"],
+                "result": result,
+                "calibrations": calibrator.calibrations - calibrations,
+                "drifts": calibrator.drifts - drifts,
+            },
+        )
+        count += 1
+    return count
+
+
+def evaluate_queue(evaluation, methods, calibrator, folder, lease, server=None):
+    """Evaluate the methods through a work queue in folder, also working on it
+    in this process, and return the results when all tasks are completed."""
+    from jpamb import workqueue
+    import time
+
+    queue = workqueue.WorkQueue(folder)
+    queue.setup(
+        evaluation.to_json(),
+        {
+            f"{i:05d}": {"method": str(methodid), "correct": sorted(correct)}
+            for i, (methodid, correct) in enumerate(methods)
+        },
+    )
+    log.info(f"Enqueued {len(methods)} methods in {folder}")
+
+    while True:
+        work(queue, evaluation, calibrator, server)
+        if (remaining := queue.remaining()) == 0:
+            break
+        log.info(f"Waiting for {remaining} methods claimed by other workers")
+        time.sleep(1.0)
+        queue.requeue(lease)
+
+    bymethod = {}
+    calibrations, drifts = 0, 0
+    for _, done in queue.results():
+        bymethod[done["method"]] = done["result"]
+        calibrations += done["calibrations"]
+        drifts += done["drifts"]
+    return bymethod, calibrations, drifts
+
+
 @cli.command()
 @click.pass_context
 @click.option(
@@ -384,7 +917,46 @@ def interpret(suite, program, report, filter, with_python, timeout, stepwise):
     "-N",
     show_default=True,
     default=3,
-    help="number of iterations.",
+    help="number of iterations, the minimum number of iterations with --adaptive.",
+)
+@click.option(
+    "--adaptive / --no-adaptive",
+    help="keep running each method until the runtime is measured precisely enough.",
+)
+@click.option(
+    "--precision",
+    show_default=True,
+    default=0.05,
+    help="with --adaptive, the relative half-width of the 95% confidence interval of the runtime to reach.",
+)
+@click.option(
+    "--max-iterations",
+    show_default=True,
+    default=30,
+    help="with --adaptive, the maximum number of iterations per method.",
+)
+@click.option(
+    "--max-time",
+    show_default=True,
+    default=30.0,
+    help="with --adaptive, the maximum time in seconds to spend per method.",
+)
+@click.option(
+    "--kernel",
+    type=click.Choice(list(timing.KERNELS)),
+    show_default=True,
+    default="sieve",
+    help="the calibration kernel to compute the relative time against, see `jpamb calibrate --profile`.",
+)
+@click.option(
+    "--calibration-interval",
+    show_default=True,
+    default=1.0,
+    help="the minimum time in seconds between calibrations of the machine, 0 calibrates before every run.",
+)
+@click.option(
+    "--fork-server / --no-fork-server",
+    help="fork the python analysis from a process that has already imported its modules.",
 )
 @click.option(
     "--timeout",
@@ -392,6 +964,41 @@ def interpret(suite, program, report, filter, with_python, timeout, stepwise):
     default=2.0,
     help="timeout in seconds.",
 )
+@click.option(
+    "--shard",
+    callback=shard_parser,
+    help="only run on the i'th of n deterministic partitions of the methods, e.g., 2/4.",
+)
+@click.option(
+    "--balance",
+    type=click.File(mode="r"),
+    help="with --shard, a previous evaluation report used to balance the shards by runtime.",
+)
+@click.option(
+    "--tag",
+    "-t",
+    "tags",
+    multiple=True,
+    callback=tag_parser,
+    help="only run on methods with one of these tags, e.g., LOOP or ARRAY.",
+)
+@click.option(
+    "--result",
+    "queries",
+    multiple=True,
+    help="only run on methods with a case with one of these results, e.g., 'divide by zero'.",
+)
+@click.option(
+    "--queue",
+    type=click.Path(file_okay=False, path_type=Path),
+    help="share the work through a queue in this folder with any `jpamb worker --queue`.",
+)
+@click.option(
+    "--lease",
+    show_default=True,
+    default=600.0,
+    help="with --queue, requeue methods claimed by a worker more than this many seconds ago.",
+)
 @click.option(
     "--report",
     "-r",
@@ -400,19 +1007,36 @@ def interpret(suite, program, report, filter, with_python, timeout, stepwise):
     help="A file to write the report to",
 )
 @click.argument("PROGRAM", nargs=-1)
-def evaluate(ctx, program, report, timeout, iterations, with_python):
+def evaluate(
+    ctx,
+    program,
+    report,
+    queue,
+    lease,
+    shard,
+    balance,
+    tags,
+    queries,
+    timeout,
+    iterations,
+    adaptive,
+    precision,
+    max_iterations,
+    max_time,
+    calibration_interval,
+    kernel,
+    with_python,
+    fork_server,
+):
     """Evaluate the PROGRAM."""
-
     program = resolve_cmd(program, with_python)
+    server = start_fork_server(program, fork_server)
 
-    def calibrate(count=100_000):
-        from time import perf_counter_ns
-        from jpamb import timer
+    if iterations < 1:
+        raise click.UsageError("--iterations should be at least 1")
 
-        start = perf_counter_ns()
-        timer.sieve(count)
-        end = perf_counter_ns()
-        return end - start
+    if adaptive and max_iterations < iterations:
+        raise click.UsageError("--max-iterations should be at least --iterations")
 
     try:
         (out, _) = run(
@@ -420,6 +1044,7 @@ def evaluate(ctx, program, report, timeout, iterations, with_python):
             logout=log.info,
             logerr=log.debug,
             timeout=timeout,
+            server=server,
         )
         info = model.AnalysisInfo.parse(out)
     except ValueError:
@@ -427,73 +1052,294 @@ def evaluate(ctx, program, report, timeout, iterations, with_python):
         for o in out.splitlines():
             log.error(o)
 
-    total_score = 0
-    total_time = 0
-    total_relative = 0
-    total_methods = 0
-    bymethod = {}
-
-    for methodid, correct in ctx.obj.case_methods():
-        log.success(f"Running on {methodid}")
-        results = []
-
-        _score = 0
-        _time = 0
-        _relative = 0
-        for i in range(iterations):
-            log.info(f"Running on {methodid}, iter {i}")
-            r1 = calibrate()
-            out, time = run(
-                program + (methodid.encode(),), logerr=log.debug, timeout=timeout
-            )
-            r2 = calibrate()
-            response = model.Response.parse(out)
-            score = response.score(correct)
-            relative = math.log10(time / (r1 + r2) * 2)
+    evaluation = Evaluation(
+        program=program,
+        timeout=timeout,
+        iterations=iterations,
+        adaptive=adaptive,
+        precision=precision,
+        max_iterations=max_iterations,
+        max_time=max_time,
+        kernel=kernel,
+        calibration_interval=calibration_interval,
+    )
+    calibrator = evaluation.calibrator()
 
-            result = {k: v.wager for k, v in response.predictions.items()}
+    selected = selected_methods(ctx.obj, tags, queries, shard, balance)
+    methods = [
+        (methodid, correct)
+        for methodid, correct in ctx.obj.case_methods()
+        if selected is None or methodid in selected
+    ]
 
-            results.append(
-                {
-                    "iteration": i,
-                    "response": result,
-                    "score": score,
-                    "time": time,
-                    "relative": relative,
-                    "calibrates": [r1, r2],
-                }
+    if queue:
+        bymethod, calibrations, drifts = evaluate_queue(
+            evaluation, methods, calibrator, queue, lease, server
+        )
+    else:
+        bymethod = {}
+        for methodid, correct in methods:
+            bymethod[str(methodid)] = evaluation.method(
+                methodid, correct, calibrator, server
             )
-
-            _score += score
-            _relative += relative
-            _time += time
-
-        bymethod[str(methodid)] = {
-            "score": _score / iterations,
-            "time": _time / iterations,
-            "relative": _relative / iterations,
-            "iterations": results,
-        }
-
-        total_score += _score / iterations
-        total_time += _time / iterations
-        total_relative += _relative / iterations
-
-        total_methods += 1
+        calibrations, drifts = calibrator.calibrations, calibrator.drifts
 
     json.dump(
         {
             "info": dataclasses.asdict(info),
             "bymethod": bymethod,
-            "score": total_score,
-            "time": total_time / total_methods,
-            "relative": total_relative / total_methods,
+            **shards.summarize(bymethod),
+            "kernel": kernel,
+            "calibrations": calibrations,
+            "drifts": drifts,
         },
         report,
         indent=2,
     )
 
 
+@cli.command()
+@click.option(
+    "--queue",
+    required=True,
+    type=click.Path(file_okay=False, path_type=Path),
+    help="the folder of the queue, given to `jpamb evaluate --queue`.",
+)
+@click.option(
+    "--wait / --no-wait",
+    help="wait for the queue to be set up, and for the tasks of other workers to be done, instead of stopping when there are no tasks.",
+)
+@click.option(
+    "--poll",
+    type=float,
+    default=1.0,
+    show_default=True,
+    help="the seconds between looking for tasks, with --wait.",
+)
+@click.option(
+    "--with-python/--no-with-python",
+    "-W/-noW",
+    help="the analysis is a python script, which should run in the same interpreter as jpamb.",
+    default=None,
+)
+@click.option(
+    "--fork-server / --no-fork-server",
+    help="fork the python analysis from a process that has already imported its modules.",
+)
+@click.argument("PROGRAM", nargs=-1)
+def worker(queue, program, with_python, fork_server, wait, poll):
+    """Work on the methods of an evaluation in a queue.
+
+    By default, the program is the one given to `jpamb evaluate`, but
+    a PROGRAM can be given if it is located elsewhere on this machine.
+    """
+    from jpamb import workqueue
+    import time
+
+    queue = workqueue.WorkQueue(queue)
+    if not queue.ready():
+        if not wait:
+            raise click.UsageError(
+                f"No queue in {queue.folder}, start `jpamb evaluate --queue` first or use --wait"
+            )
+        log.info(f"Waiting for a queue in {queue.folder}")
+        while not queue.ready():
+            time.sleep(poll)
+    evaluation = Evaluation.from_json(queue.config())
+    if program:
+        evaluation = dataclasses.replace(
+            evaluation, program=resolve_cmd(program, with_python)
+        )
+    server = start_fork_server(evaluation.program, fork_server)
+    calibrator = evaluation.calibrator()
+    count = work(queue, evaluation, calibrator, server)
+    # Tasks claimed by workers that stop are requeued by `jpamb evaluate`
+    while wait and queue.remaining() > 0:
+        time.sleep(poll)
+        count += work(queue, evaluation, calibrator, server)
+    log.success(f"Completed {count} methods")
+
+
+@cli.group()
+def report():
+    """Work with evaluation reports."""
+
+
+@report.command()
+@click.option(
+    "--output",
+    "-o",
+    default="-",
+    type=click.File(mode="w"),
+    help="A file to write the merged report to",
+)
+@click.argument("REPORTS", nargs=-1, required=True, type=click.File(mode="r"))
+@click.pass_obj
+def merge(suite, reports, output):
+    """Merge the REPORTS of the shards of an evaluation into one report."""
+    order = [str(methodid) for methodid, _ in suite.case_methods()]
+    try:
+        merged = shards.merge([json.load(r) for r in reports], order)
+    except ValueError as e:
+        raise click.UsageError(str(e))
+    json.dump(merged, output, indent=2)
+
+
+@cli.group()
+def memo():
+    """Work with the stored results of concrete executions, see `jpamb.memo`."""
+
+
+@memo.command("show")
+@click.pass_obj
+def memo_show(suite):
+    """Show the number of executions and steps stored per method."""
+    from jpamb.memo import MemoStore
+
+    with MemoStore(suite) as store:
+        summary = store.summary()
+    total = sum(count for _, _, count, _ in summary)
+    for executor, method, count, steps in summary:
+        print(f"{executor:<12} {count:>8} executions {steps:>12} steps  {method}")
+    print(f"{total} executions in {suite.memo_db}")
+
+
+@memo.command("clear")
+@click.option(
+    "--executor",
+    "executors",
+    multiple=True,
+    help="Only clear the executions of this executor.",
+)
+@click.option(
+    "--method",
+    "methods",
+    multiple=True,
+    help="Only clear the executions of this method.",
+)
+@click.pass_obj
+def memo_clear(suite, executors, methods):
+    """Delete the stored executions."""
+    from jpamb.memo import MemoStore
+
+    if not suite.memo_db.exists():
+        print("Nothing to clear")
+        return
+    with MemoStore(suite) as store:
+        deleted = store.clear(executors, [jvm.AbsMethodID.decode(m) for m in methods])
+    print(f"Cleared {deleted} executions")
+
+
+@cli.command()
+@click.option(
+    "--profile / --no-profile",
+    help="run all calibration kernels and print a fingerprint of the machine.",
+)
+@click.option(
+    "--repeat",
+    show_default=True,
+    default=5,
+    help="the number of times to run each kernel.",
+)
+def calibrate(profile, repeat):
+    """Calibrate the speed of this machine."""
+    if profile:
+        json.dump(timing.profile(repeat), sys.stdout, indent=2)
+        print()
+    else:
+        calibrator = timing.Calibrator(interval=0, window=repeat)
+        for _ in range(repeat):
+            calibrator.tick()
+        print(calibrator.estimate())
+
+
+# Decompile every classfile given as argument, followed by a record separator.
+DECOMPILE_BATCH = 'for f; do jvm2json -s "$f" || exit 1; printf "\\036\\n"; done'
+
+
+def decompile_changed(suite, cmd, tool, jobs=1, incremental=True):
+    """Decompile the classfiles that changed since the last build.
+
+    The hashes of the decompiled classfiles are kept in a manifest together with
+    the tool used, and the changed classfiles are decompiled in at most jobs
+    batches, run in parallel, each as a single invocation of the tool.
+    """
+    import hashlib
+    from concurrent.futures import ThreadPoolExecutor
+
+    try:
+        manifest = json.loads(suite.decompiled_manifest.read_text())
+    except (OSError, ValueError):
+        manifest = {}
+    known = manifest.get("classes", {}) if manifest.get("tool") == tool else {}
+
+    hashes = {}
+    changed = []
+    for cl in sorted(suite.classes()):
+        name = cl.encode()
+        hashes[name] = hashlib.sha256(suite.classfile(cl).read_bytes()).hexdigest()
+        if (
+            not incremental
+            or known.get(name) != hashes[name]
+            or not suite.decompiledfile(cl).exists()
+        ):
+            changed.append(cl)
+
+    for name in known.keys() - hashes.keys():
+        log.info(f"Removing {name}, which no longer exists")
+        suite.decompiledfile(jvm.ClassName.decode(name)).unlink(missing_ok=True)
+
+    log.info(f"Decompiling {len(changed)} of {len(hashes)} classes")
+
+    def decompile_batch(batch):
+        res, _ = run(
+            cmd
+            + ["sh", "-c", DECOMPILE_BATCH, "sh"]
+            + [str(suite.classfile(cl).relative_to(suite.workfolder)) for cl in batch],
+            logerr=log.warning,
+            timeout=600,
+            cwd=suite.workfolder,
+        )
+        outputs = res.split("\x1e\n")
+        if outputs and not outputs[-1].strip():
+            outputs.pop()
+        if len(outputs) != len(batch):
+            raise ValueError(f"got {len(outputs)} records for {len(batch)} classes")
+        for cl, out in zip(batch, outputs):
+            file = suite.decompiledfile(cl)
+            file.parent.mkdir(exist_ok=True, parents=True)
+            with open(file, "w") as f:
+                json.dump(json.loads(out), f, indent=2, sort_keys=True)
+            log.info(f"Decompiled {cl}")
+
+    batches = [changed[i::jobs] for i in range(jobs) if changed[i::jobs]]
+    failed = set()
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        futures = [(batch, pool.submit(decompile_batch, batch)) for batch in batches]
+        for batch, future in futures:
+            try:
+                future.result()
+            except (subprocess.SubprocessError, ValueError) as e:
+                log.error(f"Could not decompile {', '.join(map(str, batch))}: {e}")
+                failed.update(cl.encode() for cl in batch)
+
+    suite.decompiled_manifest.parent.mkdir(exist_ok=True, parents=True)
+    suite.decompiled_manifest.write_text(
+        json.dumps(
+            {
+                "tool": tool,
+                "classes": {n: h for n, h in hashes.items() if n not in failed},
+            },
+            indent=2,
+            sort_keys=True,
+        )
+    )
+    suite.invalidate_cache()
+
+    if failed:
+        raise click.ClickException(f"Could not decompile {len(failed)} classes")
+
+
 @cli.command()
 @click.option(
     "-D",
@@ -511,6 +1357,27 @@ def evaluate(ctx, program, report, timeout, iterations, with_python):
     help="decompile the classfiles using jvm2json.",
     default=None,
 )
+@click.option(
+    "--incremental / --no-incremental",
+    help="only decompile the classfiles that changed since the last build.",
+    default=True,
+)
+@click.option(
+    "--jobs",
+    "-j",
+    show_default=True,
+    default=4,
+    help="the number of batches of classfiles to decompile in parallel.",
+)
+@click.option(
+    "--local / --no-local",
+    help="run javac, java and jvm2json from the PATH, instead of in the docker container.",
+)
+@click.option(
+    "--index / --no-index",
+    help="index the cases and their tags in the case database.",
+    default=None,
+)
 @click.option(
     "--document / --no-document",
     help="docmument the files",
@@ -521,31 +1388,59 @@ def evaluate(ctx, program, report, timeout, iterations, with_python):
     help="test that all cases are correct.",
     default=None,
 )
+@click.option(
+    "--case-timeout",
+    "case_timeout_ms",
+    show_default=True,
+    default=2000,
+    help="with --test, the timeout of each case in milliseconds.",
+)
 @click.pass_obj
-def build(suite, compile, decompile, document, test, docker):
+def build(
+    suite,
+    compile,
+    decompile,
+    incremental,
+    jobs,
+    local,
+    index,
+    document,
+    test,
+    case_timeout_ms,
+    docker,
+):
     """Rebuild all benchmarks."""
 
-    if not any(s for s in [compile, decompile, document, test]):
+    if not any(s for s in [compile, decompile, index, document, test]):
         compile = compile is None
         decompile = decompile is None
+        index = index is None
         document = document is None
         test = test is None
 
-    dockerbin = shutil.which("podman") or shutil.which("docker")
+    if jobs < 1:
+        raise click.UsageError("--jobs should be at least 1")
 
-    if not dockerbin:
-        raise click.UsageError("No docker or podman on PATH")
+    if local:
+        log.info("Using the tools on the PATH")
+        cmd = []
+    else:
+        dockerbin = shutil.which("podman") or shutil.which("docker")
 
-    log.info(f"Using docker: {dockerbin}")
+        if not dockerbin:
+            raise click.UsageError("No docker or podman on PATH")
 
-    cmd = [
-        dockerbin,
-        "run",
-        "--rm",
-        "-v",
-        f"{suite.workfolder}:/workspace",
-        docker,
-    ]
+        log.info(f"Using docker: {dockerbin}")
+
+        cmd = [
+            dockerbin,
+            "run",
+            "--rm",
+            "-i",
+            "-v",
+            f"{suite.workfolder}:/workspace",
+            docker,
+        ]
 
     if compile:
         log.info("Compiling")
@@ -568,50 +1463,42 @@ def build(suite, compile, decompile, document, test, docker):
         )
         suite.case_file.parent.mkdir(exist_ok=True, parents=True)
         suite.case_file.write_text("\n".join(sorted(res.splitlines())))
+        suite.invalidate_cache()
 
         # TODO: Compute distribution.csv
 
     if decompile:
         log.info("Decompiling")
-        for cl in suite.classes():
-            log.info(f"Decompiling {cl}")
-            res, t = run(
-                cmd
-                + [
-                    "jvm2json",
-                    "-s",
-                    suite.classfile(cl).relative_to(suite.workfolder),
-                ],
-                logerr=log.warning,
-            )
-            file = suite.decompiledfile(cl)
-            file.parent.mkdir(exist_ok=True, parents=True)
-            with open(file, "w") as f:
-                json.dump(json.loads(res), f, indent=2, sort_keys=True)
+        decompile_changed(suite, cmd, "local" if local else docker, jobs, incremental)
         log.success("Done decompiling")
 
+    if index:
+        log.info("Indexing")
+        suite.build_case_db()
+        log.success(f"Done indexing the cases in {suite.case_db}")
+
     if document:
+        from functools import cache
+        from inspect import getsourcelines, getsourcefile
+
         log.info("Documenting")
-        opcode_counts = Counter()
-        opcode_urls = {}
-        class_opcodes = {}
-        for case in suite.cases:
-            class_opcodes[str(case.methodid.classname).split(".")[-1]] = set()
-            list_ops = []
-            for opcode in suite.method_opcodes(case.methodid):
-                index = opcode.mnemonic()  # opcode.real().split()[0]
-                list_ops.append(index)
-
-                opcode_urls[index] = (
-                    opcode.mnemonic(),
-                    opcode.url(),
-                    opcode,
-                )
+        histogram = suite.opcode_histogram()
+        # Every case counts the opcodes of its method
+        opcode_counts = histogram.total(
+            {m: len(suite.method_cases(m)) for m in histogram.by_method}
+        )
+        class_opcodes = {cn.name: ops for cn, ops in histogram.by_class().items()}
 
-                opcode_counts[index] += 1
+        @cache
+        def giturl(cls):
+            folder = Path(getsourcefile(cls)).parent
+            while folder.name != "jpamb":
+                folder = folder.parent
 
-            for o in list_ops:
-                class_opcodes[str(case.methodid.classname).split(".")[-1]].add(o)
+            root = folder.parent
+
+            rel = Path(getsourcefile(cls)).relative_to(root)
+            return f"{rel}?plain=1#L{getsourcelines(cls)[1]}"
 
         with open("OPCODES.md", "w") as document:
             document.write("#Bytecode instructions\n")
@@ -619,29 +1506,21 @@ def build(suite, compile, decompile, document, test, docker):
             document.write("| :---- | :---- | :----- | -----: |\n")
 
             for op, count in opcode_counts.most_common():
-                (mnemonic, url, opcode) = opcode_urls[op]
+                opcode = histogram.examples[op]
+                mnemonic, url = opcode.mnemonic(), opcode.url()
                 in_classes = ""
 
                 for classname in class_opcodes:
                     if op in class_opcodes[classname]:
                         in_classes += " " + classname
 
-                folder = Path(getsourcefile(opcode.__class__)).parent
-                while folder.name != "jpamb":
-                    folder = folder.parent
-
-                root = folder.parent
-
-                rel = Path(getsourcefile(opcode.__class__)).relative_to(root)
-                giturl = f"{rel}?plain=1#L{getsourcelines(opcode.__class__)[1]}"
-
                 document.write(
                     " | ["
                     + mnemonic
                     + "]("
                     + url
                     + ") | "
-                    + f"[{opcode.__class__.__name__}]({giturl})"
+                    + f"[{opcode.__class__.__name__}]({giturl(opcode.__class__)})"
                     + " | "
                     + in_classes
                     + " | "
@@ -650,37 +1529,76 @@ def build(suite, compile, decompile, document, test, docker):
                 )
 
     if test:
-        log.info("Testing")
+        import tempfile
 
-        for case in suite.cases:
-            log.info(f"Testing {case}")
-
-            folder = suite.classfiles_folder
+        log.info("Testing")
 
-            try:
-                res, x = run(
-                    cmd
-                    + [
-                        "java",
-                        "-cp",
-                        folder.relative_to(suite.workfolder),
-                        "-ea",
-                        "jpamb.Runtime",
-                        case.methodid.encode(),
-                        case.input.encode(),
-                    ],
-                    logout=log.info,
-                    logerr=log.debug,
-                    timeout=2,
-                )
-            except subprocess.TimeoutExpired:
-                res = "*"
+        def key(case):
+            return f"{case.methodid.encode()} {case.input.encode()}"
+
+        # Run all cases in a single JVM, see `jpamb.Runtime --batch`. The
+        # runner stops early when too many cases do not terminate, so the
+        # cases without a result are run again in a fresh JVM.
+        results = {}
+        pending = list(suite.cases)
+        while pending:
+            with tempfile.TemporaryFile("w+") as inputs:
+                inputs.writelines(f"{key(case)}\n" for case in pending)
+                inputs.seek(0)
+                try:
+                    res, _ = run(
+                        cmd
+                        + [
+                            "java",
+                            "-cp",
+                            suite.classfiles_folder.relative_to(suite.workfolder),
+                            "-ea",
+                            "jpamb.Runtime",
+                            "--batch",
+                            str(case_timeout_ms),
+                        ],
+                        logerr=log.debug,
+                        timeout=60 + len(pending) * case_timeout_ms / 1000,
+                        stdin=inputs,
+                        cwd=suite.workfolder,
+                    )
+                except subprocess.CalledProcessError as e:
+                    log.error(f"The test runner failed: {e}")
+                    res = e.stdout or ""
+                except subprocess.TimeoutExpired as e:
+                    log.error(f"The test runner timed out: {e}")
+                    res = ""
+
+            for line in res.splitlines():
+                name, sep, got = line.rpartition(" -> ")
+                if sep:
+                    results[name] = got
+
+            left = [case for case in pending if key(case) not in results]
+            if len(left) == len(pending):
+                break
+            pending = left
+
+        if suite.cases and not results:
+            # A jpamb.Runtime compiled before --batch ignores the flag
+            raise click.ClickException(
+                "The test runner gave no results, are the classfiles compiled "
+                "from the current sources? Run `jpamb build --compile` first."
+            )
 
-            if case.result == res.strip():
+        failures = 0
+        for case in suite.cases:
+            got = results.get(key(case), "no result")
+            if case.result == got:
                 log.success(f"Correct {case}")
             else:
-                log.error(f"Incorrect (got {res.strip()}) expected {case}")
+                log.error(f"Incorrect (got {got}) expected {case}")
+                failures += 1
 
+        if failures:
+            raise click.ClickException(
+                f"{failures} of {len(suite.cases)} cases are incorrect"
+            )
         log.success("Done testing")
 
 
@@ -728,9 +1646,19 @@ def inspect(suite, method, format):
         path_type=Path,
     ),
 )
-def plot(ctx, report, directory):
+@click.option(
+    "--metric",
+    "-m",
+    type=click.Choice(list(METRIC_LABELS), case_sensitive=True),
+    default=None,
+    help="The measurement to plot against the score "
+    "(default: time for a report, relative for a directory).",
+)
+def plot(ctx, report, directory, metric):
     """Plot results of a report or compare reports in a directory"""
     import numpy as np
+    import matplotlib.pyplot as plt
+    import matplotlib.colors as colors
 
     prefix = ""
 
@@ -754,14 +1682,22 @@ def plot(ctx, report, directory):
                 info = report["info"]
                 methods = report["bymethod"]
                 total_value = JpambScore(
-                    max(report["score"], -100), report["time"], report["relative"]
+                    max(report["score"], -100),
+                    report["time"],
+                    report["relative"],
+                    report.get("cputime"),
+                    report.get("maxrss"),
                 )
                 method_values = {}
 
                 for methodid, correct in ctx.obj.case_methods():
                     method = methods[str(methodid)]
                     method_values[str(methodid)] = JpambScore(
-                        max(method["score"], -100), method["time"], method["relative"]
+                        max(method["score"], -100),
+                        method["time"],
+                        method["relative"],
+                        method.get("cputime"),
+                        method.get("maxrss"),
                     )
 
                 return info, method_values, total_value
@@ -769,7 +1705,7 @@ def plot(ctx, report, directory):
             except ValueError:
                 raise ValueError(f"Cannot read {report}")
 
-    def compare_reports(directory):
+    def compare_reports(directory, metric):
         import os
 
         scores = []
@@ -780,8 +1716,11 @@ def plot(ctx, report, directory):
             if report.endswith(".json"):
                 try:
                     rep_info, _, rep_scores = parse_report(directory.joinpath(report))
+                    if rep_scores.metric(metric) is None:
+                        print(f"No {metric} in {report}")
+                        continue
                     scores.append(rep_scores.score)
-                    times.append(rep_scores.rel_time)
+                    times.append(rep_scores.metric(metric))
                     labels.append(rep_info["name"] + ": " + ", ".join(rep_info["tags"]))
                 except ValueError:
                     print(f"Failed to process {report}")
@@ -802,7 +1741,7 @@ def plot(ctx, report, directory):
 
         return "red"
 
-    def plot_scores(scores, times, labels, classes):
+    def plot_scores(scores, times, labels, classes, ylabel):
         import numpy as np
         import matplotlib.patches as mpatches
 
@@ -846,7 +1785,7 @@ def plot(ctx, report, directory):
 
         plt.subplot(2, 1, 2)
         plt.bar(labels, plot_times, color=barcolors, label=classes)
-        plt.ylabel("Test Time")
+        plt.ylabel(ylabel)
 
         plt.xticks(rotation=80)
         max_y = abs(plot_times).max() * 1.05
@@ -854,7 +1793,7 @@ def plot(ctx, report, directory):
 
         plt.show()
 
-    def plot_directory(scores, times, labels):
+    def plot_directory(scores, times, labels, ylabel):
         class MidpointNormalize(colors.Normalize):
             # Normalise the colorbar so that diverging bars work there way either side from a prescribed midpoint value)
             def __init__(self, vmin=None, vmax=None, midpoint=None, clip=True):
@@ -891,15 +1830,17 @@ def plot(ctx, report, directory):
 
         plt.title("JPAMB Test Scores", pad=15.0)
         plt.xlabel("Test Score")
-        plt.ylabel("Analyzer Relative Execution Time")
+        plt.ylabel(ylabel)
         plt.show()
 
     if directory:
-        scores, times, labels = compare_reports(directory)
-        plot_directory(scores, times, labels)
+        dmetric = metric or "relative"
+        scores, times, labels = compare_reports(directory, dmetric)
+        plot_directory(scores, times, labels, METRIC_LABELS[dmetric])
 
     if report:
         info, method_values, total_values = parse_report(report)
+        rmetric = metric or "time"
 
         scores = []
         times = []
@@ -908,12 +1849,14 @@ def plot(ctx, report, directory):
 
         for methodid, correct in ctx.obj.case_methods():
             method = method_values[str(methodid)]
+            if method.metric(rmetric) is None:
+                raise click.UsageError(f"The report has no {rmetric} for {methodid}")
             scores.append(method.score)
-            times.append(method.time)
+            times.append(method.metric(rmetric))
             labels.append(methodid.extension.encode())
             classes.append(str(methodid.classname))
 
-        plot_scores(scores, times, labels, classes)
+        plot_scores(scores, times, labels, classes, METRIC_LABELS[rmetric])
 
 
 if __name__ == "__main__":
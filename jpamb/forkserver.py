@@ -0,0 +1,277 @@
+"""
+jpamb.forkserver
+
+This module provides a fork server for python analyses. The server is a
+python process which imports the modules of the analysis once, and then forks
+a child for every run, which runs the script with `sys.argv` set as if it was
+started from the command line. This way every run is still an isolated
+process, which can be timed out, but without the cost of starting python and
+importing the modules of the analysis.
+
+The server is started by `ForkServer` and talks with it over a unix socket,
+receiving the standard streams of each child over the socket.
+
+"""
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import IO
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+
+
+def supported() -> bool:
+    """Fork servers need `os.fork` and file descriptor passing."""
+    return hasattr(os, "fork") and hasattr(socket, "send_fds")
+
+
+class Channel:
+    """Newline separated json messages over a socket."""
+
+    def __init__(self, sock: socket.socket):
+        self.sock = sock
+        self.buffer = b""
+
+    def send(self, msg: dict, fds: list[int] = []):
+        data = json.dumps(msg).encode() + b"\n"
+        if fds:
+            socket.send_fds(self.sock, [data], fds)
+        else:
+            self.sock.sendall(data)
+
+    def recv(self, timeout: float | None = None) -> dict | None:
+        """Receive a message, or None if the other end is closed."""
+        self.sock.settimeout(timeout)
+        while b"\n" not in self.buffer:
+            data = self.sock.recv(1 << 16)
+            if not data:
+                return None
+            self.buffer += data
+        line, self.buffer = self.buffer.split(b"\n", 1)
+        return json.loads(line)
+
+    def recv_with_fds(self) -> tuple[dict | None, list[int]]:
+        """Receive a message sent with file descriptors."""
+        self.sock.settimeout(None)
+        data, fds, _, _ = socket.recv_fds(self.sock, 1 << 16, 3)
+        if not data:
+            return None, fds
+        # Only one request is in flight at a time, so it arrives alone.
+        return json.loads(data), fds
+
+
+@dataclass
+class Process:
+    """A child of the fork server, mimicking the parts of `subprocess.Popen`
+    used by `jpamb.cli.measure`."""
+
+    server: "ForkServer"
+    args: list[str]
+    pid: int
+    stdout: IO[str]
+    stderr: IO[str]
+    returncode: int | None = None
+    rusage: dict | None = None
+
+    def wait_usage(self, timeout: float | None = None) -> tuple[int, dict]:
+        """Wait for the process, and return its exit code and resource usage."""
+        if self.returncode is None:
+            try:
+                msg = self.server.channel.recv(
+                    None if timeout is None else max(timeout, 1e-6)
+                )
+            except TimeoutError:
+                raise subprocess.TimeoutExpired(self.args, timeout)
+            if msg is None:
+                raise RuntimeError("The fork server stopped unexpectedly")
+            self.returncode, self.rusage = msg["returncode"], msg["rusage"]
+        return self.returncode, self.rusage
+
+    def terminate(self):
+        """Kill the process, and wait for the server to collect it."""
+        if self.returncode is None:
+            try:
+                os.kill(self.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+            self.wait_usage()
+
+
+class ForkServer:
+    """A fork server for a python script, started as `(python, script)`.
+
+    Use it as a context manager, which stops the server when done.
+    """
+
+    def __init__(self, program: tuple[str, ...]):
+        self.python, self.script = program[0], program[1]
+        self.process = None
+        self.channel = None
+
+    def __enter__(self) -> "ForkServer":
+        ours, theirs = socket.socketpair()
+        self.process = subprocess.Popen(
+            [
+                self.python,
+                "-m",
+                "jpamb.forkserver",
+                str(theirs.fileno()),
+                self.script,
+            ],
+            pass_fds=[theirs.fileno()],
+            stdout=subprocess.DEVNULL,
+        )
+        theirs.close()
+        self.channel = Channel(ours)
+        return self
+
+    def __exit__(self, *args):
+        self.channel.sock.close()
+        try:
+            self.process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+
+    def popen(
+        self,
+        cmd: list[str],
+        stdin: IO | None = None,
+        cwd: str | os.PathLike | None = None,
+        env: dict[str, str] | None = None,
+    ) -> Process:
+        """Run cmd, where the interpreter in `cmd[0]` is replaced by the server.
+
+        Like `subprocess.Popen`, the child runs in cwd, and with env as its
+        environment, if they are given.
+        """
+        out_r, out_w = os.pipe()
+        err_r, err_w = os.pipe()
+        fds = [out_w, err_w] + ([stdin.fileno()] if stdin else [])
+        request = {
+            "argv": [str(c) for c in cmd[1:]],
+            "cwd": None if cwd is None else str(cwd),
+            "env": None if env is None else dict(env),
+        }
+        try:
+            self.channel.send(request, fds)
+        finally:
+            os.close(out_w)
+            os.close(err_w)
+        msg = self.channel.recv()
+        if msg is None:
+            raise RuntimeError("The fork server stopped unexpectedly")
+        return Process(
+            self,
+            list(cmd),
+            msg["pid"],
+            open(out_r, encoding="utf-8", errors="replace"),
+            open(err_r, encoding="utf-8", errors="replace"),
+        )
+
+
+def prewarm(script: Path):
+    """Import the modules imported at the top level of the script."""
+    import ast
+    import importlib
+
+    # Absolute, as the children may run in another directory
+    sys.path.insert(0, str(script.parent.absolute()))
+    try:
+        tree = ast.parse(script.read_text())
+    except (OSError, SyntaxError):
+        return
+
+    def imports(body):
+        for stmt in body:
+            match stmt:
+                case ast.Import(names=names):
+                    yield from (n.name for n in names)
+                case ast.ImportFrom(module=module, level=0) if module:
+                    yield module
+                case ast.If() | ast.Try():
+                    yield from imports(stmt.body)
+
+    for module in imports(tree.body):
+        try:
+            importlib.import_module(module)
+        except Exception:
+            # The script will report the error when it runs
+            pass
+
+
+def child(argv: list[str], fds: list[int], cwd: str | None, env: dict | None):
+    """Run the script in the forked child, and never return."""
+    import runpy
+    import traceback
+
+    for fd, target in zip(fds, (1, 2, 0)):
+        os.dup2(fd, target)
+        os.close(fd)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+
+    sys.argv = argv
+    code = 0
+    try:
+        if cwd is not None:
+            os.chdir(cwd)
+        if env is not None:
+            os.environ.clear()
+            os.environ.update(env)
+        runpy.run_path(argv[0], run_name="__main__")
+    except SystemExit as e:
+        if e.code is None:
+            code = 0
+        elif isinstance(e.code, int):
+            code = e.code
+        else:
+            print(e.code, file=sys.stderr)
+            code = 1
+    except BaseException:
+        traceback.print_exc()
+        code = 1
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+    os._exit(code)
+
+
+def serve(channel: Channel, script: Path):
+    prewarm(script)
+    # Interrupts are for the children, the server stops when the socket closes
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    while True:
+        request, fds = channel.recv_with_fds()
+        if request is None:
+            break
+
+        sys.stdout.flush()
+        sys.stderr.flush()
+        pid = os.fork()
+        if pid == 0:
+            channel.sock.close()
+            child(request["argv"], fds, request.get("cwd"), request.get("env"))
+
+        for fd in fds:
+            os.close(fd)
+        channel.send({"pid": pid})
+        _, status, ru = os.wait4(pid, 0)
+        channel.send(
+            {
+                "returncode": os.waitstatus_to_exitcode(status),
+                "rusage": {
+                    "ru_utime": ru.ru_utime,
+                    "ru_stime": ru.ru_stime,
+                    "ru_maxrss": ru.ru_maxrss,
+                },
+            }
+        )
+
+
+if __name__ == "__main__":
+    serve(Channel(socket.socket(fileno=int(sys.argv[1]))), Path(sys.argv[2]))
@@ -1,2 +1,3 @@
 from jpamb.jvm.base import *
 from jpamb.jvm.opcode import *
+from jpamb.jvm import arithmetic
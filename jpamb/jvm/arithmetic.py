@@ -0,0 +1,162 @@
+"""
+jpamb.jvm.arithmetic
+
+This module provides the arithmetic of the JVM on plain python ints: the
+results wrap around at 32 bits for ints and 64 bits for longs, divisions
+truncate toward zero, and the narrowing conversions keep the low bits.
+
+The functions do not check for a division by zero, which raises a
+`ZeroDivisionError`, so an interpreter can test the divisor first and
+report the `ArithmeticException` itself.
+
+It is recommended to import this module qualified
+
+from jpamb.jvm import arithmetic
+
+"""
+
+INT_MIN = -(2**31)
+INT_MAX = 2**31 - 1
+LONG_MIN = -(2**63)
+LONG_MAX = 2**63 - 1
+
+
+def wrap_int(n: int) -> int:
+    """The int with the same low 32 bits as n."""
+    return ((n + 0x8000_0000) & 0xFFFF_FFFF) - 0x8000_0000
+
+
+def wrap_long(n: int) -> int:
+    """The long with the same low 64 bits as n."""
+    return ((n + 0x8000_0000_0000_0000) & 0xFFFF_FFFF_FFFF_FFFF) - (
+        0x8000_0000_0000_0000
+    )
+
+
+def truncating_div(a: int, b: int) -> int:
+    """a / b rounded toward zero, like in java, where python rounds down."""
+    q = a // b
+    if q < 0 and q * b != a:
+        q += 1
+    return q
+
+
+def truncating_rem(a: int, b: int) -> int:
+    """The remainder of truncating_div, which has the sign of a."""
+    return a - b * truncating_div(a, b)
+
+
+# The helpers for ints are on the hot path of an interpreter, so they inline
+# wrap_int and truncating_div instead of calling them, and skip the wrap
+# around when the result already fits
+
+
+def int_add(a: int, b: int) -> int:
+    r = a + b
+    if INT_MIN <= r <= INT_MAX:
+        return r
+    return ((r + 0x8000_0000) & 0xFFFF_FFFF) - 0x8000_0000
+
+
+def int_sub(a: int, b: int) -> int:
+    r = a - b
+    if INT_MIN <= r <= INT_MAX:
+        return r
+    return ((r + 0x8000_0000) & 0xFFFF_FFFF) - 0x8000_0000
+
+
+def int_mul(a: int, b: int) -> int:
+    r = a * b
+    if INT_MIN <= r <= INT_MAX:
+        return r
+    return ((r + 0x8000_0000) & 0xFFFF_FFFF) - 0x8000_0000
+
+
+def int_div(a: int, b: int) -> int:
+    """The only overflow is INT_MIN / -1, which is INT_MIN."""
+    q = a // b
+    if q < 0 and q * b != a:
+        q += 1
+    return INT_MIN if q == 0x8000_0000 else q
+
+
+def int_rem(a: int, b: int) -> int:
+    q = a // b
+    if q < 0 and q * b != a:
+        q += 1
+    return a - b * q
+
+
+def int_neg(a: int) -> int:
+    return wrap_int(-a)
+
+
+def int_shl(a: int, s: int) -> int:
+    """Only the low 5 bits of the shift are used."""
+    return wrap_int(a << (s & 0x1F))
+
+
+def int_shr(a: int, s: int) -> int:
+    return a >> (s & 0x1F)
+
+
+def int_ushr(a: int, s: int) -> int:
+    return wrap_int((a & 0xFFFF_FFFF) >> (s & 0x1F))
+
+
+def long_add(a: int, b: int) -> int:
+    return wrap_long(a + b)
+
+
+def long_sub(a: int, b: int) -> int:
+    return wrap_long(a - b)
+
+
+def long_mul(a: int, b: int) -> int:
+    return wrap_long(a * b)
+
+
+def long_div(a: int, b: int) -> int:
+    return wrap_long(truncating_div(a, b))
+
+
+def long_rem(a: int, b: int) -> int:
+    return truncating_rem(a, b)
+
+
+def long_neg(a: int) -> int:
+    return wrap_long(-a)
+
+
+def long_shl(a: int, s: int) -> int:
+    """Only the low 6 bits of the shift are used."""
+    return wrap_long(a << (s & 0x3F))
+
+
+def long_shr(a: int, s: int) -> int:
+    return a >> (s & 0x3F)
+
+
+def long_ushr(a: int, s: int) -> int:
+    return wrap_long((a & 0xFFFF_FFFF_FFFF_FFFF) >> (s & 0x3F))
+
+
+def i2b(a: int) -> int:
+    return ((a + 0x80) & 0xFF) - 0x80
+
+
+def i2s(a: int) -> int:
+    return ((a + 0x8000) & 0xFFFF) - 0x8000
+
+
+def i2c(a: int) -> int:
+    """Chars are unsigned."""
+    return a & 0xFFFF
+
+
+def i2l(a: int) -> int:
+    return a
+
+
+def l2i(a: int) -> int:
+    return wrap_int(a)
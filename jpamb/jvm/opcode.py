@@ -12,12 +12,9 @@ from abc import ABC, abstractmethod
 from typing import Self
 
 import enum
-import sys
 from loguru import logger
 from jpamb.jvm import base as jvm
 
-logger.add(sys.stderr, format="[{level}] {message}")
-
 
 @dataclass(frozen=True, order=True)
 class Opcode(ABC):
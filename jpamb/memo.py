@@ -0,0 +1,270 @@
+"""
+jpamb.memo
+
+This module provides a persistent store of the results of concrete
+executions, in an SQLite database next to the case file, so an analysis that
+runs the same inputs again, in this or in a later process, can reuse them.
+
+An execution is identified by the executor, a hash of the bytecode of the
+method and of every method it calls in the suite, and the encoded input.
+The store keeps the outcome, the number of steps taken and, if they were
+recorded, the edges covered. When the store holds more than `max_entries`
+executions, the least recently used are evicted.
+
+The hash does not cover the executor itself, nor methods only reached
+through virtual dispatch, so clear the store after changing those, e.g.,
+with `jpamb memo clear`.
+
+"""
+
+from dataclasses import dataclass
+import hashlib
+import json
+from pathlib import Path
+import sqlite3
+import time
+from typing import Iterable
+
+from loguru import logger
+
+from jpamb import jvm
+from jpamb.model import Input, Suite
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS executions (
+    executor TEXT NOT NULL,
+    hash TEXT NOT NULL,
+    method TEXT NOT NULL,
+    input TEXT NOT NULL,
+    outcome TEXT NOT NULL,
+    steps INTEGER NOT NULL,
+    coverage TEXT,
+    used INTEGER NOT NULL,
+    PRIMARY KEY (executor, hash, input)
+);
+CREATE INDEX IF NOT EXISTS executions_used ON executions (used);
+CREATE INDEX IF NOT EXISTS executions_method ON executions (method);
+"""
+
+MAX_ENTRIES = 100_000
+
+# The number of writes to keep before committing them
+BATCH = 1000
+
+Edge = tuple[tuple[jvm.AbsMethodID, int], tuple[jvm.AbsMethodID, int]]
+
+
+@dataclass(frozen=True)
+class Execution:
+    """The result of running a method on an input.
+
+    The coverage is None if it was not recorded.
+    """
+
+    outcome: str
+    steps: int
+    coverage: frozenset[Edge] | None = None
+
+    def answers(self, max_steps: int, coverage: bool) -> bool:
+        """Check that running again with max_steps would give this result."""
+        if self.outcome != "*":
+            return self.steps <= max_steps and (
+                self.coverage is not None or not coverage
+            )
+        # Running out of steps sooner covers fewer edges
+        if coverage:
+            return self.coverage is not None and self.steps == max_steps
+        return max_steps <= self.steps
+
+
+def method_hash(suite: Suite, methodid: jvm.AbsMethodID) -> str:
+    """A hash of the bytecode of the method, and of every method it calls
+    that is in the suite."""
+    digest = hashlib.sha256()
+    seen, todo = set(), [methodid]
+    while todo:
+        m = todo.pop()
+        if m in seen:
+            continue
+        seen.add(m)
+        try:
+            bytecode = suite.findmethod(m)["code"]["bytecode"]
+        except (OSError, IndexError, KeyError, AssertionError):
+            # Outside the suite, so only the name identifies it
+            digest.update(m.encode().encode())
+            continue
+        digest.update(m.encode().encode())
+        digest.update(json.dumps(bytecode, sort_keys=True).encode())
+        for op in bytecode:
+            if op["opr"] == "invoke":
+                todo.append(jvm.AbsMethodID.from_json(op["method"]))
+    return digest.hexdigest()
+
+
+def encode_coverage(coverage: Iterable[Edge]) -> str:
+    return json.dumps(
+        sorted([[s.encode(), i], [t.encode(), j]] for (s, i), (t, j) in coverage)
+    )
+
+
+def decode_coverage(text: str) -> frozenset[Edge]:
+    methods = {}
+
+    def method(m):
+        if m not in methods:
+            methods[m] = jvm.AbsMethodID.decode(m)
+        return methods[m]
+
+    return frozenset(
+        ((method(s), i), (method(t), j)) for (s, i), (t, j) in json.loads(text)
+    )
+
+
+class MemoStore:
+    """The executions of the methods of the suite, in the database at path,
+    which is the `memo_db` of the suite by default.
+
+    Writes are committed in batches, and when the store is closed. Closing
+    also evicts the least recently used executions beyond max_entries, so
+    use the store as a context manager.
+    """
+
+    def __init__(
+        self, suite: Suite, path: Path | None = None, max_entries: int = MAX_ENTRIES
+    ):
+        path = suite.memo_db if path is None else path
+        path.parent.mkdir(exist_ok=True, parents=True)
+        self.suite = suite
+        self.path = path
+        self.max_entries = max_entries
+        self.db = sqlite3.connect(path, timeout=30)
+        self.db.executescript(SCHEMA)
+        self.hashes: dict[jvm.AbsMethodID, str] = {}
+        self.writes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __enter__(self) -> "MemoStore":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def hash(self, methodid: jvm.AbsMethodID) -> str:
+        if methodid not in self.hashes:
+            self.hashes[methodid] = method_hash(self.suite, methodid)
+        return self.hashes[methodid]
+
+    def lookup(
+        self,
+        executor: str,
+        methodid: jvm.AbsMethodID,
+        input: Input,
+        max_steps: int,
+        coverage: bool = False,
+    ) -> Execution | None:
+        """The stored execution, if it is the result of running the input
+        with max_steps, and has the coverage if asked for."""
+        key = (executor, self.hash(methodid), input.encode())
+        row = self.db.execute(
+            "SELECT outcome, steps, coverage FROM executions "
+            "WHERE executor = ? AND hash = ? AND input = ?",
+            key,
+        ).fetchone()
+        if row is not None:
+            outcome, steps, edges = row
+            execution = Execution(
+                outcome, steps, None if edges is None else decode_coverage(edges)
+            )
+            if execution.answers(max_steps, coverage):
+                self.hits += 1
+                self.write(
+                    "UPDATE executions SET used = ? "
+                    "WHERE executor = ? AND hash = ? AND input = ?",
+                    (time.time_ns(), *key),
+                )
+                return execution
+        self.misses += 1
+        return None
+
+    def store(
+        self,
+        executor: str,
+        methodid: jvm.AbsMethodID,
+        input: Input,
+        execution: Execution,
+    ):
+        coverage = execution.coverage
+        self.write(
+            "INSERT OR REPLACE INTO executions VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                executor,
+                self.hash(methodid),
+                methodid.encode(),
+                input.encode(),
+                execution.outcome,
+                execution.steps,
+                None if coverage is None else encode_coverage(coverage),
+                time.time_ns(),
+            ),
+        )
+
+    def write(self, sql: str, args: tuple):
+        self.db.execute(sql, args)
+        self.writes += 1
+        if self.writes >= BATCH:
+            self.commit()
+
+    def commit(self):
+        self.db.commit()
+        self.writes = 0
+
+    def evict(self) -> int:
+        """Delete the least recently used executions beyond max_entries, and
+        return how many."""
+        (count,) = self.db.execute("SELECT COUNT(*) FROM executions").fetchone()
+        if count <= self.max_entries:
+            return 0
+        self.db.execute(
+            "DELETE FROM executions WHERE rowid IN "
+            "(SELECT rowid FROM executions ORDER BY used LIMIT ?)",
+            (count - self.max_entries,),
+        )
+        self.commit()
+        logger.debug(f"Evicted {count - self.max_entries} executions from {self.path}")
+        return count - self.max_entries
+
+    def close(self):
+        self.commit()
+        self.evict()
+        self.db.close()
+
+    def summary(self) -> list[tuple[str, str, int, int]]:
+        """The executor, method, number of executions and steps stored."""
+        return self.db.execute(
+            "SELECT executor, method, COUNT(*), SUM(steps) FROM executions "
+            "GROUP BY executor, method ORDER BY executor, method"
+        ).fetchall()
+
+    def clear(
+        self,
+        executors: Iterable[str] = (),
+        methods: Iterable[jvm.AbsMethodID] = (),
+    ) -> int:
+        """Delete the executions of any of the executors and of any of the
+        methods, where no filter matches all, and return how many."""
+        where, args = [], []
+        for column, values in [
+            ("executor", list(executors)),
+            ("method", [m.encode() for m in methods]),
+        ]:
+            if values:
+                where.append(f"{column} IN ({', '.join('?' * len(values))})")
+                args.extend(values)
+        sql = "DELETE FROM executions"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        deleted = self.db.execute(sql, args).rowcount
+        self.commit()
+        self.db.execute("VACUUM")
+        return deleted
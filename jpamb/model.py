@@ -6,6 +6,7 @@ This module provides the basic data model for working with the JPAMB.
 """
 
 from contextlib import contextmanager
+import functools
 from dataclasses import dataclass
 from pathlib import Path
 from loguru import logger
@@ -18,7 +19,7 @@ import subprocess
 
 from typing import Iterable
 
-from jpamb import jvm
+from jpamb import jvm, casedb
 
 
 @dataclass(frozen=True, order=True)
@@ -88,21 +89,84 @@ class Case:
 
 
 @contextmanager
-def _check(reason, failfast=False):
-    """Used in the checkhealth command"""
+def _check(reason, failfast=False, timings=None):
+    """Used in the checkhealth command.
+
+    Any exception fails the check, but only failfast stops the remaining checks.
+    The time spent, and whether the check succeeded, is appended to timings.
+    """
+    from time import perf_counter
+
     logger.info(reason)
+    start = perf_counter()
+    ok = False
     try:
         yield
-    except AssertionError as e:
-        msg = str(e)
+    except Exception as e:
+        msg = str(e) if isinstance(e, AssertionError) else f"{type(e).__name__}: {e}"
         if msg:
-            logger.error(f"{reason} FAILED: {e}")
+            logger.error(f"{reason} FAILED: {msg}")
         else:
             logger.error(f"{reason} FAILED")
         if failfast:
             raise AssertionError(f"{reason} {str(e.args)}") from e
     else:
+        ok = True
         logger.success(f"{reason} ok")
+    finally:
+        if timings is not None:
+            timings.append((reason, perf_counter() - start, ok))
+
+
+@functools.cache
+def _worker_suite(workfolder: Path) -> "Suite":
+    # One suite per worker process, so the decompiled classes are read once.
+    return Suite(workfolder)
+
+
+# The checks run in worker processes take the encoded class or method, as the
+# jvm types do not survive pickling.
+
+
+def _check_class(workfolder: Path, classname: str) -> str | None:
+    """Check that a class is decompiled, and return the problem if not."""
+    cn = jvm.ClassName.decode(classname)
+    try:
+        x = _worker_suite(workfolder).findclass(cn)
+    except Exception as e:
+        return f"could not read {cn.dotted()}: {type(e).__name__}: {e}"
+    if x["name"] != cn.slashed():
+        return f"could not decompile {cn.dotted()}"
+    return None
+
+
+def _check_method(workfolder: Path, method: str) -> str | None:
+    """Check that all operations of a method are supported, and return the
+    problem if not."""
+    try:
+        methodid = jvm.AbsMethodID.decode(method)
+        for opr in _worker_suite(workfolder).method_opcodes(methodid):
+            str(opr)
+            str(opr.real())
+    except NotImplementedError as e:
+        return f"All operations should be supported: {e}"
+    except Exception as e:
+        return f"{type(e).__name__}: {e}"
+    return None
+
+
+def _check_all(fn, workfolder: Path, items: list, jobs: int) -> list[str | None]:
+    """Run a check on every item, in jobs worker processes."""
+    if jobs <= 1 or len(items) <= 1:
+        return [fn(workfolder, item) for item in items]
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    chunksize = max(1, len(items) // (4 * jobs))
+    with ProcessPoolExecutor(jobs) as pool:
+        return list(
+            pool.map(functools.partial(fn, workfolder), items, chunksize=chunksize)
+        )
 
 
 @dataclass(frozen=True)
@@ -218,11 +282,90 @@ class Response:
         return total
 
 
+@dataclass(frozen=True)
+class CaseIndex:
+    """Precomputed lookups into a tuple of cases, all in the order of the cases."""
+
+    cases_by_method: dict[jvm.Absolute[jvm.MethodID], tuple[Case, ...]]
+    cases_by_class: dict[jvm.ClassName, tuple[Case, ...]]
+    cases_by_result: dict[str, tuple[Case, ...]]
+    methods_by_class: dict[jvm.ClassName, tuple[jvm.Absolute[jvm.MethodID], ...]]
+    results_by_method: dict[jvm.Absolute[jvm.MethodID], frozenset[str]]
+
+    @staticmethod
+    def build(cases: Iterable[Case]) -> "CaseIndex":
+        by_method = defaultdict(list)
+        by_class = defaultdict(list)
+        by_result = defaultdict(list)
+
+        for case in cases:
+            by_method[case.methodid].append(case)
+            by_class[case.methodid.classname].append(case)
+            by_result[case.result].append(case)
+
+        methods_by_class = defaultdict(list)
+        for methodid in by_method:
+            methods_by_class[methodid.classname].append(methodid)
+
+        def freeze(d):
+            return {k: tuple(v) for k, v in d.items()}
+
+        return CaseIndex(
+            cases_by_method=freeze(by_method),
+            cases_by_class=freeze(by_class),
+            cases_by_result=freeze(by_result),
+            methods_by_class=freeze(methods_by_class),
+            results_by_method={
+                m: frozenset(c.result for c in cs) for m, cs in by_method.items()
+            },
+        )
+
+
+@dataclass(frozen=True)
+class OpcodeHistogram:
+    """The opcodes of every method with cases, counted by mnemonic."""
+
+    by_method: dict[jvm.Absolute[jvm.MethodID], collections.Counter]
+    examples: dict[str, jvm.Opcode]
+
+    @staticmethod
+    def build(suite: "Suite") -> "OpcodeHistogram":
+        by_method = {}
+        examples = {}
+        for methodid, _ in suite.case_methods():
+            counts = collections.Counter()
+            for opcode in suite.method_opcodes(methodid):
+                mnemonic = opcode.mnemonic()
+                counts[mnemonic] += 1
+                examples.setdefault(mnemonic, opcode)
+            by_method[methodid] = counts
+        return OpcodeHistogram(by_method, examples)
+
+    def total(self, weights: dict | None = None) -> collections.Counter:
+        """The number of occurrences of every mnemonic, where the opcodes of each
+        method count weights[method] times, or once without weights."""
+        total = collections.Counter()
+        for methodid, counts in self.by_method.items():
+            weight = 1 if weights is None else weights.get(methodid, 0)
+            for mnemonic, count in counts.items():
+                total[mnemonic] += count * weight
+        return total
+
+    def by_class(self) -> dict[jvm.ClassName, set[str]]:
+        """The mnemonics used by the methods with cases in each class."""
+        classes = defaultdict(set)
+        for methodid, counts in self.by_method.items():
+            classes[methodid.classname].update(counts)
+        return dict(classes)
+
+
 class Suite:
     """The suite!
 
     Note that only one instance per abstract path exist to be able to cache
-    information about the suite on read.
+    information about the suite on read. The instance is only initialized
+    once, so the caches survive repeated calls to `Suite()`; call
+    `invalidate_cache` after changing the files of the suite.
 
     """
 
@@ -235,6 +378,9 @@ class Suite:
         return cls._instances[workfolder]
 
     def __init__(self, workfolder: Path | None = None):
+        if hasattr(self, "workfolder"):
+            # Already initialized, keep the cached values
+            return
         workfolder = workfolder or Path.cwd()
         assert workfolder.is_absolute(), f"Assuming that {workfolder} is absolute."
         self.workfolder = workfolder
@@ -243,6 +389,10 @@ class Suite:
     def invalidate_cache(self):
         """Invalidate the case, and require a recomputation of the cached values."""
         self._cases = None
+        self._index = None
+        self._classes = {}
+        self._histogram = None
+        self._stamp = None
 
     @property
     def stats_folder(self) -> Path:
@@ -279,6 +429,12 @@ class Suite:
     def decompiled_folder(self) -> Path:
         return self.workfolder / "target" / "decompiled"
 
+    @property
+    def decompiled_manifest(self) -> Path:
+        """The hashes of the classfiles that were decompiled, which is kept
+        outside the decompiled folder, as it is not a decompiled class"""
+        return self.stats_folder / "decompiled.json"
+
     def decompiledfiles(self) -> Iterable[Path]:
         yield from self.decompiled_folder.glob("**/*.json")
 
@@ -288,10 +444,13 @@ class Suite:
         )
 
     def findclass(self, cn: jvm.ClassName) -> dict:
+        """Find the decompiled class, which is only read once."""
         import json
 
-        with open(self.decompiledfile(cn)) as fp:
-            return json.load(fp)
+        if cn not in self._classes:
+            with open(self.decompiledfile(cn)) as fp:
+                self._classes[cn] = json.load(fp)
+        return self._classes[cn]
 
     def findmethod(self, methodid: jvm.Absolute[jvm.MethodID]) -> jvm:
         methods = self.findclass(methodid.classname)["methods"]
@@ -334,6 +493,15 @@ class Suite:
     def case_file(self) -> Path:
         return self.stats_folder / "cases.txt"
 
+    @property
+    def case_db(self) -> Path:
+        return self.stats_folder / "cases.db"
+
+    @property
+    def memo_db(self) -> Path:
+        """The store of concrete executions, see `jpamb.memo`."""
+        return self.stats_folder / "memo.db"
+
     @property
     def version(self):
         with open(self.workfolder / "CITATION.cff") as f:
@@ -348,24 +516,113 @@ class Suite:
                 self._cases = tuple(Case.decode(line) for line in f)
         return self._cases
 
-    def case_methods(self) -> Iterable[tuple[jvm.Absolute[jvm.MethodID], set[str]]]:
-        methods = defaultdict(set)
+    @property
+    def index(self) -> "CaseIndex":
+        """The cases indexed by method, class and result."""
+        if self._index is None:
+            self._index = CaseIndex.build(self.cases)
+        return self._index
+
+    def case_methods(
+        self,
+    ) -> Iterable[tuple[jvm.Absolute[jvm.MethodID], frozenset[str]]]:
+        """The methods with cases, and their possible results."""
+        return self.index.results_by_method.items()
+
+    def method_cases(self, methodid: jvm.Absolute[jvm.MethodID]) -> tuple[Case, ...]:
+        return self.index.cases_by_method.get(methodid, ())
+
+    def class_cases(self, cn: jvm.ClassName) -> tuple[Case, ...]:
+        return self.index.cases_by_class.get(cn, ())
+
+    def result_cases(self, result: str) -> tuple[Case, ...]:
+        return self.index.cases_by_result.get(result, ())
+
+    def class_methods(
+        self, cn: jvm.ClassName
+    ) -> tuple[jvm.Absolute[jvm.MethodID], ...]:
+        return self.index.methods_by_class.get(cn, ())
+
+    def method_tags(self, methodid: jvm.Absolute[jvm.MethodID]) -> frozenset[str]:
+        """The tags of a method, given by its `@Tag` annotation."""
+        for annotation in self.findmethod(methodid).get("annotations", []):
+            if annotation["type"] == "jpamb/utils/Tag":
+                values = annotation["values"]["value"]["value"]
+                return frozenset(v["value"]["name"] for v in values)
+        return frozenset()
+
+    def _case_db_stamp(self) -> str:
+        """Identifies the version of the files the case database is built from.
+
+        Computed once, as it stats every decompiled file, until the cache is
+        invalidated.
+        """
+        if self._stamp is None:
+            files = [self.case_file, *sorted(self.decompiledfiles())]
+            self._stamp = ";".join(f"{f.name}:{f.stat().st_mtime_ns}" for f in files)
+        return self._stamp
+
+    def build_case_db(self):
+        """Write the cases and the tags of their methods to the case database."""
+        tags = {}
+        for methodid, _ in self.case_methods():
+            try:
+                tags[methodid] = self.method_tags(methodid)
+            except (OSError, IndexError) as e:
+                logger.warning(f"Could not find the tags of {methodid}: {e}")
+        casedb.build(self.case_db, self.cases, tags, self._case_db_stamp())
+
+    def query(
+        self,
+        tags: Iterable[str] = (),
+        results: Iterable[str] = (),
+        classes: Iterable[jvm.ClassName] = (),
+        methods: Iterable[jvm.Absolute[jvm.MethodID]] = (),
+    ) -> tuple[Case, ...]:
+        """Select the cases that match all the given filters.
+
+        Each filter matches cases with any of the given values, e.g.,
+        `query(tags=["LOOP", "ARRAY"], results=["ok"])` selects the cases that
+        return normally from methods tagged with either LOOP or ARRAY. The case
+        database is (re)built if it is missing or older than the suite.
+        """
+        if not casedb.is_current(self.case_db, self._case_db_stamp()):
+            self.build_case_db()
+        return tuple(
+            Case.decode(line)
+            for line in casedb.query(self.case_db, tags, results, classes, methods)
+        )
 
-        for case in self.cases:
-            methods[case.methodid].add(case.result)
+    def tags(self) -> list[str]:
+        """All the tags used in the suite."""
+        if not casedb.is_current(self.case_db, self._case_db_stamp()):
+            self.build_case_db()
+        return casedb.all_tags(self.case_db)
 
-        return methods.items()
+    def opcode_histogram(self) -> OpcodeHistogram:
+        """The opcodes of every method with cases, decoded once per method."""
+        if self._histogram is None:
+            self._histogram = OpcodeHistogram.build(self)
+        return self._histogram
 
     def case_opcodes(self) -> list[jvm.Opcode]:
         for m, _ in self.case_methods():
             yield from self.method_opcodes(m)
 
-    def checkhealth(self, failfast=False):
-        """Checks the health of the repository through a sequence of tests"""
+    def checkhealth(self, failfast=False, jobs=1, quick=False):
+        """Checks the health of the repository through a sequence of tests.
+
+        The classes and methods are checked in jobs worker processes. If quick,
+        the decompiled classes are only checked against the hashes in the
+        manifest, and the methods are not decoded. Returns the time spent on
+        each check, and whether it succeeded.
+        """
         from jpamb import timer
 
+        timings = []
+
         def check(msg):
-            return _check(msg, failfast)
+            return _check(msg, failfast, timings)
 
         with check("The path"):
             with check("docker"):
@@ -405,21 +662,59 @@ class Suite:
             assert len(files) > 0, "should contain decompiled class files"
             logger.info(f"Found {len(files)} files")
 
-            for cn in self.classes():
-                x = self.findclass(cn)
-                logger.info(f"Checking if {cn.dotted()} is decompiled.")
-                assert x["name"] == cn.slashed(), f"could not decompile {cn.dotted()}"
+            classes = sorted(self.classes())
+            if quick:
+                problems = self._check_decompiled_manifest(classes)
+            else:
+                logger.info(f"Checking if {len(classes)} classes are decompiled.")
+                names = [cn.encode() for cn in classes]
+                problems = _check_all(_check_class, self.workfolder, names, jobs)
+            problems = [p for p in problems if p is not None]
+            assert not problems, "; ".join(problems)
 
         with check(f"The case file [{self.case_file}]"):
             assert self.case_file.exists(), "should exist"
             assert len(self.cases) > 0, "cases should be parsable and at least one"
             logger.info(f"Found {len(self.cases)} cases")
 
-        for method, _ in self.case_methods():
-            with check(f"The method: [{method}]"):
-                try:
-                    for opr in self.method_opcodes(method):
-                        str(opr)
-                        str(opr.real())
-                except NotImplementedError as e:
-                    raise AssertionError("All operations should be supported") from e
+        if not quick:
+            methods, problems = [], []
+            with check("The methods"):
+                methods = [m for m, _ in self.case_methods()]
+                names = [m.encode() for m in methods]
+                problems = _check_all(_check_method, self.workfolder, names, jobs)
+            for method, problem in zip(methods, problems):
+                with check(f"The method: [{method}]"):
+                    assert problem is None, problem
+
+        logger.info("Time spent on the slowest checks:")
+        for reason, seconds, ok in sorted(timings, key=lambda t: -t[1])[:10]:
+            logger.info(f"{seconds:8.3f}s {'ok' if ok else 'FAILED':6} {reason}")
+
+        return timings
+
+    def _check_decompiled_manifest(self, classes) -> list[str | None]:
+        """Check the classfiles against the hashes in the decompiled manifest,
+        or only check that they are decompiled if there is no manifest."""
+        import hashlib
+        import json
+
+        try:
+            known = json.loads(self.decompiled_manifest.read_text())["classes"]
+        except (OSError, ValueError, KeyError):
+            logger.warning(
+                f"No manifest in {self.decompiled_manifest}, "
+                "skipping the check of whether the classfiles changed"
+            )
+            known = None
+
+        problems = []
+        for cn in classes:
+            decompiled = self.decompiledfile(cn)
+            if not decompiled.exists():
+                problems.append(f"{cn.dotted()} is not decompiled")
+            elif known is not None:
+                digest = hashlib.sha256(self.classfile(cn).read_bytes()).hexdigest()
+                if known.get(cn.encode()) != digest:
+                    problems.append(f"{cn.dotted()} changed since it was decompiled")
+        return problems
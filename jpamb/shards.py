@@ -0,0 +1,128 @@
+"""
+jpamb.shards
+
+This module splits the methods of the suite into shards, that can be
+evaluated on different machines, and merges the reports of the shards into
+a single report.
+
+"""
+
+from dataclasses import dataclass
+from typing import Iterable
+import statistics
+
+
+@dataclass(frozen=True)
+class Shard:
+    """The index'th of count shards, counting from 1."""
+
+    index: int
+    count: int
+
+    def __post_init__(self):
+        if not 1 <= self.index <= self.count:
+            raise ValueError(f"Expected a shard i/n with 1 <= i <= n, got {self}")
+
+    @staticmethod
+    def decode(shard: str) -> "Shard":
+        try:
+            index, count = (int(x) for x in shard.split("/"))
+        except ValueError as e:
+            raise ValueError(f"Expected a shard of the form i/n, got {shard!r}") from e
+        return Shard(index, count)
+
+    def encode(self) -> str:
+        return f"{self.index}/{self.count}"
+
+    def __str__(self) -> str:
+        return self.encode()
+
+    def select(self, methods: Iterable, weights: dict[str, float] | None = None):
+        """The methods in this shard, see `partition`."""
+        return partition(methods, self.count, weights)[self.index - 1]
+
+
+def partition(
+    methods: Iterable, count: int, weights: dict[str, float] | None = None
+) -> list[list]:
+    """Deterministically partition the methods into count shards.
+
+    The methods are greedily placed, heaviest first, in the lightest shard,
+    where the weight of a method is looked up by its string in weights.
+    Methods without a weight get the median weight, and without any weights
+    all methods weigh the same, which deals the methods out in sorted order.
+    """
+    methods = sorted(methods, key=str)
+    weights = weights or {}
+    default = statistics.median(weights.values()) if weights else 1.0
+
+    def weight(m):
+        return weights.get(str(m), default)
+
+    shards = [[] for _ in range(count)]
+    loads = [0.0] * count
+    for m in sorted(methods, key=lambda m: (-weight(m), str(m))):
+        i = min(range(count), key=lambda i: (loads[i], i))
+        shards[i].append(m)
+        loads[i] += weight(m)
+
+    for shard in shards:
+        shard.sort(key=str)
+    return shards
+
+
+def runtimes(report: dict) -> dict[str, float]:
+    """The total time spent on each method in an evaluation report."""
+    return {m: r["time"] * len(r["iterations"]) for m, r in report["bymethod"].items()}
+
+
+def summarize(bymethod: dict) -> dict:
+    """The totals of an evaluation report over the results of each method."""
+    methods = list(bymethod.values())
+    has_usage = all(m.get("cputime") is not None for m in methods)
+    n = len(methods)
+    return {
+        "score": sum(m["score"] for m in methods),
+        "time": sum(m["time"] for m in methods) / n if n else None,
+        "relative": sum(m["relative"] for m in methods) / n if n else None,
+        "cputime": (
+            sum(m.get("cputime") for m in methods) / n if n and has_usage else None
+        ),
+        "maxrss": max((m["maxrss"] for m in methods), default=0) if has_usage else None,
+    }
+
+
+def merge(reports: list[dict], order: Iterable[str] = ()) -> dict:
+    """Merge the reports of the shards of an evaluation into a single report.
+
+    The methods are ordered by order, followed by any remaining methods in
+    the order of the reports.
+    """
+    if not reports:
+        raise ValueError("Expected at least one report to merge")
+
+    first = reports[0]
+    bymethod = {}
+    for report in reports:
+        for key in ("info", "kernel"):
+            if report.get(key) != first.get(key):
+                raise ValueError(
+                    f"Cannot merge reports with different {key}: "
+                    f"{first.get(key)!r} and {report.get(key)!r}"
+                )
+        for m, result in report["bymethod"].items():
+            if m in bymethod:
+                raise ValueError(f"The method {m} is in more than one report")
+            bymethod[m] = result
+
+    ordered = {m: bymethod.pop(m) for m in order if m in bymethod}
+    ordered.update(bymethod)
+
+    return {
+        "info": first["info"],
+        "bymethod": ordered,
+        **summarize(ordered),
+        "kernel": first.get("kernel"),
+        "calibrations": sum(r.get("calibrations", 0) for r in reports),
+        "drifts": sum(r.get("drifts", 0) for r in reports),
+    }
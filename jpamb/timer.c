@@ -1,13 +1,15 @@
-// The Sieve of Eratosthenes
+// Calibration kernels: the Sieve of Eratosthenes, pointer chasing,
+// branchy integer code, and allocation of Python objects.
 #include <stdio.h>
 #include <stdlib.h>
+#include <stdint.h>
 #include <math.h>
 #include <Python.h>
 
 int sieve_of_eratosthenes(int n) {
     if (n <= 1) { return 2; }
-    int limit = ceil(n * log(n) + n * log(log(n))); 
-    char *is_prime = (char*) calloc(limit + 1, sizeof(char)); 
+    int limit = ceil(n * log(n) + n * log(log(n)));
+    char *is_prime = (char*) calloc(limit + 1, sizeof(char));
 
     if (is_prime == NULL) {
         fprintf(stderr, "limit = %d\n", limit);
@@ -17,7 +19,7 @@ int sieve_of_eratosthenes(int n) {
 
     int count = 1, i = 2;
     for (; i <= limit + 1; i++) {
-        if (is_prime[i] == 0) { 
+        if (is_prime[i] == 0) {
             if (count++ == n) break;
             for (int j = i * 2; j <= limit; j += i) is_prime[j] = 1;
         }
@@ -27,15 +29,123 @@ int sieve_of_eratosthenes(int n) {
     return i;
 }
 
+// A small deterministic pseudo random number generator (xorshift32)
+static uint32_t xorshift32(uint32_t *state) {
+    uint32_t x = *state;
+    x ^= x << 13;
+    x ^= x >> 17;
+    x ^= x << 5;
+    return *state = x;
+}
+
+// The slots of the cycle chased by default, 32 MB, which is larger than the
+// last level cache of most machines, so the chase misses it and goes to DRAM.
+#define CHASE_SLOTS (1 << 23)
+
+static uint32_t *cycle = NULL;
+static int cycle_slots = 0;
+
+// Build a single random cycle through n slots, which is kept between calls,
+// as building it is far slower than chasing it. Returns -1 if the memory
+// could not be allocated.
+static int build_cycle(int n) {
+    if (cycle != NULL && cycle_slots == n) { return 0; }
+    uint32_t *next = (uint32_t*) realloc(cycle, n * sizeof(uint32_t));
+    if (next == NULL) { return -1; }
+    cycle = next;
+    cycle_slots = n;
+
+    // Sattolo's algorithm creates a random permutation with a single cycle
+    for (int i = 0; i < n; i++) next[i] = i;
+    uint32_t state = 2463534242u;
+    for (int i = n - 1; i > 0; i--) {
+        int j = xorshift32(&state) % i;
+        uint32_t t = next[i];
+        next[i] = next[j];
+        next[j] = t;
+    }
+    return 0;
+}
+
+// Take n steps along a single random cycle through slots slots. Every step
+// is a dependent load from a random address, so it is dominated by cache
+// misses. Returns -1 if the memory could not be allocated.
+long pointer_chase(int n, int slots) {
+    if (slots <= 1) { return 0; }
+    if (build_cycle(slots) < 0) { return -1; }
+
+    uint32_t at = 0;
+    for (int i = 0; i < n; i++) at = cycle[at];
+    return at;
+}
+
+// Count the total number of collatz steps of all numbers below n, which
+// branches unpredictably on the parity of every intermediate value.
+long collatz_steps(int n) {
+    long total = 0;
+    for (int i = 1; i < n; i++) {
+        uint64_t x = i;
+        while (x != 1) {
+            if (x & 1) {
+                x = 3 * x + 1;
+            } else {
+                x >>= 1;
+            }
+            total++;
+        }
+    }
+    return total;
+}
+
 static PyObject* sieve(PyObject* self, PyObject* args) {
     int i;
-    PyArg_ParseTuple(args, "i", &i);
+    if (!PyArg_ParseTuple(args, "i", &i)) { return NULL; }
     int nth_prime = sieve_of_eratosthenes(i);
-    return PyLong_FromLong(nth_prime);  
+    return PyLong_FromLong(nth_prime);
+}
+
+static PyObject* chase(PyObject* self, PyObject* args) {
+    int i, slots = CHASE_SLOTS;
+    if (!PyArg_ParseTuple(args, "i|i", &i, &slots)) { return NULL; }
+    long at = pointer_chase(i, slots);
+    if (at < 0) { return PyErr_NoMemory(); }
+    return PyLong_FromLong(at);
+}
+
+static PyObject* branchy(PyObject* self, PyObject* args) {
+    int i;
+    if (!PyArg_ParseTuple(args, "i", &i)) { return NULL; }
+    return PyLong_FromLong(collatz_steps(i));
+}
+
+// Build a list of n small dictionaries containing tuples and integers, and
+// throw it away again, exercising the Python allocator and reference counts.
+static PyObject* allocate(PyObject* self, PyObject* args) {
+    int n;
+    if (!PyArg_ParseTuple(args, "i", &n)) { return NULL; }
+    PyObject *list = PyList_New(0);
+    if (list == NULL) { return NULL; }
+
+    for (int i = 0; i < n; i++) {
+        PyObject *item = Py_BuildValue("{s:i,s:(ii)}", "index", i, "pair", i, -i);
+        if (item == NULL || PyList_Append(list, item) < 0) {
+            Py_XDECREF(item);
+            Py_DECREF(list);
+            return NULL;
+        }
+        Py_DECREF(item);
+    }
+
+    Py_ssize_t size = PyList_Size(list);
+    Py_DECREF(list);
+    return PyLong_FromSsize_t(size);
 }
 
 static PyMethodDef TimerMethods[] = {
     {"sieve", sieve, METH_VARARGS, "Computes the sieve"},
+    {"chase", chase, METH_VARARGS, "Takes n steps along a random cycle of slots"},
+    {"branchy", branchy, METH_VARARGS, "Counts collatz steps below n"},
+    {"allocate", allocate, METH_VARARGS, "Allocates and frees n python objects"},
     {NULL, NULL, 0, NULL}  // Sentinel
 };
 
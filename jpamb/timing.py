@@ -0,0 +1,182 @@
+"""
+jpamb.timing
+
+This module contains the statistics used to summarize repeated time
+measurements of an analysis.
+
+"""
+
+from dataclasses import dataclass
+from loguru import logger
+import math
+import statistics
+
+# Two-sided 95% quantiles of the Student t distribution, indexed by the
+# degrees of freedom minus one. Above 30 degrees of freedom we use the
+# normal approximation.
+T95 = (
+    12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
+    2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
+    2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042,
+)  # fmt: skip
+
+
+def t95(df: int) -> float:
+    """The two-sided 95% quantile of the t distribution with df degrees of freedom"""
+    assert df > 0, "need at least one degree of freedom"
+    if df <= len(T95):
+        return T95[df - 1]
+    return 1.960
+
+
+@dataclass(frozen=True)
+class Summary:
+    """A summary of a list of samples.
+
+    The confidence interval is the 95% confidence interval of the mean, and
+    is infinitely wide if there are fewer than two samples.
+    """
+
+    count: int
+    mean: float
+    median: float
+    mad: float
+    ci: tuple[float, float]
+
+    @staticmethod
+    def of(samples: list[float]) -> "Summary":
+        assert samples, "expected at least one sample"
+        mean = statistics.fmean(samples)
+        median = statistics.median(samples)
+        mad = statistics.median(abs(s - median) for s in samples)
+        if len(samples) < 2:
+            ci = (-math.inf, math.inf)
+        else:
+            half = t95(len(samples) - 1) * statistics.stdev(samples)
+            half /= math.sqrt(len(samples))
+            ci = (mean - half, mean + half)
+        return Summary(len(samples), mean, median, mad, ci)
+
+    @property
+    def rel_ci(self) -> float:
+        """The half width of the confidence interval relative to the mean"""
+        if self.mean == 0:
+            return math.inf
+        return (self.ci[1] - self.ci[0]) / 2 / abs(self.mean)
+
+    def to_json(self) -> dict:
+        return {
+            "count": self.count,
+            "mean": self.mean,
+            "median": self.median,
+            "mad": self.mad,
+            "ci": list(self.ci) if self.count > 1 else None,
+        }
+
+
+# The calibration kernels of `jpamb.timer` and their arguments, chosen so
+# that each runs in about 10ms on a laptop.
+KERNELS = {
+    "sieve": 100_000,  # tight compute loops
+    "chase": 100_000,  # cache misses, in a cycle larger than the cache
+    "branchy": 30_000,  # unpredictable branches
+    "allocate": 20_000,  # python objects
+}
+
+
+def kernel_time(kernel: str = "sieve") -> int:
+    """The time in nanoseconds it takes to run a kernel of `jpamb.timer`"""
+    from time import perf_counter_ns
+    from jpamb import timer
+
+    fn = getattr(timer, kernel)
+    count = KERNELS[kernel]
+
+    start = perf_counter_ns()
+    fn(count)
+    end = perf_counter_ns()
+    return end - start
+
+
+def profile(repeat: int = 5) -> dict:
+    """A fingerprint of the machine, with the median time of every kernel"""
+    import os
+    import platform
+
+    kernels = {}
+    for kernel in KERNELS:
+        kernel_time(kernel)  # warm up
+        kernels[kernel] = statistics.median(kernel_time(kernel) for _ in range(repeat))
+
+    return {
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+        "kernels": kernels,
+    }
+
+
+class Calibrator:
+    """A rolling estimate of the speed of the machine.
+
+    Instead of calibrating around every run, the machine is sampled at most
+    once every `interval` seconds, when `tick` is called between runs. The
+    estimate is the median of the last `window` samples. If a sample
+    deviates more than `drift` (relatively) from the estimate, the machine
+    has changed speed, and the older samples are discarded.
+    """
+
+    def __init__(
+        self,
+        interval: float = 1.0,
+        window: int = 5,
+        drift: float = 0.25,
+        sample=kernel_time,
+        clock=None,
+    ):
+        from time import monotonic
+
+        assert window > 0, "the window should contain at least one sample"
+        self.interval = interval
+        self.window = window
+        self.drift = drift
+        self._sample = sample
+        self._clock = clock or monotonic
+        self.samples: list[tuple[float, int]] = []
+        self.calibrations = 0
+        self.drifts = 0
+
+    def calibrate(self) -> int:
+        """Sample the machine now, and return the sample"""
+        x = self._sample()
+        self.calibrations += 1
+        if self.samples:
+            current = self.estimate()
+            if abs(x - current) > self.drift * current:
+                logger.warning(
+                    f"Calibration drifted from {current} to {x}, recalibrating"
+                )
+                self.drifts += 1
+                self.samples.clear()
+        self.samples.append((self._clock(), x))
+        del self.samples[: -self.window]
+        return x
+
+    def tick(self):
+        """Sample the machine if the last sample is older than the interval"""
+        if not self.samples or self._clock() - self.samples[-1][0] >= self.interval:
+            self.calibrate()
+
+    def estimate(self) -> float:
+        """The current estimate of the calibration time in nanoseconds"""
+        if not self.samples:
+            self.calibrate()
+        return statistics.median(x for _, x in self.samples)
+
+    def nearest(self) -> int:
+        """The most recent sample, i.e., the one nearest to a run after `tick`"""
+        if not self.samples:
+            self.calibrate()
+        return self.samples[-1][1]
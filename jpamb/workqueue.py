@@ -0,0 +1,131 @@
+"""
+jpamb.workqueue
+
+This module provides a work queue in a shared folder, which lets any number
+of processes, on any number of machines, share the work of an evaluation
+without any other service than the file system.
+
+The queue consists of a configuration and three folders. A task is a file
+in `todo/`, which is claimed by renaming it into `claimed/`, and completed
+by writing its result to `done/`. Renames within a file system are atomic,
+so only one worker can claim each task. The configuration is written after
+the tasks, so a worker that finds it also finds the tasks.
+
+"""
+
+from pathlib import Path
+from typing import Iterator
+from loguru import logger
+import json
+import os
+import shutil
+import socket
+import time
+
+
+class WorkQueue:
+    def __init__(self, folder: Path):
+        self.folder = folder
+
+    @property
+    def config_file(self) -> Path:
+        return self.folder / "config.json"
+
+    @property
+    def todo_folder(self) -> Path:
+        return self.folder / "todo"
+
+    @property
+    def claimed_folder(self) -> Path:
+        return self.folder / "claimed"
+
+    @property
+    def done_folder(self) -> Path:
+        return self.folder / "done"
+
+    def setup(self, config: dict, tasks: dict[str, dict] | None = None):
+        """Create a queue with a configuration and tasks, removing any old
+        tasks."""
+        self.config_file.unlink(missing_ok=True)
+        for folder in (self.todo_folder, self.claimed_folder, self.done_folder):
+            shutil.rmtree(folder, ignore_errors=True)
+            folder.mkdir(parents=True)
+        for name, task in (tasks or {}).items():
+            self.enqueue(name, task)
+        self._write(self.config_file, config)
+
+    def ready(self) -> bool:
+        """Whether the queue has been set up."""
+        return self.config_file.exists()
+
+    def config(self) -> dict:
+        with open(self.config_file) as f:
+            return json.load(f)
+
+    def enqueue(self, name: str, task: dict):
+        """Add a task to the queue, the name should be a valid unique file name."""
+        self._write(self.todo_folder / f"{name}.json", task)
+
+    def claim(self) -> tuple[str, dict] | None:
+        """Claim the first unclaimed task, or return None if there are none."""
+        worker = f"{socket.gethostname()}.{os.getpid()}"
+        for file in sorted(self.todo_folder.glob("*.json")):
+            claimed = self.claimed_folder / file.name
+            try:
+                # Refresh the mtime before the rename, so requeue never sees
+                # a claimed task with the time it was enqueued. Unlike touch,
+                # utime does not recreate a task claimed since the glob
+                os.utime(file)
+                file.rename(claimed)
+            except FileNotFoundError:
+                # Another worker claimed it first
+                continue
+            logger.debug(f"{worker} claimed {file.stem}")
+            with open(claimed) as f:
+                return file.stem, json.load(f)
+        return None
+
+    def complete(self, name: str, result: dict):
+        """Write the result of a claimed task."""
+        self._write(self.done_folder / f"{name}.json", result)
+        (self.claimed_folder / f"{name}.json").unlink(missing_ok=True)
+
+    def requeue(self, lease: float) -> list[str]:
+        """Put back tasks that were claimed more than lease seconds ago."""
+        requeued = []
+        for file in self.claimed_folder.glob("*.json"):
+            try:
+                if time.time() - file.stat().st_mtime < lease:
+                    continue
+                if (self.done_folder / file.name).exists():
+                    file.unlink()
+                    continue
+                file.rename(self.todo_folder / file.name)
+            except FileNotFoundError:
+                continue
+            logger.warning(f"Requeued {file.stem}, claimed more than {lease}s ago")
+            requeued.append(file.stem)
+        return requeued
+
+    def remaining(self) -> int:
+        """The number of tasks without a result."""
+        return len(list(self.todo_folder.glob("*.json"))) + len(
+            [
+                f
+                for f in self.claimed_folder.glob("*.json")
+                if not (self.done_folder / f.name).exists()
+            ]
+        )
+
+    def results(self) -> Iterator[tuple[str, dict]]:
+        """The completed tasks and their results, ordered by name."""
+        for file in sorted(self.done_folder.glob("*.json")):
+            with open(file) as f:
+                yield file.stem, json.load(f)
+
+    def _write(self, file: Path, content: dict):
+        # Write to a temporary file first, so readers never see partial files.
+        tmp = file.parent / f".{file.name}.{socket.gethostname()}.{os.getpid()}"
+        with open(tmp, "w") as f:
+            json.dump(content, f)
+        tmp.rename(file)
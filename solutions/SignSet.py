@@ -30,6 +30,10 @@ class SignSet:
         if v > 0: return SignSet.pos()
         return SignSet.zero()
 
+    @staticmethod
+    def of_flags(neg: bool, zero: bool, pos: bool) -> "SignSet":
+        return SignSet(( _NEG if neg else 0 ) | ( _ZERO if zero else 0 ) | ( _POS if pos else 0 ))
+
     def __str__(self) -> str:
         if self.mask == 0: return "⊥"
         if self.mask == (_NEG | _ZERO | _POS): return "⊤"
@@ -76,8 +80,7 @@ class SignSet:
         return (self.mask & _POS) != 0
 
     def _from_flags(self, neg: bool, zero: bool, pos: bool) -> "SignSet":
-        m = ( _NEG if neg else 0 ) | ( _ZERO if zero else 0 ) | ( _POS if pos else 0 )
-        return SignSet(m)
+        return SignSet.of_flags(neg, zero, pos)
     
     ### abstract arithmetic
 
@@ -118,7 +121,7 @@ class SignSet:
             return (SignSet.bot(), dz)
         neg = (a.may_be_neg() and (B_nz & _POS)) or (a.may_be_pos() and (B_nz & _NEG))
         pos = (a.may_be_pos() and (B_nz & _POS)) or (a.may_be_neg() and (B_nz & _NEG))
-        zero = a.may_be_zero()                     # ← only this
+        zero = not a.is_bot()                      # division truncates, e.g. 1 / 2 = 0
         return (self._from_flags(bool(neg), bool(zero), bool(pos)), dz)
 
 
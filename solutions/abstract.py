@@ -0,0 +1,572 @@
+"""The abstract interpreter, for any of the domains in `domains.py`.
+
+A method is analyzed with a worklist of offsets, in the order of the
+bytecode, where the state at an offset is the join of the states that reach
+it. At the head of a loop the states are widened after `widen_after`
+visits, so the analysis ends for domains with infinite chains, and a state
+that is below the state already at an offset is not propagated.
+
+The states are immutable, so the successors of a state at an offset are
+cached, and the analysis of a method with the same arguments, from another
+call, or of a loop visited again, reuses them. Calls are given by the
+summaries of the called methods, per tuple of abstract arguments.
+
+The methods outside the suite, like those of `String`, are assumed to return
+any value without throwing, so the analysis misses that `String.substring`
+may be out of bounds. Taint is not tracked, so it never finds the
+`Vulnerable` cases.
+"""
+
+from dataclasses import dataclass
+import heapq
+from typing import Any
+
+import jpamb
+from jpamb import jvm
+from loguru import logger
+
+from domains import Domain, Lattice, Lengths, Signs, NEGATED, assume, is_bottom
+
+# The calls analyzed inside each other, beyond which the arguments are
+# abstracted to the top, so recursion on constants ends
+MAX_DEPTH = 50
+
+# The ranges of the narrowing casts and of the array elements
+RANGES = {
+    jvm.Byte(): (-(2**7), 2**7 - 1),
+    jvm.Short(): (-(2**15), 2**15 - 1),
+    jvm.Char(): (0, 2**16 - 1),
+    jvm.Boolean(): (0, 1),
+}
+
+
+@dataclass(frozen=True)
+class Ref:
+    """A reference, with the lengths of the arrays it may point to, which
+    are bottom if it is null, and whether it may be null."""
+
+    length: Any
+    null: bool
+
+
+@dataclass(frozen=True)
+class AState:
+    """The locals, the stack, and for each value on the stack, the local it
+    was loaded from, if that local has not changed since."""
+
+    locals: tuple[tuple[int, Any], ...]
+    stack: tuple[Any, ...]
+    origins: tuple[int | None, ...]
+
+    def local(self, index: int):
+        for i, v in self.locals:
+            if i == index:
+                return v
+        return None
+
+    def with_local(self, index: int, value) -> "AState":
+        locals = tuple(sorted({**dict(self.locals), index: value}.items()))
+        origins = tuple(None if o == index else o for o in self.origins)
+        return AState(locals, self.stack, origins)
+
+    def push(self, value, origin: int | None = None) -> "AState":
+        return AState(self.locals, self.stack + (value,), self.origins + (origin,))
+
+    def pop(self, n: int = 1) -> tuple["AState", tuple]:
+        """The state without the n values on the top of the stack, and the
+        values, with the top last."""
+        k = len(self.stack) - n
+        return AState(self.locals, self.stack[:k], self.origins[:k]), self.stack[k:]
+
+
+@dataclass(frozen=True)
+class Summary:
+    """What a call of a method can do: return normally, with the value if it
+    returns one, or end in one of the errors."""
+
+    returns: bool
+    value: Any
+    errors: frozenset[str]
+
+    @staticmethod
+    def bottom() -> "Summary":
+        return Summary(False, None, frozenset())
+
+
+@dataclass(frozen=True)
+class Step:
+    """The successors of a state, as pairs of an offset and a state, and the
+    outcomes of the method that the state may lead to directly."""
+
+    successors: tuple[tuple[int, AState], ...] = ()
+    errors: frozenset[str] = frozenset()
+    returns: bool = False
+    value: Any = None
+
+
+@dataclass
+class Result:
+    """The states of a method, per offset, and its summary."""
+
+    states: dict[int, AState]
+    summary: Summary
+
+    @property
+    def outcomes(self) -> set[str]:
+        """The outcomes the method may end in, where a method that can
+        neither return nor throw runs forever."""
+        outcomes = set(self.summary.errors)
+        if self.summary.returns:
+            outcomes.add("ok")
+        return outcomes or {"*"}
+
+
+def is_reference(type: jvm.Type | None) -> bool:
+    return isinstance(type, (jvm.Reference, jvm.Object, jvm.Array))
+
+
+class Analysis:
+    """The abstract interpreter for a domain of the integer values and a
+    lattice of the lengths of arrays.
+
+    A method is analyzed once per arguments, and the summary is reused at
+    every call with the same arguments. A recursive call reads the summary
+    computed so far, starting from the bottom, and the method is analyzed
+    again until its summary does not change. The summaries that depend on
+    such an unfinished summary are only kept until it is finished, and the
+    steps that read one are not cached.
+    """
+
+    def __init__(
+        self,
+        suite: jpamb.Suite,
+        values: Domain | None = None,
+        lengths: Lattice | None = None,
+        widen_after: int = 3,
+    ):
+        self.suite = suite
+        self.values = values or Signs()
+        self.lengths = lengths or Lengths()
+        self.widen_after = widen_after
+        self.methods: dict[jvm.AbsMethodID, list[jvm.Opcode]] = {}
+        self.steps: dict[tuple, Step] = {}
+        self.done: dict[tuple, Summary] = {}
+        self.partial: dict[tuple, Summary] = {}
+        # The calls being analyzed, and the lowest of them each depends on
+        self.active: list[tuple] = []
+        self.lowest: list[int] = []
+        # Whether the current step read a summary that is not finished
+        self.unfinished = False
+        self.analyses = 0
+        self.hits = 0
+        self.cached = 0
+
+    # values
+
+    def top(self, type: jvm.Type | None):
+        if is_reference(type):
+            return Ref(self.lengths.top(), True)
+        if type in RANGES:
+            return self.values.restrict(self.values.top(), *RANGES[type])
+        return self.values.top()
+
+    def const(self, value: jvm.Value):
+        match value:
+            case jvm.Value(type=jvm.Boolean(), value=b):
+                return self.values.const(1 if b else 0)
+            case jvm.Value(type=jvm.Char(), value=c):
+                return self.values.const(ord(c))
+            case jvm.Value(type=jvm.Int() | jvm.Byte() | jvm.Short(), value=n):
+                return self.values.const(n)
+            case jvm.Value(type=jvm.Array(), value=items):
+                length = self.lengths.top()
+                return Ref(self.lengths.restrict(length, len(items), len(items)), False)
+            case jvm.Value(value=None) if is_reference(value.type):
+                return Ref(self.lengths.bottom(), True)
+            case jvm.Value(type=type):
+                if is_reference(type):
+                    return Ref(self.lengths.top(), False)
+                return self.top(type)
+
+    def widest(self, a):
+        if isinstance(a, Ref):
+            return Ref(self.lengths.top(), True)
+        return self.values.top()
+
+    def combine(self, a, b, widen: bool):
+        """The join, or the widening, of two values, or None if they are not
+        of the same kind, as a local can hold both."""
+        match a, b:
+            case Ref(), Ref():
+                op = self.lengths.widen if widen else self.lengths.join
+                return Ref(op(a.length, b.length), a.null or b.null)
+            case (Ref(), _) | (_, Ref()):
+                return None
+        return self.values.widen(a, b) if widen else self.values.join(a, b)
+
+    def leq(self, a, b) -> bool:
+        match a, b:
+            case Ref(), Ref():
+                return self.lengths.leq(a.length, b.length) and b.null >= a.null
+            case (Ref(), _) | (_, Ref()):
+                return False
+        return self.values.leq(a, b)
+
+    # states
+
+    def join(self, a: AState, b: AState, widen: bool = False) -> AState:
+        assert len(a.stack) == len(b.stack), "The stacks of a join differ"
+        locals = []
+        for i, v in a.locals:
+            w = b.local(i)
+            if w is not None and (v := self.combine(v, w, widen)) is not None:
+                locals.append((i, v))
+        stack = tuple(self.combine(v, w, widen) for v, w in zip(a.stack, b.stack))
+        origins = tuple(o if o == p else None for o, p in zip(a.origins, b.origins))
+        return AState(tuple(locals), stack, origins)
+
+    def below(self, a: AState, b: AState) -> bool:
+        """Whether a is below b, where a missing local is the top."""
+        return all(
+            (v := a.local(i)) is not None and self.leq(v, w) for i, w in b.locals
+        ) and all(self.leq(v, w) for v, w in zip(a.stack, b.stack))
+
+    def refine(self, state: AState, position: int, value) -> AState:
+        """The state where the value at the position on the stack, counted
+        from the top, and the local it was loaded from, are refined."""
+        k = len(state.stack) - 1 - position
+        stack = state.stack[:k] + (value,) + state.stack[k + 1 :]
+        locals = state.locals
+        if (origin := state.origins[k]) is not None:
+            locals = tuple((i, value if i == origin else v) for i, v in locals)
+        return AState(locals, stack, state.origins)
+
+    # methods
+
+    def opcodes(self, method: jvm.AbsMethodID) -> list[jvm.Opcode]:
+        if method not in self.methods:
+            self.methods[method] = list(self.suite.method_opcodes(method))
+        return self.methods[method]
+
+    def analyze(self, method: jvm.AbsMethodID, args: tuple) -> Result:
+        """The states of the method called with the arguments, and its
+        summary."""
+        opcodes = self.opcodes(method)
+        self.analyses += 1
+        # The targets of the backward jumps, where the offsets are the
+        # indices of the opcodes
+        heads = {
+            op.target
+            for i, op in enumerate(opcodes)
+            if isinstance(op, (jvm.Goto, jvm.If, jvm.Ifz)) and op.target <= i
+        }
+
+        states = {0: AState(tuple(enumerate(args)), (), ())}
+        visits = dict.fromkeys(heads, 0)
+        worklist, queued = [0], {0}
+        summary = Summary.bottom()
+        while worklist:
+            offset = heapq.heappop(worklist)
+            queued.discard(offset)
+            step = self.step(method, offset, opcodes[offset], states[offset])
+            summary = self.join_summaries(
+                summary, Summary(step.returns, step.value, step.errors)
+            )
+            for target, new in step.successors:
+                old = states.get(target)
+                if old is not None:
+                    if self.below(new, old):
+                        continue
+                    widen = target in heads and visits[target] >= self.widen_after
+                    new = self.join(old, new, widen)
+                if target in heads:
+                    visits[target] += 1
+                states[target] = new
+                if target not in queued:
+                    queued.add(target)
+                    heapq.heappush(worklist, target)
+        return Result(states, summary)
+
+    def join_summaries(self, a: Summary, b: Summary) -> Summary:
+        if not a.returns:
+            value = b.value
+        elif not b.returns or a.value is None:
+            value = a.value
+        else:
+            value = self.combine(a.value, b.value, False)
+        return Summary(a.returns or b.returns, value, a.errors | b.errors)
+
+    def summary(self, method: jvm.AbsMethodID, args: tuple) -> Summary:
+        if len(self.active) >= MAX_DEPTH:
+            args = tuple(self.widest(a) for a in args)
+        calls = [a for m, a in self.active if m == method]
+        if calls and args != calls[-1]:
+            # A call of an active method is recursion, whatever the
+            # arguments, so they are widened into those of the active call,
+            # or like the intervals of fib(n - 1) every call gets a new key
+            args = tuple(
+                self.widest(b) if (w := self.combine(a, b, True)) is None else w
+                for a, b in zip(calls[-1], args)
+            )
+        key = (method, args)
+        if key in self.done:
+            self.hits += 1
+            return self.done[key]
+        if key in self.active:
+            self.lowest[-1] = min(self.lowest[-1], self.active.index(key))
+            self.unfinished = True
+            return self.partial.get(key, Summary.bottom())
+
+        try:
+            self.opcodes(method)
+        except Exception as e:
+            logger.debug(f"Can not analyze {method}: {e!r}")
+            value = self.top(method.extension.return_type)
+            self.done[key] = Summary(True, value, frozenset())
+            return self.done[key]
+
+        # The steps of the call only make the caller unfinished through the
+        # summary
+        unfinished = self.unfinished
+        self.active.append(key)
+        self.lowest.append(len(self.active) - 1)
+        try:
+            while True:
+                old = self.partial.get(key, Summary.bottom())
+                new = self.join_summaries(old, self.analyze(method, args).summary)
+                if new == old:
+                    break
+                self.partial[key] = new
+        finally:
+            self.active.pop()
+            lowest = self.lowest.pop()
+            self.unfinished = unfinished
+
+        if lowest >= len(self.active):
+            self.done[key] = new
+            self.partial.pop(key, None)
+        else:
+            self.lowest[-1] = min(self.lowest[-1], lowest)
+            self.unfinished = True
+        return new
+
+    def step(
+        self, method: jvm.AbsMethodID, offset: int, opr: jvm.Opcode, state: AState
+    ) -> Step:
+        """The cached step of the state, unless it read an unfinished
+        summary."""
+        key = (method, offset, state)
+        if key in self.steps:
+            self.cached += 1
+            return self.steps[key]
+        unfinished, self.unfinished = self.unfinished, False
+        step = self.transfer(offset, opr, state)
+        if not self.unfinished:
+            self.steps[key] = step
+        self.unfinished = unfinished or self.unfinished
+        return step
+
+    # transfer
+
+    def transfer(self, offset: int, opr: jvm.Opcode, state: AState) -> Step:
+        values, next = self.values, offset + 1
+        match opr:
+            case jvm.Push(value=v):
+                return Step(((next, state.push(self.const(v))),))
+            case jvm.Load(type=type, index=i):
+                v = state.local(i)
+                if v is None:
+                    v = self.top(type)
+                return Step(((next, state.push(v, i)),))
+            case jvm.Store(index=i):
+                state, (v,) = state.pop()
+                return Step(((next, state.with_local(i, v)),))
+            case jvm.Incr(index=i, amount=amount):
+                v = state.local(i)
+                if v is None:
+                    v = values.top()
+                v, _ = values.binary(jvm.BinaryOpr.Add, v, values.const(amount))
+                return Step(((next, state.with_local(i, v)),))
+            case jvm.Dup(words=words):
+                k = len(state.stack) - words
+                for v, o in zip(state.stack[k:], state.origins[k:]):
+                    state = state.push(v, o)
+                return Step(((next, state),))
+            case jvm.Get(field=field):
+                if field.extension.name == "$assertionsDisabled":
+                    v = values.const(0)
+                else:
+                    v = self.top(field.extension.type)
+                return Step(((next, state.push(v)),))
+            case jvm.Binary(type=jvm.Int(), operant=operant):
+                after, (a, b) = state.pop(2)
+                v, may_divide_by_zero = values.binary(operant, a, b)
+                successors = ()
+                if not is_bottom(values, v):
+                    successors = ((next, after.push(v)),)
+                errors = frozenset(["divide by zero"] if may_divide_by_zero else [])
+                return Step(successors, errors)
+            case jvm.Binary(type=type, operant=operant):
+                after, (_, b) = state.pop(2)
+                errors = frozenset()
+                if operant in (jvm.BinaryOpr.Div, jvm.BinaryOpr.Rem):
+                    lo, hi = values.bounds(b)
+                    if type == jvm.Long() and lo <= 0 <= hi:
+                        errors = frozenset(["divide by zero"])
+                return Step(((next, after.push(values.top())),), errors)
+            case jvm.Cast(to_=to_):
+                after, (v,) = state.pop()
+                if to_ in RANGES:
+                    lo, hi = values.bounds(v)
+                    rlo, rhi = RANGES[to_]
+                    if not rlo <= lo <= hi <= rhi:
+                        v = self.top(to_)
+                elif to_ not in (jvm.Int(), jvm.Long()):
+                    v = values.top()
+                return Step(((next, after.push(v)),))
+            case jvm.Goto(target=target):
+                return Step(((target, state),))
+            case jvm.Ifz(condition=condition, target=target):
+                return Step(self.branch(state, 1, condition, next, target))
+            case jvm.If(condition=condition, target=target):
+                return Step(self.branch(state, 2, condition, next, target))
+            case jvm.NewArray(dim=1):
+                after, (size,) = state.pop()
+                # The negative sizes throw an exception that is not one of the
+                # outcomes, so only the other sizes are followed
+                lo, hi = values.bounds(size)
+                length = self.lengths.restrict(self.lengths.top(), max(lo, 0), hi)
+                if is_bottom(self.lengths, length):
+                    return Step()
+                return Step(((next, after.push(Ref(length, False))),))
+            case jvm.NewArray(dim=dim):
+                after, _ = state.pop(dim)
+                return Step(((next, after.push(Ref(self.lengths.top(), False))),))
+            case jvm.New():
+                return Step(((next, state.push(Ref(self.lengths.top(), False))),))
+            case jvm.ArrayLength():
+                after, (ref,) = state.pop()
+                errors = frozenset(["null pointer"] if ref.null else [])
+                if is_bottom(self.lengths, ref.length):
+                    return Step((), errors)
+                length = values.restrict(values.top(), *self.lengths.bounds(ref.length))
+                return Step(((next, after.push(length)),), errors)
+            case jvm.ArrayLoad(type=type):
+                return self.access(state, 2, next, self.top(type))
+            case jvm.ArrayStore():
+                return self.access(state, 3, next, None)
+            case jvm.InvokeStatic(method=m) | jvm.InvokeVirtual(method=m):
+                n = len(m.extension.params) + isinstance(opr, jvm.InvokeVirtual)
+                after, args = state.pop(n)
+                summary = self.summary(m, args)
+                successors = ()
+                if summary.returns:
+                    if m.extension.return_type is not None:
+                        after = after.push(summary.value)
+                    successors = ((next, after),)
+                return Step(successors, summary.errors)
+            case (
+                jvm.InvokeSpecial(method=m)
+                | jvm.InvokeInterface(method=m)
+                | jvm.InvokeDynamic(method=m)
+            ):
+                # Constructors, and calls that are not analyzed
+                n = len(m.extension.params) + (not isinstance(opr, jvm.InvokeDynamic))
+                after, _ = state.pop(n)
+                if m.extension.return_type is not None:
+                    after = after.push(self.top(m.extension.return_type))
+                return Step(((next, after),))
+            case jvm.Throw():
+                return Step((), frozenset(["assertion error"]))
+            case jvm.Return(type=None):
+                return Step(returns=True)
+            case jvm.Return():
+                return Step(returns=True, value=state.stack[-1])
+            case _:
+                raise NotImplementedError(f"Don't know how to analyze: {opr!r}")
+
+    def branch(
+        self, state: AState, n: int, condition: str, next: int, target: int
+    ) -> tuple[tuple[int, AState], ...]:
+        """The successors of a conditional jump on the n values on top of the
+        stack, where each branch refines the values, and the locals they were
+        loaded from."""
+        if condition in ("is", "isnot"):
+            return self.branch_null(state, n, condition, next, target)
+        values = self.values
+        operands = state.stack[-n:] if n == 2 else (state.stack[-1], values.const(0))
+        successors = []
+        for cond, offset in [(condition, target), (NEGATED[condition], next)]:
+            a, b = assume(values, cond, *operands)
+            if is_bottom(values, a):
+                continue
+            refined = self.refine(state, 0, b if n == 2 else a)
+            if n == 2:
+                refined = self.refine(refined, 1, a)
+            successors.append((offset, refined.pop(n)[0]))
+        return tuple(successors)
+
+    def branch_null(
+        self, state: AState, n: int, condition: str, next: int, target: int
+    ) -> tuple[tuple[int, AState], ...]:
+        (ref,) = state.stack[-1:]
+        if n == 2:
+            return ((target, state.pop(2)[0]), (next, state.pop(2)[0]))
+        null = Ref(self.lengths.bottom(), True)
+        nonnull = Ref(ref.length, False)
+        successors = []
+        for offset, value in [(target, null), (next, nonnull)]:
+            if condition == "isnot":
+                offset = next if offset == target else target
+            if value.null and not ref.null:
+                continue
+            if not value.null and is_bottom(self.lengths, ref.length):
+                continue
+            successors.append((offset, self.refine(state, 0, value).pop()[0]))
+        return tuple(successors)
+
+    def access(self, state: AState, n: int, next: int, loaded) -> Step:
+        """The step of loading from an array, or storing into it, where the
+        array and the index are the lowest of the n values on the stack."""
+        values, lengths = self.values, self.lengths
+        ref, index = state.stack[-n], state.stack[-n + 1]
+        errors = set(["null pointer"] if ref.null else [])
+        llo, lhi = lengths.bounds(ref.length)
+        ilo, ihi = values.bounds(index)
+        if llo > lhi:
+            return Step((), frozenset(errors))
+        if ilo < 0 or ihi >= llo:
+            errors.add("out of bounds")
+
+        # The index is in [0, length) on the path that does not throw
+        index = values.restrict(index, 0, lhi - 1)
+        length = lengths.restrict(ref.length, max(ilo, 0) + 1, lhi)
+        if is_bottom(values, index) or is_bottom(lengths, length):
+            return Step((), frozenset(errors))
+        state = self.refine(state, n - 1, Ref(length, False))
+        state = self.refine(state, n - 2, index)
+        after, _ = state.pop(n)
+        if loaded is not None:
+            after = after.push(loaded)
+        return Step(((next, after),), frozenset(errors))
+
+
+def show(value) -> str:
+    match value:
+        case Ref(length=length, null=null):
+            return f"ref{length}" + ("?" if null else "")
+        case tuple():
+            return "(" + ", ".join(show(v) for v in value) + ")"
+    return str(value)
+
+
+def dump(result: Result):
+    """Print the states per offset, and the outcome, which is the first of
+    the errors, if the method may end in one."""
+    for offset, state in sorted(result.states.items()):
+        locals = ", ".join(f"{i}: {show(v)}" for i, v in state.locals)
+        stack = ", ".join(show(v) for v in state.stack)
+        print(f"{offset}: locals={{{locals}}} stack=[{stack}]")
+    outcomes = sorted(result.outcomes)
+    errors = [o for o in outcomes if o != "ok"]
+    print(errors[0] if errors else outcomes[0])
@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+"""A compiler from the opcodes of a method to a Python function, which runs
+the cases like the `step` function of `solutions/interpreter.py`, only
+faster.
+
+The locals become Python variables, `l0`, `l1`, ..., and as the height of
+the operand stack is known at every offset, so do the stack slots, `s0`,
+`s1`, .... The method is cut into basic blocks, which are the branches of a
+loop over the offset of the current block, so a jump is an assignment to
+`pc`. A block first checks that it can take all of its steps, and if not,
+runs a copy of itself which counts every step, so the cases which run out of
+steps stop at the same step as in the interpreter.
+
+Static calls are calls of the compiled callee, which returns its outcome,
+its return value and the steps taken so far. A method is only compiled if
+all of its opcodes, and all of the methods it calls, are supported;
+otherwise the case is run by the interpreter. The source is compiled once,
+and the code object is kept per method.
+
+Values are kept like the interpreter keeps them, so it also agrees where it
+differs from the JVM. The arithmetic is that of `jpamb.jvm.arithmetic`, with
+the wrap around of additions, subtractions and multiplications inlined.
+"""
+
+from collections.abc import Callable
+import sys
+
+from loguru import logger
+import jpamb
+from jpamb import jvm
+from jpamb.jvm import arithmetic
+import interpreter
+
+OPERATORS = {"eq": "==", "ne": "!=", "lt": "<", "ge": ">=", "gt": ">", "le": "<="}
+
+BINARY = {
+    jvm.BinaryOpr.Add: "+",
+    jvm.BinaryOpr.Sub: "-",
+    jvm.BinaryOpr.Mul: "*",
+}
+
+# As the interpreter stores new objects in its heap
+ASSERTION_ERROR = "java/lang/AssertionError"
+
+
+def wrap(expr: str) -> str:
+    """The expression wrapped around at 32 bits, like `arithmetic.wrap_int`."""
+    return f"(({expr}) + 0x8000_0000 & 0xFFFF_FFFF) - 0x8000_0000"
+
+
+class Unsupported(Exception):
+    """The method uses an opcode the compiler does not translate."""
+
+
+def successors(opr: jvm.Opcode, i: int) -> list[int]:
+    match opr:
+        case jvm.If(target=target) | jvm.Ifz(target=target):
+            return [i + 1, target]
+        case jvm.Goto(target=target):
+            return [target]
+        case jvm.Return() | jvm.Throw():
+            return []
+        case _:
+            return [i + 1]
+
+
+def ends_block(opr: jvm.Opcode) -> bool:
+    # A call ends a block, so the steps of the callee are counted after the
+    # steps before the call
+    return isinstance(
+        opr,
+        (jvm.If, jvm.Ifz, jvm.Goto, jvm.Return, jvm.Throw, jvm.InvokeStatic),
+    )
+
+
+class Compiler:
+    def __init__(self, suite: jpamb.Suite):
+        self.suite = suite
+        self.names: dict[jvm.AbsMethodID, str] = {}
+        self.functions: dict[jvm.AbsMethodID, Callable | None] = {}
+        self.sources: dict[jvm.AbsMethodID, str] = {}
+        self.code: dict[jvm.AbsMethodID, object] = {}
+        self.namespace = {
+            "int_div": arithmetic.int_div,
+            "int_rem": arithmetic.int_rem,
+            "i2s": arithmetic.i2s,
+            "jvm": jvm,
+            "MAX_ARRAY_LENGTH": interpreter.MAX_ARRAY_LENGTH,
+        }
+
+    def name(self, methodid: jvm.AbsMethodID) -> str:
+        if methodid not in self.names:
+            self.names[methodid] = f"m{len(self.names)}"
+        return self.names[methodid]
+
+    def constant(self, value) -> str:
+        """A name for the value in the namespace of the compiled functions."""
+        name = f"c{len(self.namespace)}"
+        self.namespace[name] = value
+        return name
+
+    def function(self, methodid: jvm.AbsMethodID) -> Callable | None:
+        """The compiled method, or None if it, or a method it calls, is not
+        supported."""
+        if methodid in self.functions:
+            return self.functions[methodid]
+
+        # Translate everything the method calls first, as a call is only a
+        # name in the source
+        sources, todo = {}, [methodid]
+        while todo:
+            m = todo.pop()
+            if m in sources or self.functions.get(m):
+                continue
+            try:
+                if m in self.functions:
+                    raise Unsupported(f"calls {m}, which is not supported")
+                sources[m], callees = self.translate(m)
+            except Unsupported as e:
+                logger.debug(f"Can not compile {m}: {e}")
+                self.functions[m] = None
+                self.functions[methodid] = None
+                return None
+            todo.extend(callees)
+
+        for m, source in sources.items():
+            self.sources[m] = source
+            self.code[m] = compile(source, f"<compiled {m}>", "exec")
+            exec(self.code[m], self.namespace)
+            self.functions[m] = self.namespace[self.name(m)]
+        return self.functions[methodid]
+
+    def translate(self, methodid: jvm.AbsMethodID) -> tuple[str, set]:
+        """The source of the function, and the methods it calls."""
+        try:
+            opcodes = list(self.suite.method_opcodes(methodid))
+        except Exception as e:
+            raise Unsupported(f"no opcodes: {e!r}")
+
+        # The height of the stack before every offset, and the blocks
+        callees = set()
+        depths = {0: 0}
+        code = {}
+        todo = [0]
+        while todo:
+            i = todo.pop()
+            code[i], depth = self.instruction(opcodes[i], i, depths[i], callees)
+            for j in successors(opcodes[i], i):
+                if j >= len(opcodes):
+                    raise Unsupported(f"falls off the end at {i}")
+                if depths.setdefault(j, depth) != depth:
+                    raise Unsupported(f"the stack height differs at {j}")
+                if j not in code and j not in todo:
+                    todo.append(j)
+
+        leaders = {0}.union(
+            *(successors(opcodes[i], i) for i in code if ends_block(opcodes[i]))
+        )
+
+        params = "".join(f", l{i}" for i in range(len(methodid.extension.params)))
+        lines = [f"def {self.name(methodid)}(heap, steps, max_steps{params}):"]
+        lines.append("    pc = 0")
+        lines.append("    while True:")
+        keyword = "if"
+        for start in sorted(leaders):
+            block = [start]
+            while not ends_block(opcodes[block[-1]]) and block[-1] + 1 not in leaders:
+                block.append(block[-1] + 1)
+            last = block[-1]
+
+            fast = [line for i in block for line in code[i]]
+            careful = []
+            for i in block:
+                careful.append('if steps == max_steps: return "*", None, steps')
+                careful.append("steps += 1")
+                careful.extend(code[i])
+            if not ends_block(opcodes[last]):
+                fast.append(f"pc = {last + 1}")
+                careful.append(f"pc = {last + 1}")
+
+            lines.append(f"        {keyword} pc == {start}:")
+            lines.append(f"            if steps + {len(block)} <= max_steps:")
+            lines.append(f"                steps += {len(block)}")
+            lines.extend(" " * 16 + line for line in fast)
+            lines.append("            else:")
+            lines.extend(" " * 16 + line for line in careful)
+            keyword = "elif"
+        return "\n".join(lines) + "\n", callees
+
+    def instruction(
+        self, opr: jvm.Opcode, i: int, d: int, callees: set
+    ) -> tuple[list[str], int]:
+        """The lines of an opcode at offset i, with d values on the stack, and
+        the height of the stack after it."""
+        top = f"s{d - 1}"
+        match opr:
+            case jvm.Push(value=jvm.Value(type=jvm.Int(), value=value)):
+                return [f"s{d} = {value!r}"], d + 1
+            case jvm.Push(value=jvm.Value(type=jvm.Reference(), value=value)):
+                return [f"s{d} = len(heap)", f"heap.append({value!r})"], d + 1
+            case jvm.Load(index=index):
+                return [f"s{d} = l{index}"], d + 1
+            case jvm.Store(index=index):
+                return [f"l{index} = {top}"], d - 1
+            case jvm.Incr(index=index, amount=amount):
+                return [f"l{index} = {wrap(f'l{index} + {amount}')}"], d
+            case jvm.Dup(words=1):
+                return [f"s{d} = {top}"], d + 1
+            case jvm.Binary(type=jvm.Int(), operant=operant) if operant in BINARY:
+                result = wrap(f"s{d - 2} {BINARY[operant]} {top}")
+                return [f"s{d - 2} = {result}"], d - 1
+            case jvm.Binary(type=jvm.Int(), operant=jvm.BinaryOpr.Div):
+                return [
+                    f'if {top} == 0: return "divide by zero", None, steps',
+                    f"s{d - 2} = int_div(s{d - 2}, {top})",
+                ], d - 1
+            case jvm.Binary(type=jvm.Int(), operant=jvm.BinaryOpr.Rem):
+                return [
+                    f'if {top} == 0: return "divide by zero", None, steps',
+                    f"s{d - 2} = int_rem(s{d - 2}, {top})",
+                ], d - 1
+            case jvm.Cast(from_=jvm.Int(), to_=jvm.Short()):
+                return [f"{top} = i2s({top})"], d
+            case jvm.Ifz(condition=condition, target=target) if condition in OPERATORS:
+                test = f"{top} {OPERATORS[condition]} 0"
+                return [f"pc = {target} if {test} else {i + 1}"], d - 1
+            case jvm.If(condition=condition, target=target) if condition in OPERATORS:
+                test = f"s{d - 2} {OPERATORS[condition]} {top}"
+                return [f"pc = {target} if {test} else {i + 1}"], d - 2
+            case jvm.Goto(target=target):
+                return [f"pc = {target}"], d
+            case jvm.Get(field=field) if field.extension.name == "$assertionsDisabled":
+                return [f"s{d} = 0"], d + 1
+            case jvm.New(classname=cname):
+                return [f"s{d} = len(heap)", f"heap.append({cname.name!r})"], d + 1
+            case jvm.InvokeSpecial(method=m) if not m.extension.params:
+                return [], d - 1
+            case jvm.Throw():
+                return [
+                    f"if heap[{top}] == {ASSERTION_ERROR!r}:",
+                    '    return "assertion error", None, steps',
+                    f"raise NotImplementedError(heap[{top}])",
+                ], d - 1
+            case jvm.Return(type=None):
+                return ["return None, None, steps"], 0
+            case jvm.Return(type=jvm.Int() | jvm.Reference()):
+                return [f"return None, {top}, steps"], 0
+            case jvm.InvokeStatic(method=m) if len(m.extension.params) <= 1:
+                # The interpreter only passes the first argument
+                callees.add(m)
+                args = "".join(f", s{d - 1}" for _ in m.extension.params)
+                after = d - len(m.extension.params)
+                result = f"s{after}" if m.extension.return_type else "_"
+                lines = [
+                    f"outcome, {result}, steps = "
+                    f"{self.name(m)}(heap, steps, max_steps{args})",
+                    "if outcome is not None: return outcome, None, steps",
+                    f"pc = {i + 1}",
+                ]
+                return lines, after + (1 if m.extension.return_type else 0)
+            case jvm.ArrayLength():
+                return [
+                    f"array = heap[{top}]",
+                    'if array == None: return "null pointer", None, steps',
+                    f"{top} = len(array.value)",
+                ], d
+            case jvm.ArrayLoad(type=tt):
+                return [
+                    f"array = heap[s{d - 2}]",
+                    'if array == None: return "null pointer", None, steps',
+                    f"assert array.type.contains == {self.constant(tt)}",
+                    f'if len(array.value) <= {top}: return "out of bounds", None, steps',
+                    f"s{d - 2} = array.value[{top}]",
+                ], d - 1
+            case jvm.ArrayStore(type=jvm.Int()):
+                ref, index = f"s{d - 3}", f"s{d - 2}"
+                return [
+                    f"array = heap[{ref}]",
+                    'if array == None: return "null pointer", None, steps',
+                    f'if len(array.value) <= {index}: return "out of bounds", None, steps',
+                    "content = list(array.value)",
+                    f"content[{index}] = {top}",
+                    f"heap[{ref}] = jvm.Value.array(array.type.contains, content)",
+                ], d - 3
+            case jvm.NewArray(type=jvm.Int()):
+                return [
+                    f"if {top} > MAX_ARRAY_LENGTH: raise NotImplementedError({top})",
+                    f"heap.append(jvm.Value.array(jvm.Int(), [0] * {top}))",
+                    f"{top} = len(heap) - 1",
+                ], d
+            case _:
+                raise Unsupported(f"{opr!r} at {i}")
+
+
+compiler = Compiler(interpreter.suite)
+
+
+def execute(methodid: jvm.AbsMethodID, input: jpamb.Input, max_steps=1000000):
+    """Run the method on the input, and return the outcome, like
+    `interpreter.execute`."""
+    function = compiler.function(methodid)
+    if function is None:
+        return interpreter.execute(methodid, input, max_steps=max_steps)
+
+    state = interpreter.initial_state(methodid, input)
+    heap = [state.heap[i] for i in range(state.heap_items)]
+    locals = state.frames.peek().locals
+    args = [locals[i].value for i in range(len(methodid.extension.params))]
+    try:
+        outcome, _, _ = function(heap, 0, max_steps, *args)
+    except RecursionError:
+        # The interpreter keeps its frames on the heap
+        return interpreter.execute(methodid, input, max_steps=max_steps)
+    return outcome or "ok"
+
+
+if __name__ == "__main__":
+    logger.remove()
+    logger.add(sys.stderr, format="[{level}] {message}", level="INFO")
+
+    methodid, inputs = jpamb.getcases()
+    if compiler.function(methodid) is None:
+        logger.info(f"Running {methodid} with the interpreter")
+    for input in inputs:
+        print(execute(methodid, input))
@@ -0,0 +1,444 @@
+"""Abstract domains for the abstract interpreter in `abstract.py`.
+
+A `Lattice` orders the abstract values, and relates them to intervals of
+integers with `bounds` and `restrict`, which is all the abstract interpreter
+needs to decide the branches, the array bounds, and the casts, and to
+combine domains in a reduced `Product`. A `Domain` is a lattice of integer
+values, which also gives the constants and the arithmetic. Array lengths
+only need a lattice.
+
+The domains here are the signs of `SignSet.py`, the array lengths of
+`LengthAbstraction.py`, intervals and constants. A new domain only has to
+implement the methods of the protocol.
+"""
+
+from dataclasses import dataclass
+import math
+from typing import Protocol, TypeVar
+
+from jpamb import jvm
+from jpamb.jvm import arithmetic
+from LengthAbstraction import LenInterval, INF
+from SignSet import SignSet
+
+INT_MIN, INT_MAX = arithmetic.INT_MIN, arithmetic.INT_MAX
+
+# The bounds of the bottom value, which no integer is within
+EMPTY = (math.inf, -math.inf)
+
+V = TypeVar("V")
+
+
+class Lattice(Protocol[V]):
+    def bottom(self) -> V: ...
+
+    def top(self) -> V: ...
+
+    def join(self, a: V, b: V) -> V: ...
+
+    def widen(self, a: V, b: V) -> V:
+        """An upper bound of a and b, where repeatedly widening a value
+        reaches a fixpoint in a finite number of steps."""
+        ...
+
+    def leq(self, a: V, b: V) -> bool: ...
+
+    def bounds(self, a: V) -> tuple[float, float]:
+        """The least and greatest integer of the value, which may be
+        infinite, or EMPTY if the value is bottom."""
+        ...
+
+    def restrict(self, a: V, lo: float, hi: float) -> V:
+        """The value with only the integers between lo and hi."""
+        ...
+
+
+class Domain(Lattice[V], Protocol[V]):
+    def const(self, n: int) -> V: ...
+
+    def binary(self, opr: jvm.BinaryOpr, a: V, b: V) -> tuple[V, bool]:
+        """The result of a opr b where it does not throw, and whether it may
+        divide by zero."""
+        ...
+
+
+def is_bottom(lattice: Lattice, a) -> bool:
+    lo, hi = lattice.bounds(a)
+    return lo > hi
+
+
+def assume(lattice: Lattice, cond: str, a, b) -> tuple:
+    """The values of a and b for which `a cond b` may hold, which are bottom
+    if it can not."""
+    alo, ahi = lattice.bounds(a)
+    blo, bhi = lattice.bounds(b)
+    match cond:
+        case "eq":
+            lo, hi = max(alo, blo), min(ahi, bhi)
+            a, b = lattice.restrict(a, lo, hi), lattice.restrict(b, lo, hi)
+        case "ne":
+            if alo == ahi == blo == bhi:
+                a, b = lattice.bottom(), lattice.bottom()
+        case "lt":
+            a, b = (
+                lattice.restrict(a, -math.inf, bhi - 1),
+                lattice.restrict(b, alo + 1, math.inf),
+            )
+        case "le":
+            a, b = (
+                lattice.restrict(a, -math.inf, bhi),
+                lattice.restrict(b, alo, math.inf),
+            )
+        case "gt":
+            a, b = (
+                lattice.restrict(a, blo + 1, math.inf),
+                lattice.restrict(b, -math.inf, ahi - 1),
+            )
+        case "ge":
+            a, b = (
+                lattice.restrict(a, blo, math.inf),
+                lattice.restrict(b, -math.inf, ahi),
+            )
+        case _:
+            raise NotImplementedError(f"Don't know how to assume {cond!r}")
+    if is_bottom(lattice, a) or is_bottom(lattice, b):
+        return lattice.bottom(), lattice.bottom()
+    return a, b
+
+
+NEGATED = {"eq": "ne", "ne": "eq", "lt": "ge", "ge": "lt", "gt": "le", "le": "gt"}
+
+
+class Signs:
+    """The signs of `SignSet`, which ignores that arithmetic wraps around."""
+
+    def bottom(self) -> SignSet:
+        return SignSet.bot()
+
+    def top(self) -> SignSet:
+        return SignSet.top()
+
+    def const(self, n: int) -> SignSet:
+        return SignSet.of_int(n)
+
+    def join(self, a: SignSet, b: SignSet) -> SignSet:
+        return a | b
+
+    def widen(self, a: SignSet, b: SignSet) -> SignSet:
+        # There are only eight sets of signs
+        return a | b
+
+    def leq(self, a: SignSet, b: SignSet) -> bool:
+        return a.mask & b.mask == a.mask
+
+    def bounds(self, a: SignSet) -> tuple[float, float]:
+        if a.is_bot():
+            return EMPTY
+        lo = -math.inf if a.may_be_neg() else 0 if a.may_be_zero() else 1
+        hi = math.inf if a.may_be_pos() else 0 if a.may_be_zero() else -1
+        return lo, hi
+
+    def restrict(self, a: SignSet, lo: float, hi: float) -> SignSet:
+        neg = a.may_be_neg() and lo <= -1
+        zero = a.may_be_zero() and lo <= 0 <= hi
+        pos = a.may_be_pos() and hi >= 1
+        return SignSet.of_flags(neg, zero, pos)
+
+    def binary(
+        self, opr: jvm.BinaryOpr, a: SignSet, b: SignSet
+    ) -> tuple[SignSet, bool]:
+        match opr:
+            case jvm.BinaryOpr.Add:
+                return a.add(b), False
+            case jvm.BinaryOpr.Sub:
+                return a.sub(b), False
+            case jvm.BinaryOpr.Mul:
+                return a.mul(b), False
+            case jvm.BinaryOpr.Div:
+                return a.div(b)
+            case jvm.BinaryOpr.Rem:
+                return a.rem(b)
+
+
+class Lengths:
+    """The array lengths of `LenInterval`, where the bottom value is the
+    empty interval."""
+
+    BOTTOM = LenInterval(1, 0)
+
+    def bottom(self) -> LenInterval:
+        return self.BOTTOM
+
+    def top(self) -> LenInterval:
+        return LenInterval.top()
+
+    def join(self, a: LenInterval, b: LenInterval) -> LenInterval:
+        if a == self.BOTTOM:
+            return b
+        if b == self.BOTTOM:
+            return a
+        return a.join(b)
+
+    def widen(self, a: LenInterval, b: LenInterval) -> LenInterval:
+        if a == self.BOTTOM:
+            return b
+        b = self.join(a, b)
+        return LenInterval(0 if b.lo < a.lo else a.lo, INF if b.hi > a.hi else a.hi)
+
+    def leq(self, a: LenInterval, b: LenInterval) -> bool:
+        return a == self.BOTTOM or (b.lo <= a.lo and a.hi <= b.hi)
+
+    def bounds(self, a: LenInterval) -> tuple[float, float]:
+        if a == self.BOTTOM:
+            return EMPTY
+        return a.lo, math.inf if a.hi >= INF else a.hi
+
+    def restrict(self, a: LenInterval, lo: float, hi: float) -> LenInterval:
+        alo, ahi = self.bounds(a)
+        lo, hi = max(alo, lo), min(ahi, hi)
+        if lo > hi:
+            return self.BOTTOM
+        return LenInterval(int(lo), INF if hi >= INF else int(hi))
+
+
+@dataclass(frozen=True)
+class Interval:
+    lo: float
+    hi: float
+
+    def __str__(self):
+        if self.lo > self.hi:
+            return "⊥"
+        return f"[{self.lo}, {self.hi}]"
+
+
+def truncating_div(a: float, b: float) -> float:
+    if math.isinf(a) or math.isinf(b):
+        return math.inf if a * b > 0 else -math.inf if a * b < 0 else 0
+    return arithmetic.truncating_div(int(a), int(b))
+
+
+class Intervals:
+    """Intervals of ints, which are widened to the limits of an int. The
+    results of arithmetic that may overflow are the top interval."""
+
+    BOTTOM = Interval(math.inf, -math.inf)
+    TOP = Interval(INT_MIN, INT_MAX)
+
+    def bottom(self) -> Interval:
+        return self.BOTTOM
+
+    def top(self) -> Interval:
+        return self.TOP
+
+    def const(self, n: int) -> Interval:
+        return Interval(n, n)
+
+    def join(self, a: Interval, b: Interval) -> Interval:
+        if a == self.BOTTOM:
+            return b
+        if b == self.BOTTOM:
+            return a
+        return Interval(min(a.lo, b.lo), max(a.hi, b.hi))
+
+    def widen(self, a: Interval, b: Interval) -> Interval:
+        if a == self.BOTTOM:
+            return b
+        b = self.join(a, b)
+        return Interval(
+            INT_MIN if b.lo < a.lo else a.lo, INT_MAX if b.hi > a.hi else a.hi
+        )
+
+    def leq(self, a: Interval, b: Interval) -> bool:
+        return a == self.BOTTOM or (b.lo <= a.lo and a.hi <= b.hi)
+
+    def bounds(self, a: Interval) -> tuple[float, float]:
+        return a.lo, a.hi
+
+    def restrict(self, a: Interval, lo: float, hi: float) -> Interval:
+        lo, hi = max(a.lo, lo), min(a.hi, hi)
+        return Interval(lo, hi) if lo <= hi else self.BOTTOM
+
+    def checked(self, lo: float, hi: float) -> Interval:
+        if lo < INT_MIN or hi > INT_MAX:
+            return self.TOP
+        return Interval(lo, hi)
+
+    def binary(
+        self, opr: jvm.BinaryOpr, a: Interval, b: Interval
+    ) -> tuple[Interval, bool]:
+        if a == self.BOTTOM or b == self.BOTTOM:
+            return self.BOTTOM, False
+        match opr:
+            case jvm.BinaryOpr.Add:
+                return self.checked(a.lo + b.lo, a.hi + b.hi), False
+            case jvm.BinaryOpr.Sub:
+                return self.checked(a.lo - b.hi, a.hi - b.lo), False
+            case jvm.BinaryOpr.Mul:
+                corners = [x * y for x in (a.lo, a.hi) for y in (b.lo, b.hi)]
+                return self.checked(min(corners), max(corners)), False
+
+        may_divide_by_zero = b.lo <= 0 <= b.hi
+        # The divisors without zero, as the division by zero throws
+        divisors = [
+            d
+            for d in (self.restrict(b, -math.inf, -1), self.restrict(b, 1, math.inf))
+            if d != self.BOTTOM
+        ]
+        result = self.BOTTOM
+        for d in divisors:
+            if opr == jvm.BinaryOpr.Div:
+                corners = [
+                    truncating_div(x, y) for x in (a.lo, a.hi) for y in (d.lo, d.hi)
+                ]
+                # INT_MIN / -1 is the only overflow
+                result = self.join(result, self.checked(min(corners), max(corners)))
+            else:
+                m = max(abs(d.lo), abs(d.hi)) - 1
+                lo = 0 if a.lo >= 0 else max(a.lo, -m)
+                hi = 0 if a.hi <= 0 else min(a.hi, m)
+                result = self.join(result, Interval(lo, hi))
+        return result, may_divide_by_zero
+
+
+class Flat:
+    """The bottom or the top of the constants."""
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __repr__(self):
+        return self.name
+
+    __str__ = __repr__
+
+
+NO_VALUE = Flat("⊥")
+ANY_VALUE = Flat("⊤")
+
+
+class Constants:
+    """Constant propagation, where a value is an int, or NO_VALUE, or
+    ANY_VALUE. The arithmetic is that of `jpamb.jvm.arithmetic`."""
+
+    OPERATIONS = {
+        jvm.BinaryOpr.Add: arithmetic.int_add,
+        jvm.BinaryOpr.Sub: arithmetic.int_sub,
+        jvm.BinaryOpr.Mul: arithmetic.int_mul,
+        jvm.BinaryOpr.Div: arithmetic.int_div,
+        jvm.BinaryOpr.Rem: arithmetic.int_rem,
+    }
+
+    def bottom(self):
+        return NO_VALUE
+
+    def top(self):
+        return ANY_VALUE
+
+    def const(self, n: int):
+        return n
+
+    def join(self, a, b):
+        if a is NO_VALUE or a == b:
+            return b
+        if b is NO_VALUE:
+            return a
+        return ANY_VALUE
+
+    def widen(self, a, b):
+        # Every chain is at most three values long
+        return self.join(a, b)
+
+    def leq(self, a, b) -> bool:
+        return a is NO_VALUE or b is ANY_VALUE or a == b
+
+    def bounds(self, a) -> tuple[float, float]:
+        if a is NO_VALUE:
+            return EMPTY
+        if a is ANY_VALUE:
+            return INT_MIN, INT_MAX
+        return a, a
+
+    def restrict(self, a, lo: float, hi: float):
+        if a is ANY_VALUE:
+            lo, hi = max(lo, INT_MIN), min(hi, INT_MAX)
+            return int(lo) if lo == hi else ANY_VALUE if lo < hi else NO_VALUE
+        if a is NO_VALUE or not lo <= a <= hi:
+            return NO_VALUE
+        return a
+
+    def binary(self, opr: jvm.BinaryOpr, a, b) -> tuple[object, bool]:
+        if a is NO_VALUE or b is NO_VALUE:
+            return NO_VALUE, False
+        if opr in (jvm.BinaryOpr.Div, jvm.BinaryOpr.Rem):
+            if b == 0:
+                return NO_VALUE, True
+            if b is ANY_VALUE:
+                return ANY_VALUE, True
+        if a is ANY_VALUE or b is ANY_VALUE:
+            return ANY_VALUE, False
+        return self.OPERATIONS[opr](a, b), False
+
+
+class Product:
+    """The reduced product of two domains, where a value is a pair of a
+    value of each.
+
+    After every operation, each value is restricted to the bounds of the
+    other, so, e.g., the product of signs and constants knows that a value
+    which is positive and one of the constants is the constant.
+    """
+
+    def __init__(self, first: Domain, second: Domain):
+        self.first = first
+        self.second = second
+
+    def reduce(self, a: tuple) -> tuple:
+        lo, hi = self.bounds(a)
+        if lo > hi:
+            return self.bottom()
+        return (self.first.restrict(a[0], lo, hi), self.second.restrict(a[1], lo, hi))
+
+    def bottom(self) -> tuple:
+        return (self.first.bottom(), self.second.bottom())
+
+    def top(self) -> tuple:
+        return (self.first.top(), self.second.top())
+
+    def const(self, n: int) -> tuple:
+        return (self.first.const(n), self.second.const(n))
+
+    def join(self, a: tuple, b: tuple) -> tuple:
+        return self.reduce((self.first.join(a[0], b[0]), self.second.join(a[1], b[1])))
+
+    def widen(self, a: tuple, b: tuple) -> tuple:
+        # Not reduced, as reducing could undo the widening
+        return (self.first.widen(a[0], b[0]), self.second.widen(a[1], b[1]))
+
+    def leq(self, a: tuple, b: tuple) -> bool:
+        return self.first.leq(a[0], b[0]) and self.second.leq(a[1], b[1])
+
+    def bounds(self, a: tuple) -> tuple[float, float]:
+        lo1, hi1 = self.first.bounds(a[0])
+        lo2, hi2 = self.second.bounds(a[1])
+        lo, hi = max(lo1, lo2), min(hi1, hi2)
+        return (lo, hi) if lo <= hi else EMPTY
+
+    def restrict(self, a: tuple, lo: float, hi: float) -> tuple:
+        return self.reduce(
+            (self.first.restrict(a[0], lo, hi), self.second.restrict(a[1], lo, hi))
+        )
+
+    def binary(self, opr: jvm.BinaryOpr, a: tuple, b: tuple) -> tuple[tuple, bool]:
+        r1, dz1 = self.first.binary(opr, a[0], b[0])
+        r2, dz2 = self.second.binary(opr, a[1], b[1])
+        return self.reduce((r1, r2)), dz1 and dz2
+
+
+DOMAINS: dict[str, Domain] = {
+    "signs": Signs(),
+    "intervals": Intervals(),
+    "constants": Constants(),
+    "signs*constants": Product(Signs(), Constants()),
+    "intervals*constants": Product(Intervals(), Constants()),
+}
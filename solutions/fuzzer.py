@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""A coverage guided fuzzer, which runs the concrete interpreter on inputs
+mutated from a corpus.
+
+Every run records the edges between the offsets the interpreter steps
+through. An input which takes an edge no earlier input took, or ends in a new
+outcome, is added to the corpus, and new inputs are mostly mutated from the
+corpus, so the fuzzer keeps exploring from the inputs that got the furthest.
+Integers and chars are drawn from the constants in the bytecode, their
+neighbours, the limits of an int, and small random numbers.
+
+The fuzzer stops when no input has found a new edge for a while, or when a
+budget of interpreter steps is spent, and reports the outcomes it observed.
+Both only count the work done, not the time it took, so the report is the
+same on every machine. The executions are kept in the store of `jpamb.memo`,
+so fuzzing the method again, with the same seed, reuses them instead of
+running the interpreter, which only makes it faster. The calls of pure
+methods are memoized by `interpreter.PureCalls`.
+"""
+
+from collections import Counter
+import random
+import sys
+
+from loguru import logger
+
+import jpamb
+from jpamb import jvm
+from jpamb.memo import MemoStore
+import interpreter
+
+MAX_TOTAL_STEPS = 200_000
+PLATEAU = 1000
+MAX_STEPS = 10_000
+MAX_LENGTH = 8
+
+INT_MIN, INT_MAX = -(2**31), 2**31 - 1
+INTERESTING_INTS = [0, 1, -1, 2, 7, 10, 100, -100, 1000, INT_MAX, INT_MIN]
+INTERESTING_CHARS = "a0 Z"
+STRING = jvm.ClassName.decode("java/lang/String")
+
+
+class Unfuzzable(Exception):
+    """The method takes a parameter the fuzzer can not generate."""
+
+
+def harvest(methodid: jvm.AbsMethodID) -> tuple[list[int], list[str]]:
+    """The integer and string constants pushed by the method."""
+    ints, strings = set(), set()
+    for opr in jpamb.Suite().method_opcodes(methodid):
+        match opr:
+            case jvm.Push(value=jvm.Value(type=jvm.Int(), value=int() as n)):
+                ints.update((n - 1, n, n + 1))
+            case jvm.Push(value=jvm.Value(type=jvm.Reference(), value=str() as s)):
+                strings.add(s)
+    return sorted(ints), sorted(strings)
+
+
+class Fuzzer:
+    def __init__(
+        self, methodid: jvm.AbsMethodID, seed: int = 0, memo: MemoStore | None = None
+    ):
+        self.methodid = methodid
+        self.memo = memo
+        # The calls of pure methods are memoized between the runs
+        self.calls = interpreter.PureCalls(jpamb.Suite())
+        self.params = list(methodid.extension.params)
+        self.rng = random.Random(seed)
+        constants, self.strings = harvest(methodid)
+        self.ints = sorted(set(INTERESTING_INTS) | set(constants))
+        # Char literals are pushed as ints
+        self.chars = INTERESTING_CHARS + "".join(
+            chr(n) for n in constants if 32 <= n <= 126
+        )
+        self.corpus: list[tuple[jvm.Value, ...]] = []
+        self.coverage: set = set()
+        self.outcomes: Counter[str] = Counter()
+        self.examples: dict[str, tuple[jvm.Value, ...]] = {}
+        self.runs = 0
+        self.steps = 0
+        self.unsupported = 0
+
+    def integer(self) -> int:
+        match self.rng.randrange(3):
+            case 0:
+                return self.rng.choice(self.ints)
+            case 1:
+                return self.rng.randint(-16, 16)
+            case _:
+                return self.rng.randint(INT_MIN, INT_MAX)
+
+    def char(self) -> str:
+        if self.rng.randrange(4):
+            return self.rng.choice(self.chars)
+        return chr(self.rng.randint(32, 126))
+
+    def string(self) -> str:
+        if self.strings and self.rng.randrange(2):
+            return self.rng.choice(self.strings)
+        return "".join(self.char() for _ in range(self.rng.randint(0, MAX_LENGTH)))
+
+    def generate(self, tt: jvm.Type) -> jvm.Value:
+        match tt:
+            case jvm.Int():
+                return jvm.Value.int(self.integer())
+            case jvm.Boolean():
+                return jvm.Value.boolean(bool(self.rng.randrange(2)))
+            case jvm.Char():
+                return jvm.Value.char(self.char())
+            case jvm.Array(contains=jvm.Int()):
+                length = self.rng.randint(0, MAX_LENGTH)
+                return jvm.Value.array(
+                    tt.contains, [self.integer() for _ in range(length)]
+                )
+            case jvm.Array(contains=jvm.Char()):
+                length = self.rng.randint(0, MAX_LENGTH)
+                return jvm.Value.array(
+                    tt.contains, [self.char() for _ in range(length)]
+                )
+            case jvm.Object(name=name) if name == STRING:
+                return self.quoted(self.string())
+            case _:
+                raise Unfuzzable(f"parameters of type {tt}")
+
+    def quoted(self, s: str) -> jvm.Value:
+        # Strings keep their quotation marks, like the ones parsed from cases
+        return jvm.Value.string(STRING.encode(), f'"{s}"')
+
+    def mutate_value(self, tt: jvm.Type, value: jvm.Value) -> jvm.Value:
+        rng = self.rng
+        match tt:
+            case jvm.Int():
+                n = value.value
+                match rng.randrange(4):
+                    case 0:
+                        n = n + rng.randint(-4, 4)
+                    case 1:
+                        n = n ^ (1 << rng.randrange(32))
+                    case 2:
+                        n = -n
+                    case _:
+                        n = self.integer()
+                # Wrap around like a java int
+                return jvm.Value.int((n - INT_MIN) % 2**32 + INT_MIN)
+            case jvm.Boolean():
+                return jvm.Value.boolean(not value.value)
+            case jvm.Array(contains=jvm.Int()):
+                items = self.mutate_items(value.value, self.integer)
+                return jvm.Value.array(tt.contains, items)
+            case jvm.Array(contains=jvm.Char()):
+                items = self.mutate_items(value.value, self.char)
+                return jvm.Value.array(tt.contains, items)
+            case jvm.Object():
+                items = self.mutate_items(value.value[1:-1], self.char)
+                return self.quoted("".join(items))
+            case _:
+                return self.generate(tt)
+
+    def mutate_items(self, items, element) -> list:
+        """Insert, delete or replace an element, or start over."""
+        items = list(items)
+        match self.rng.randrange(4):
+            case 0 if len(items) < MAX_LENGTH:
+                items.insert(self.rng.randint(0, len(items)), element())
+            case 1 if items:
+                del items[self.rng.randrange(len(items))]
+            case 2 if items:
+                items[self.rng.randrange(len(items))] = element()
+            case _:
+                items = [element() for _ in range(self.rng.randint(0, MAX_LENGTH))]
+        return items
+
+    def mutate(self, values: tuple[jvm.Value, ...]) -> tuple[jvm.Value, ...]:
+        values = list(values)
+        for _ in range(self.rng.randint(1, len(values))):
+            i = self.rng.randrange(len(values))
+            values[i] = self.mutate_value(self.params[i], values[i])
+        return tuple(values)
+
+    def parent(self) -> tuple[jvm.Value, ...]:
+        """An input from the corpus, favouring the latest, which got the
+        furthest."""
+        if self.rng.randrange(2):
+            return self.corpus[-1]
+        return self.rng.choice(self.corpus)
+
+    def run(self, values: tuple[jvm.Value, ...]) -> bool:
+        """Run the input, and keep it if it found a new edge or outcome."""
+        self.runs += 1
+        edges = set()
+        try:
+            outcome, steps = interpreter.execute_counted(
+                self.methodid,
+                jpamb.Input(values),
+                coverage=edges,
+                max_steps=MAX_STEPS,
+                memo=self.memo,
+                calls=self.calls,
+            )
+        except Exception as e:
+            # The interpreter does not support everything the input reaches
+            logger.debug(f"Could not interpret {jpamb.Input(values).encode()}: {e!r}")
+            self.unsupported += 1
+            return False
+
+        self.steps += steps
+        new = not edges <= self.coverage or outcome not in self.outcomes
+        self.outcomes[outcome] += 1
+        if new:
+            self.coverage |= edges
+            self.corpus.append(values)
+            self.examples.setdefault(outcome, values)
+        return new
+
+    def fuzz(self, max_steps: int = MAX_TOTAL_STEPS, plateau: int = PLATEAU) -> str:
+        """Fuzz until coverage plateaus or the runs have taken max_steps
+        interpreter steps, and return why it stopped."""
+        self.run(tuple(self.generate(tt) for tt in self.params))
+        if not self.params:
+            return "no parameters"
+
+        since_new = 0
+        while since_new < plateau:
+            if self.steps >= max_steps:
+                return "step budget"
+            if not self.corpus or self.rng.randrange(10) == 0:
+                values = tuple(self.generate(tt) for tt in self.params)
+            else:
+                values = self.mutate(self.parent())
+            since_new = 0 if self.run(values) else since_new + 1
+        return "coverage plateau"
+
+
+if __name__ == "__main__":
+    methodid = jpamb.getmethodid(
+        "fuzzer",
+        "1.0",
+        "The Rice Theorem Cookers",
+        ["dynamic", "python"],
+        for_science=True,
+    )
+
+    logger.remove()
+    logger.add(sys.stderr, format="[{level}] {message}", level="INFO")
+    logger.disable("interpreter")
+
+    with MemoStore(jpamb.Suite()) as memo:
+        fuzzer = Fuzzer(methodid, memo=memo)
+        try:
+            reason = fuzzer.fuzz()
+        except Unfuzzable as e:
+            logger.info(f"Can not fuzz {methodid}: {e}")
+            reason = None
+
+    if reason:
+        logger.info(
+            f"Stopped on {reason} after {fuzzer.runs} runs and {fuzzer.steps} steps, "
+            f"with {len(fuzzer.corpus)} inputs covering {len(fuzzer.coverage)} edges, "
+            f"{fuzzer.unsupported} runs not supported by the interpreter"
+        )
+        logger.debug(f"Reused {memo.hits} of {memo.hits + memo.misses} executions")
+    for outcome, values in sorted(fuzzer.examples.items()):
+        logger.info(f"{outcome}: {jpamb.Input(values).encode()}")
+
+    for outcome in [
+        "ok",
+        "divide by zero",
+        "assertion error",
+        "out of bounds",
+        "null pointer",
+        "*",
+    ]:
+        if reason is None:
+            likelihood = "50%"
+        elif outcome == "*" and outcome in fuzzer.outcomes:
+            # Running out of steps is only a hint of an infinite loop, unless
+            # the method always runs the same
+            likelihood = "30%" if fuzzer.params else "90%"
+        elif outcome in fuzzer.outcomes:
+            likelihood = "95%"
+        else:
+            likelihood = "10%"
+        print(f"{outcome};{likelihood}")
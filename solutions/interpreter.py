@@ -1,16 +1,19 @@
 import jpamb
 from jpamb import jvm
+from jpamb.jvm import arithmetic
+from jpamb.memo import Execution
 from dataclasses import dataclass
-import numpy
 import virtual_methods
 import dynamic_methods
 
+import hashlib
+import os
+from pathlib import Path
 import sys
 from loguru import logger
 
-from SignSet import SignSet, TOP, BOT
-from LengthAbstraction import LenInterval
-AValue = SignSet
+from abstract import Analysis, Result, dump as dump_A
+from domains import DOMAINS
 from typing import Generic, TypeVar
 T = TypeVar("T")
 
@@ -81,6 +84,8 @@ class Stack(Generic[T]):
 suite = jpamb.Suite()
 bc = Bytecode(suite, dict())
 
+MAX_ARRAY_LENGTH = 1_000_000
+
 
 @dataclass
 class Frame:
@@ -112,363 +117,12 @@ class State:
     def __str__(self):
         return f"{self.heap} {self.frames}"
     
-#### Abstract stuff ####
-    
-# ints/booleans/chars mapped to {−,0,+}
-def sign_of_const(val: jvm.Value) -> SignSet:
-    match val:
-        case jvm.Value(type=jvm.Int(), value=v):
-            return SignSet.of_int(v)
-        case jvm.Value(type=jvm.Boolean(), value=b):
-            return SignSet.of_int(1 if b else 0)
-        case jvm.Value(type=jvm.Char(), value=c):
-            #This will always return a positive value, because there are no negative Unicode values.
-            return SignSet.of_int(ord(c))
-        case _:
-            return TOP  
-            
-@dataclass
-class AFrame:
-    locals: dict[int, AValue]
-    stack: Stack[AValue]
-    pc: PC
-
-    @staticmethod
-    def from_method(method: jvm.AbsMethodID) -> "AFrame":
-        return AFrame({}, Stack.empty(), PC(method, 0))
-
-@dataclass
-class AState:
-    frames: Stack[AFrame]    
-    status: str = "ok"        # possible statuses: "ok" / "divide by zero" /  "assertion" / ...
-    aheap: dict[int, LenInterval] = None # asbtract heap
-
-    def __post_init__(self):
-        if self.aheap is None:
-            self.aheap = {}
-
-# shallow copy 
-def with_heap(fr: AFrame, aheap: dict[int, LenInterval]) -> AState:
-    return AState(frames=Stack.empty().push(fr), status="ok", aheap=dict(aheap))
-
-
-
-def clone_frame(fr: AFrame) -> AFrame:
-    return AFrame(dict(fr.locals), Stack(list(fr.stack.items)),
-                  PC(fr.pc.method, fr.pc.offset))
-
-def join_frames(a: AFrame, b: AFrame) -> AFrame:
-    assert a.pc.method == b.pc.method and a.pc.offset == b.pc.offset
-    new_locals = dict(a.locals)
-    for k, v in b.locals.items():
-        new_locals[k] = new_locals.get(k, BOT) | v
-    sa, sb = len(a.stack.items), len(b.stack.items)
-    if sa != sb:
-        h = max(sa, sb)
-        return AFrame(new_locals, Stack([TOP]*h), a.pc)
-    new_stack = Stack([x | y for x, y in zip(a.stack.items, b.stack.items)])
-    return AFrame(new_locals, new_stack, a.pc)
-
-def pc_key(pc: PC) -> tuple[jvm.AbsMethodID, int]:
-    return (pc.method, pc.offset)
-
-def key_of(fr: AFrame) -> tuple[jvm.AbsMethodID, int]:
-    return (fr.pc.method, fr.pc.offset)
-
-def not_negative_interval_from_sign(s: SignSet) -> LenInterval:
-    if s == BOT:
-        return LenInterval.top()
-    if s.may_be_neg():
-        return LenInterval.top()
-    if s.may_be_zero():
-        return LenInterval.const(0)
-    if s.may_be_pos():
-        return LenInterval(1, 10**12)
-    
-    return LenInterval(0, 10**12)
-
-def interval_to_sign(L: LenInterval) -> SignSet:
-    z = (L.lo == 0 and L.hi == 0)
-    if z: 
-        return SignSet.zero()
-    if L.lo >= 1:
-        return SignSet.pos()
-    
-    return SignSet.zero() | SignSet.pos()
-
-def index_interval_from_sign(s: SignSet) -> tuple[int, int]:
-    if s.zero:
-        return(0, 0)
-    if s.pos:
-        return(1, 10**12)
-    if s.may_be_neg() and not s.may_be_pos() and not s.zero:
-        return (-10**12, -1)
-    
-    return (-10**12, 10**12)
-
-def step_A(states_at_pc: dict[PC, AState]) -> dict[PC, AState | str]: 
-    out: dict[PC, AState | str] = {}
-
-    def put(pc: PC, val: AState | str):
-        k = (pc.method, pc.offset) 
-        prev = out.get(k)
-        if prev is None: 
-            out[k] = val; 
-            return
-        if isinstance(prev, str) or isinstance(val, str):
-            out[k] = prev if isinstance(prev, str) else val
-            return
-        a, b = prev.frames.peek(), val.frames.peek()
-        joined_frame = AState(frames=Stack.empty().push(join_frames(a, b)), status="ok")
-
-        joined_frame.status = prev.status if prev.status != "ok" else val.status
-
-        joined_heap = dict(prev.aheap)
-        for ref, L in val.aheap.items():
-            if ref in joined_heap:
-                joined_heap[ref] = joined_heap[ref].join(L)
-            else:
-                joined_heap[ref] = L
-        joined_frame.aheap = joined_heap
-
-        out[k] = joined_frame
-
-    for pc, entry in states_at_pc.items():
-        assert isinstance(entry, AState)
-        frame = entry.frames.peek()
-        opr = bc[frame.pc]
-
-        def succ(newf: AFrame, status: str = "ok"):
-            put(newf.pc, AState(frames=Stack.empty().push(newf), status=status))
-
-        def succ_with_heap(newf: AFrame, heap: dict[int, LenInterval], status: str = "ok"):
-            put(newf.pc, AState(frames=Stack.empty().push(newf), status=status, aheap=dict(heap)))
-
-        
-
-        match opr:
-            case jvm.Push(value=v):
-                nf = clone_frame(frame); 
-                nf.stack.push(sign_of_const(v)); 
-                nf.pc += 1; 
-                succ(nf)
-            case jvm.Load(type=_t, index=idx):
-                nf = clone_frame(frame); 
-                nf.stack.push(nf.locals.get(idx, TOP)); 
-                nf.pc += 1; 
-                succ(nf)
-            case jvm.Get(field=field, static=static):
-                nf = clone_frame(frame)
-                if field.extension.name == "$assertionsDisabled":
-                    nf.stack.push(SignSet.zero())
-                else:
-                    nf.stack.push(TOP)
-                nf.pc += 1
-                succ(nf)
-            case jvm.Store(type=_t, index=idx):
-                if not frame.stack: 
-                    continue
-                nf = clone_frame(frame); 
-                v = nf.stack.pop(); 
-                nf.locals[idx] = v; 
-                nf.pc += 1; 
-                succ(nf)
-            case jvm.Dup():
-                if not frame.stack: 
-                    continue
-                nf = clone_frame(frame); 
-                nf.stack.push(nf.stack.peek()); 
-                nf.pc += 1; 
-                succ(nf)
-
-            # Int arithmetic
-            case jvm.Binary(type=jvm.Int(), operant=jvm.BinaryOpr.Add):
-                if len(frame.stack.items) < 2: 
-                    continue
-                nf = clone_frame(frame); 
-                b,a = nf.stack.pop(), nf.stack.pop()
-                nf.stack.push(a.add(b)); 
-                nf.pc += 1; 
-                succ(nf)
-
-            case jvm.Binary(type=jvm.Int(), operant=jvm.BinaryOpr.Sub):
-                if len(frame.stack.items) < 2: 
-                    continue
-                nf = clone_frame(frame); 
-                b,a = nf.stack.pop(), nf.stack.pop() 
-                nf.stack.push(a.sub(b)); 
-                nf.pc += 1; 
-                succ(nf)
-
-            case jvm.Binary(type=jvm.Int(), operant=jvm.BinaryOpr.Mul):
-                if len(frame.stack.items) < 2: 
-                    continue
-                nf = clone_frame(frame); 
-                b,a = nf.stack.pop(), nf.stack.pop()
-                nf.stack.push(a.mul(b)); 
-                nf.pc += 1; 
-                succ(nf)
-
-            case jvm.Binary(type=jvm.Int(), operant=jvm.BinaryOpr.Div):
-                if len(frame.stack.items) < 2: continue
-                b, a = frame.stack.items[-1], frame.stack.items[-2]
-                q, dz = a.div(b)
-                if q.signs:
-                    nf1 = clone_frame(frame)
-                    nf1.stack = Stack(list(frame.stack.items)); nf1.stack.pop(); nf1.stack.pop()
-                    nf1.stack.push(q); nf1.pc = PC(frame.pc.method, frame.pc.offset + 1)
-                    succ(nf1)
-                if dz:
-                    nf_err = clone_frame(frame); nf_err.pc = PC(frame.pc.method, frame.pc.offset + 1)
-                    succ(nf_err, status="divide by zero")
-
-            case jvm.Binary(type=jvm.Int(), operant=jvm.BinaryOpr.Rem):
-                if len(frame.stack.items) < 2: continue
-                b, a = frame.stack.items[-1], frame.stack.items[-2]
-                r, dz = a.rem(b)
-                if r.signs:
-                    nf1 = clone_frame(frame)
-                    nf1.stack = Stack(list(frame.stack.items)); nf1.stack.pop(); nf1.stack.pop()
-                    nf1.stack.push(r); nf1.pc = PC(frame.pc.method, frame.pc.offset + 1)
-                    succ(nf1)
-                if dz:
-                    nf_err = clone_frame(frame); nf_err.pc = PC(frame.pc.method, frame.pc.offset + 1)
-                    succ(nf_err, status="divide by zero")
-
-            case jvm.Ifz(condition=cond, target=target):
-                if not frame.stack: continue
-                nf = clone_frame(frame); v = nf.stack.pop()
-                if cond == "eq":
-                    if v.may_be_zero():   
-                        jf = clone_frame(nf); 
-                        jf.pc.replace(target); 
-                        succ(jf)
-                    if v.may_be_nonzero(): 
-                        ff = clone_frame(nf); 
-                        ff.pc += 1; 
-                        succ(ff)
-                elif cond == "ne":
-                    if v.may_be_nonzero(): 
-                        jf = clone_frame(nf); 
-                        jf.pc.replace(target); 
-                        succ(jf)
-                    if v.may_be_zero():     
-                        ff = clone_frame(nf); 
-                        ff.pc += 1; 
-                        succ(ff)
-                else:
-                    ff = clone_frame(nf); 
-                    ff.pc += 1; 
-                    succ(ff)
-            case jvm.Goto(target=target):
-                nf = clone_frame(frame)
-                nf.pc.replace(target)   
-                succ(nf)       
-
-            case jvm.If(condition=_cond, target=target):
-                nf1 = clone_frame(frame); 
-                nf1.pc.replace(target); 
-                succ(nf1)
-                nf2 = clone_frame(frame); 
-                nf2.pc += 1; 
-                succ(nf2)
-
-            case jvm.NewArray(type=type, dim=dim):
-                if not frame.stack:
-                    continue
-                nf = clone_frame(frame)
-                size_sign = nf.stack.pop()
-
-                L = not_negative_interval_from_sign(size_sign)
-
-                # allocating abstract reference id
-                next_ref = max(entry.aheap.keys(), default=-1) + 1
-
-                nf.stack.push(TOP)
-
-                nf.pc += 1
-
-                new_heap = dict(entry.aheap)
-                new_heap[next_ref] = L
-                succ_with_heap(nf, new_heap)
-
-            case jvm.ArrayLength():
-                if not frame.stack:
-                    continue
-                nf = clone_frame(frame)
-                aref = nf.stack.pop()
-
-                L = LenInterval.top()
-
-                nf.stack.push(interval_to_sign(L))
-                nf.pc += 1
-                succ_with_heap(nf, entry.aheap)
-
-            case jvm.ArrayLoad(type=type):
-                if len(frame.stack.items) < 2:
-                    continue
-                nf = clone_frame(frame)
-                idx_sign = nf.stack.pop()
-                aref = nf.stack.pop()
-
-                L = LenInterval.top()
-
-                idx_min, idx_max = index_interval_from_sign(idx_sign)
-                may_in, may_oob = L.may_contain_index(idx_min, idx_max)
-
-                nf_ok = clone_frame(nf)
-                nf_ok.stack.push(TOP)
-                nf_ok.pc += 1
-                if may_in:
-                    succ_with_heap(nf_ok, entry.aheap)
-
-                if may_oob:
-                    nf_err = clone_frame(nf)
-                    nf_err.pc += 1
-                    succ_with_heap(nf_err, entry.aheap, status="out of bounds")
-
-            case jvm.ArrayStore(type=jvm.Int()):
-                if len(frame.stack.items) < 3: 
-                    continue
-                nf = clone_frame(frame)
-                v_sign = nf.stack.pop()
-                idx_sign = nf.stack.pop()
-                aref = nf.stack.pop()
-
-                L = LenInterval.top()
-
-                idx_min, idx_max = index_interval_from_sign(idx_sign)
-                may_in, may_oob = L.may_contain_index(idx_min, idx_max)
-
-                nf_ok = clone_frame(nf); nf_ok.pc += 1
-                if may_in:
-                    succ_with_heap(nf_ok, entry.aheap)
-                if may_oob:
-                    nf_err = clone_frame(nf); nf_err.pc += 1
-                    succ_with_heap(nf_err, entry.aheap, status="out of bounds")
-
-
-            
-            case jvm.Return(type=None):
-                continue
-
-            case jvm.Return(type=_t):
-                continue
-
-            case _:
-                nf = clone_frame(frame); 
-                nf.pc += 1; 
-                succ(nf)
-
-    return out
-
-
-
 def step(state: State) -> State | str:
     assert isinstance(state, State), f"expected frame but got {state}"
     frame = state.frames.peek()
     opr = bc[frame.pc]
-    logger.debug(f"STEP {opr}\n{state}")
+    # Formatted lazily, as the state is large and this runs on every step
+    logger.debug("STEP {}\n{}", opr, state)
     match opr:
         case jvm.Push(value=v):
             match v.type:
@@ -508,35 +162,38 @@ def step(state: State) -> State | str:
             if v2.value == 0:
                 return "divide by zero"
 
-            frame.stack.push(jvm.Value.int(v1.value // v2.value))
+            frame.stack.push(jvm.Value.int(arithmetic.int_div(v1.value, v2.value)))
             frame.pc += 1
             return state
         case jvm.Binary(type=jvm.Int(), operant=jvm.BinaryOpr.Sub):
             v2, v1 = frame.stack.pop(), frame.stack.pop()
             assert v1.type is jvm.Int(), f"expected int, but got {v1}"
             assert v2.type is jvm.Int(), f"expected int, but got {v2}"
-            frame.stack.push(jvm.Value.int(v1.value - v2.value))
+            frame.stack.push(jvm.Value.int(arithmetic.int_sub(v1.value, v2.value)))
             frame.pc += 1
             return state
         case jvm.Binary(type=jvm.Int(), operant=jvm.BinaryOpr.Rem):
             v2, v1 = frame.stack.pop(), frame.stack.pop()
             assert v1.type is jvm.Int(), f"expected int, but got {v1}"
             assert v2.type is jvm.Int(), f"expected int, but got {v2}"
-            frame.stack.push(jvm.Value.int(v1.value % v2.value))
+            if v2.value == 0:
+                return "divide by zero"
+
+            frame.stack.push(jvm.Value.int(arithmetic.int_rem(v1.value, v2.value)))
             frame.pc += 1
             return state
         case jvm.Binary(type=jvm.Int(), operant=jvm.BinaryOpr.Mul):
             v2, v1 = frame.stack.pop(), frame.stack.pop()
             assert v1.type is jvm.Int(), f"expected int, but got {v1}"
             assert v2.type is jvm.Int(), f"expected int, but got {v2}"
-            frame.stack.push(jvm.Value.int(v1.value * v2.value))
+            frame.stack.push(jvm.Value.int(arithmetic.int_mul(v1.value, v2.value)))
             frame.pc += 1
             return state
         case jvm.Binary(type=jvm.Int(), operant=jvm.BinaryOpr.Add):
             v2, v1 = frame.stack.pop(), frame.stack.pop()
             assert v1.type is jvm.Int(), f"expected int, but got {v1}"
             assert v2.type is jvm.Int(), f"expected int, but got {v2}"
-            frame.stack.push(jvm.Value.int(v1.value + v2.value))
+            frame.stack.push(jvm.Value.int(arithmetic.int_add(v1.value, v2.value)))
             frame.pc += 1
             return state
         case jvm.Return(type=None):
@@ -808,7 +465,7 @@ def step(state: State) -> State | str:
             assert v.type == from_, f"Expected type {from_}, got {v.type}"
             match to_:
                 case jvm.Short():
-                        frame.stack.push(jvm.Value.int(numpy.short(v.value))) 
+                        frame.stack.push(jvm.Value.int(arithmetic.i2s(v.value)))
                 case _:
                     raise NotImplementedError(f"Don't know how to cast to: {to_}")
             frame.pc += 1
@@ -816,6 +473,9 @@ def step(state: State) -> State | str:
         case jvm.NewArray(type=type, dim=dim):
             v = frame.stack.pop()
             assert v.type == jvm.Int(), f"Expected operand to be of type int, got {v.type}"
+            if v.value > MAX_ARRAY_LENGTH:
+                # The arrays are lists, so fuzzed lengths could exhaust the memory
+                raise NotImplementedError(f"Don't know how to handle arrays of length {v.value}")
             match type:
                 case jvm.Int():
                     heap_pos = state.heap_append(jvm.Value.array(type, [0 for _ in range(v.value)]))
@@ -843,13 +503,67 @@ def step(state: State) -> State | str:
             return state
         case jvm.Incr(index=idx, amount=amount):
             assert frame.locals[idx].type == jvm.Int(), f"Expected {jvm.Int()}, got {frame.locals[idx].type}"
-            frame.locals[idx] = jvm.Value.int(frame.locals[idx].value + amount)
+            frame.locals[idx] = jvm.Value.int(arithmetic.int_add(frame.locals[idx].value, amount))
             frame.pc += 1
             return state
         case a:
             raise NotImplementedError(f"Don't know how to handle: {a!r}")
 
-def execute(methodid, input):
+# The stored executions are keyed by the source of the interpreter, so the ones
+# left by an earlier version of it are not reused
+EXECUTOR = "interpreter:" + hashlib.sha256(
+    b"".join(
+        Path(file).read_bytes()
+        for file in [__file__, virtual_methods.__file__, dynamic_methods.__file__]
+    )
+).hexdigest()[:16]
+
+
+def execute(methodid, input, coverage=None, max_steps=1000000, memo=None, calls=None):
+    """Run the method on the input, and return the outcome.
+
+    If coverage is a set, the edges taken are added to it, as pairs of
+    (method, offset) before and after each step.
+
+    If memo is a `jpamb.memo.MemoStore`, an earlier execution of the input
+    is reused if it is stored, and otherwise this one is stored.
+
+    If calls is a `PureCalls`, the calls of pure methods are memoized.
+    """
+    return execute_counted(methodid, input, coverage, max_steps, memo, calls)[0]
+
+
+def execute_counted(
+    methodid, input, coverage=None, max_steps=1000000, memo=None, calls=None
+):
+    """Like `execute`, but also return the number of steps taken, which is
+    the same whether the execution is reused from the memo or not."""
+    if memo is None:
+        return run_counted(initial_state(methodid, input), coverage, max_steps, calls)
+
+    wants_coverage = coverage is not None
+    if known := memo.lookup(EXECUTOR, methodid, input, max_steps, wants_coverage):
+        if wants_coverage:
+            coverage |= known.coverage
+        return known.outcome, min(known.steps, max_steps)
+
+    edges = set() if wants_coverage else None
+    outcome, steps = run_counted(
+        initial_state(methodid, input), edges, max_steps, calls
+    )
+    memo.store(
+        EXECUTOR,
+        methodid,
+        input,
+        Execution(outcome, steps, frozenset(edges) if wants_coverage else None),
+    )
+    if wants_coverage:
+        coverage |= edges
+    return outcome, steps
+
+
+def initial_state(methodid, input) -> State:
+    """The state before the first step, with the input in the locals and heap."""
     frame = Frame.from_method(methodid)
     heap = {}
     heap_items = 0
@@ -887,108 +601,264 @@ def execute(methodid, input):
             case _:
                 raise NotImplementedError(f"Don't know how to handle {v}")
         frame.locals[i] = v
-    state = State(heap, heap_items, Stack.empty().push(frame))
+    return State(heap, heap_items, Stack.empty().push(frame))
+
 
-    for x in range(1000000):
+def run(state, coverage=None, max_steps=1000000, calls=None):
+    """Step the state until it has an outcome, or max_steps are taken."""
+    return run_counted(state, coverage, max_steps, calls)[0]
+
+
+def run_counted(state, coverage=None, max_steps=1000000, calls=None) -> tuple[str, int]:
+    """Like `run`, but also return the number of steps taken."""
+    if calls is not None:
+        return calls.run(state, coverage, max_steps)
+    for x in range(max_steps):
+        if coverage is not None:
+            pc = state.frames.peek().pc
+            source = (pc.method, pc.offset)
         state = step(state)
         if isinstance(state, str):
-            return state
+            return state, x + 1
+        if coverage is not None:
+            pc = state.frames.peek().pc
+            coverage.add((source, (pc.method, pc.offset)))
     else:
         logger.debug("No more steps")
-        return "*"
-    
-# abstract stuff
+        return "*", max_steps
+
+
+# pure static calls
+
+# The opcodes that do not read or write the heap. Allocating and constructing
+# the errors to throw is allowed too, see `throwable`, as they can not escape
+# the call
+PURE_OPCODES = (
+    jvm.Push,
+    jvm.Load,
+    jvm.Store,
+    jvm.Dup,
+    jvm.Binary,
+    jvm.Incr,
+    jvm.Cast,
+    jvm.If,
+    jvm.Ifz,
+    jvm.Goto,
+    jvm.Return,
+    jvm.Throw,
+)
+PRIMITIVE = (jvm.Boolean, jvm.Byte, jvm.Char, jvm.Short, jvm.Int)
+
+
+def throwable(classname: jvm.ClassName) -> bool:
+    """Is the class one of the errors or exceptions of java.lang, whose
+    constructors do not touch the heap of the program."""
+    name = classname.slashed()
+    return name.startswith("java/lang/") and (
+        name.endswith(("Error", "Exception")) or name == "java/lang/Throwable"
+    )
 
-def _join_states(prev: AState | str, cur: AState | str) -> AState | str:
-    if isinstance(prev, str) and isinstance(cur, str):
-        return prev
-    if isinstance(prev, str):
-        return prev                    
-    if isinstance(cur, str):
-        return cur
-    a, b = prev.frames.peek(), cur.frames.peek()
-    jf = join_frames(a, b)
-    status = prev.status if prev.status != "ok" else cur.status
-    joined_heap = dict(prev.aheap)
-    for ref, L in cur.aheap.items():
-        joined_heap[ref] = joined_heap.get(ref, L).join(L) if ref in joined_heap else L
-    return AState(frames=Stack.empty().push(jf),
-                  status=prev.status if prev.status != "ok" else cur.status, aheap=joined_heap)
-
-def _state_equal(a: AState | str, b: AState | str) -> bool:
-    if isinstance(a, str) or isinstance(b, str):
-        return a == b
-    af, bf = a.frames.peek(), b.frames.peek()
-    heaps_equal = (
-    a.aheap.keys() == b.aheap.keys() and all(a.aheap[k] == b.aheap[k] for k in a.aheap))
-    return (af.pc.method == bf.pc.method and af.pc.offset == bf.pc.offset
-            and af.locals == bf.locals and af.stack.items == bf.stack.items
-            and a.status == b.status and heaps_equal)
-
-def execute_A(methodid, input):
-    af = AFrame.from_method(methodid)
-    for i, v in enumerate(input.values):
-        av = sign_of_const(v)
-        af.locals[i] = av
-
-    start_pc = af.pc
-    start = AState(frames=Stack.empty().push(af), status="ok", aheap={})
-
-    k0 = pc_key(af.pc)
-
-    seen: dict[tuple[jvm.AbsMethodID,int], AState | str] = { k0: start }
-    frontier: dict[tuple[jvm.AbsMethodID,int], AState | str] = { k0: start }
-
-    STEPS_LIMIT = 1_000_000
-    steps = 0
 
-    while frontier and steps < STEPS_LIMIT:
-        steps += 1
-        nxt = step_A(frontier)
-
-        new_frontier: dict[PC, AState | str] = {}
-
-        for pc, val in nxt.items():
-            if pc not in seen:
-                seen[pc] = val
-                new_frontier[pc] = val
+@dataclass
+class Call:
+    """A call of a pure method that has not returned yet."""
+
+    depth: int
+    key: tuple
+    steps: int
+    edges: int
+
+
+@dataclass(frozen=True)
+class CallResult:
+    """What a call of a pure method did: either returned the value, from the
+    exit, or ended the run with the error. The edges are None if they were
+    not recorded."""
+
+    value: jvm.Value | None
+    error: str | None
+    steps: int
+    edges: frozenset | None
+    exit: tuple | None
+
+
+class PureCalls:
+    """The results of the calls of pure static methods, by their arguments.
+
+    A method is pure if it takes and returns primitive values, only uses
+    the opcodes in PURE_OPCODES, does not read any field but
+    `$assertionsDisabled`, only allocates and constructs the errors of
+    java.lang, and only calls pure static methods. A call of a
+    pure method with the arguments of an earlier call then takes all the
+    steps of that call at once, and adds the edges it covered, so the
+    outcome, the steps and the coverage are those of running the call. If
+    the steps left are too few for the call, it is run instead.
+
+    The results are kept between runs, so share an instance between the
+    executions of a method.
+    """
+
+    def __init__(self, suite: jpamb.Suite):
+        self.suite = suite
+        self.purity: dict[jvm.AbsMethodID, bool] = {}
+        self.results: dict[tuple, CallResult] = {}
+        self.hits = 0
+
+    def pure(self, methodid: jvm.AbsMethodID) -> bool:
+        if methodid not in self.purity:
+            self.analyze(methodid)
+        return self.purity[methodid]
+
+    def callees(self, methodid: jvm.AbsMethodID) -> set | None:
+        """The methods called by the method, or None if it is not pure by
+        itself."""
+        ext = methodid.extension
+        if not all(isinstance(t, PRIMITIVE) for t in ext.params):
+            return None
+        if ext.return_type is not None and not isinstance(ext.return_type, PRIMITIVE):
+            return None
+        try:
+            opcodes = list(self.suite.method_opcodes(methodid))
+        except Exception as e:
+            logger.debug(f"Can not decide if {methodid} is pure: {e!r}")
+            return None
+        callees = set()
+        for opr in opcodes:
+            match opr:
+                case jvm.InvokeStatic(method=m):
+                    callees.add(m)
+                case jvm.Get(field=field) if field.extension.name == "$assertionsDisabled":
+                    pass
+                case jvm.Push(value=jvm.Value(type=jvm.Reference())):
+                    return None
+                case jvm.New(classname=cn) if throwable(cn):
+                    pass
+                case jvm.InvokeSpecial(method=m) if (
+                    m.extension.name == "<init>" and throwable(m.classname)
+                ):
+                    pass
+                case _ if isinstance(opr, PURE_OPCODES):
+                    pass
+                case _:
+                    return None
+        return callees
+
+    def analyze(self, methodid: jvm.AbsMethodID):
+        """Decide if the method, and the methods it calls, are pure.
+
+        Recursive methods can be pure, so every method is assumed pure until
+        it calls a method that is not.
+        """
+        calls = {}
+        todo = [methodid]
+        while todo:
+            m = todo.pop()
+            if m in calls or m in self.purity:
                 continue
+            calls[m] = self.callees(m)
+            todo.extend(calls[m] or ())
+
+        pure = {m for m, callees in calls.items() if callees is not None}
+        changed = True
+        while changed:
+            changed = False
+            for m in list(pure):
+                if not all(c in pure or self.purity.get(c) for c in calls[m]):
+                    pure.discard(m)
+                    changed = True
+        for m in calls:
+            self.purity[m] = m in pure
+            logger.debug(f"{m} is {'pure' if m in pure else 'not pure'}")
+
+    def run(self, state, coverage=None, max_steps=1000000) -> tuple[str, int]:
+        """Like `run_counted`, but with the calls of pure methods memoized."""
+        log = None if coverage is None else []
+        try:
+            return self.advance(state, log, max_steps)
+        finally:
+            # The edges are added even if a step is not supported
+            if log is not None:
+                coverage.update(log)
+
+    def advance(self, state, log, max_steps) -> tuple[str, int]:
+        """Step the state, and append the edges taken to the log if it is a
+        list."""
+        calls: list[Call] = []
+        steps = 0
+        while steps < max_steps:
+            depth = len(state.frames.items)
+            pc = state.frames.peek().pc
+            source = (pc.method, pc.offset)
+            state = step(state)
+            steps += 1
+            if isinstance(state, str):
+                # The error is the result of every call that has not returned
+                for call in calls:
+                    edges = None if log is None else frozenset(log[call.edges :])
+                    self.results[call.key] = CallResult(
+                        None, state, steps - call.steps, edges, None
+                    )
+                break
+
+            frame = state.frames.peek()
+            target = (frame.pc.method, frame.pc.offset)
+            if log is not None:
+                log.append((source, target))
+
+            if len(state.frames.items) > depth:
+                if not self.pure(frame.pc.method):
+                    continue
+                key = (frame.pc.method, tuple(sorted(frame.locals.items())))
+                known = self.results.get(key)
+                if (
+                    known is None
+                    or steps + known.steps > max_steps
+                    or (log is not None and known.edges is None)
+                ):
+                    calls.append(Call(depth + 1, key, steps, len(log or ())))
+                    continue
 
-            joined = _join_states(seen[pc], val)
-            if not _state_equal(joined, seen[pc]):
-                seen[pc] = joined
-                new_frontier[pc] = joined
-
-        frontier = new_frontier
-
-    if steps >= STEPS_LIMIT:
-        logger.debug("Abstract fixpoint: step limit reached")
-
-    return seen
-
-# output 
-def dump_A(seen: dict[tuple[jvm.AbsMethodID, int], AState | str]):
-    final_status = "ok" 
-
-    for (method, offset), v in sorted(seen.items(), key=lambda it: (str(it[0][0]), it[0][1])):
-        pc_s = f"{method}:{offset}"
-        if isinstance(v, str):
-            print(f"{pc_s}: <{v}>")
-            if v != "ok":
-                final_status = v
+                self.hits += 1
+                steps += known.steps
+                if log is not None:
+                    log.extend(known.edges)
+                if known.error is not None:
+                    state = known.error
+                    break
+                state.frames.pop()
+                caller = state.frames.peek()
+                if known.value is not None:
+                    caller.stack.push(known.value)
+                if log is not None:
+                    log.append((known.exit, (caller.pc.method, caller.pc.offset)))
+
+            elif calls and len(state.frames.items) < calls[-1].depth:
+                call = calls.pop()
+                method = call.key[0]
+                value = None
+                if method.extension.return_type is not None:
+                    value = frame.stack.peek()
+                # The last edge goes back to the caller
+                edges = None if log is None else frozenset(log[call.edges : -1])
+                self.results[call.key] = CallResult(
+                    value, None, steps - call.steps, edges, source
+                )
         else:
-            fr = v.frames.peek()
-            locs = ", ".join(f"{i}:{val}" for i, val in sorted(fr.locals.items()))
-            stack = "[" + ", ".join(str(s) for s in fr.stack.items) + "]"
-            heap_s = ", ".join(f"{r}:{L}" for r, L in sorted(v.aheap.items()))
-            print(f"{pc_s}: status={v.status}  locals={{ {locs} }}  stack={stack}  heap={{ {heap_s} }}")
+            logger.debug("No more steps")
+            state = "*"
 
-            if v.status != "ok":
-                final_status = v.status
+        return state, steps
+    
+# abstract stuff
 
-    print(final_status)
+analysis = Analysis(suite)
 
 
+def execute_A(methodid, input, analysis: Analysis = analysis) -> Result:
+    """The abstract states of the method called with the input, and the
+    outcomes it may end in."""
+    args = tuple(analysis.const(v) for v in input.values)
+    return analysis.analyze(methodid, args)
 
 
 if __name__ == "__main__":
@@ -997,8 +867,11 @@ if __name__ == "__main__":
     #concrete = execute(methodid, input)
     #print(concrete)
 
-    # Abstract run
-    abstract_seen = execute_A(methodid, input)
+    # Abstract run, over the domain named by JPAMB_DOMAIN, see domains.DOMAINS
+    domain = os.environ.get("JPAMB_DOMAIN", "signs")
+    if domain not in DOMAINS:
+        sys.exit(f"Unknown domain {domain!r}, use one of {', '.join(DOMAINS)}")
+    abstract_seen = execute_A(methodid, input, Analysis(suite, values=DOMAINS[domain]))
     #print("== abstract ==")
     dump_A(abstract_seen)
     
\ No newline at end of file
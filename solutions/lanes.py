@@ -0,0 +1,455 @@
+#!/usr/bin/env python3
+"""A lane vectorized executor, which runs one method on a batch of inputs in
+lockstep.
+
+Every input is a lane, and the locals and the operand stack hold one int32
+NumPy vector per slot, with an element per lane. The lanes at the same
+offset form a warp, which executes each opcode once for all of its lanes.
+When the lanes of a warp disagree at an `If` or `Ifz`, the warp is split in
+two, and the halves run one after the other until they reach the immediate
+post-dominator of the branch, where they are merged again. This is the
+reconvergence stack of a SIMT processor.
+
+Opcodes which touch the heap, like arrays, strings and calls, are not
+vectorized. When a warp reaches one, its lanes are turned into states of the
+interpreter in `solutions/interpreter.py`, which runs them to the end one at
+a time. The same happens to the whole batch if the method takes parameters
+which are not ints.
+
+Arithmetic wraps at 32 bits and divisions truncate toward zero, like in the
+JVM.
+"""
+
+from collections import Counter
+from dataclasses import dataclass
+import sys
+
+import numpy as np
+from loguru import logger
+
+import jpamb
+from jpamb import jvm
+import interpreter
+from fuzzer import Fuzzer, Unfuzzable
+
+BATCH = 1024
+SCALAR_BATCH = 64
+MAX_STEPS = 10_000
+
+INT_LIKE = (jvm.Int, jvm.Boolean, jvm.Char, jvm.Short, jvm.Byte)
+
+# As the interpreter stores new objects in its heap
+ASSERTION_ERROR = "java/lang/AssertionError"
+
+CONDITIONS = {
+    "eq": np.equal,
+    "ne": np.not_equal,
+    "lt": np.less,
+    "ge": np.greater_equal,
+    "gt": np.greater,
+    "le": np.less_equal,
+}
+
+
+@dataclass(frozen=True)
+class Uniform:
+    """A value which is the same in every lane, like a new exception, as it
+    is stored in the heap of the interpreter."""
+
+    value: object
+
+
+class Unsupported(Exception):
+    """The opcode is not vectorized."""
+
+
+def postdominators(opcodes: list[jvm.Opcode]) -> list[int | None]:
+    """The immediate post-dominator of every offset, or None if it can not
+    reach the exit of the method."""
+    exit = len(opcodes)
+    successors = []
+    for i, opr in enumerate(opcodes):
+        match opr:
+            case jvm.If(target=target) | jvm.Ifz(target=target):
+                successors.append({target, i + 1})
+            case jvm.Goto(target=target):
+                successors.append({target})
+            case jvm.Return() | jvm.Throw():
+                successors.append({exit})
+            case _:
+                successors.append({i + 1})
+
+    everything = frozenset(range(exit + 1))
+    pdom = [everything] * exit + [frozenset([exit])]
+    changed = True
+    while changed:
+        changed = False
+        for i in reversed(range(exit)):
+            new = frozenset([i]).union(
+                frozenset.intersection(*(pdom[s] for s in successors[i]))
+            )
+            if new != pdom[i]:
+                pdom[i] = new
+                changed = True
+
+    ipdom = []
+    for i in range(exit):
+        if exit not in pdom[i]:
+            ipdom.append(None)
+            continue
+        strict = pdom[i] - {i}
+        # The immediate post-dominator is post-dominated by all the others
+        ipdom.append(next(d for d in strict if pdom[d] == strict))
+    return ipdom
+
+
+def pick(slot, mask):
+    return slot[mask] if isinstance(slot, np.ndarray) else slot
+
+
+def join(a, b):
+    if isinstance(a, np.ndarray) and isinstance(b, np.ndarray):
+        return np.concatenate([a, b])
+    if isinstance(a, Uniform) and a == b:
+        return a
+    return None
+
+
+@dataclass
+class Warp:
+    """The lanes at the same offset, with a vector per local and stack slot."""
+
+    lanes: np.ndarray
+    steps: np.ndarray
+    locals: dict[int, object]
+    stack: list[object]
+
+    def __len__(self):
+        return len(self.lanes)
+
+    def select(self, mask: np.ndarray) -> "Warp":
+        return Warp(
+            self.lanes[mask],
+            self.steps[mask],
+            {i: pick(v, mask) for i, v in self.locals.items()},
+            [pick(v, mask) for v in self.stack],
+        )
+
+    def merge(self, other: "Warp") -> "Warp | None":
+        """The lanes of both warps, or None if their values can not share a
+        slot."""
+        assert len(self.stack) == len(other.stack), "stacks differ at a merge"
+        stack = [join(a, b) for a, b in zip(self.stack, other.stack)]
+        if any(v is None for v in stack):
+            return None
+        # Locals which are only set on one of the paths are dead
+        locals = {}
+        for i in self.locals.keys() & other.locals.keys():
+            if (v := join(self.locals[i], other.locals[i])) is not None:
+                locals[i] = v
+        return Warp(
+            np.concatenate([self.lanes, other.lanes]),
+            np.concatenate([self.steps, other.steps]),
+            locals,
+            stack,
+        )
+
+
+@dataclass
+class Entry:
+    """An entry of the reconvergence stack: the warp runs from pc until it
+    reaches rpc, where it merges with the parent, the entry it split from,
+    which waits at rpc."""
+
+    pc: int
+    rpc: int | None
+    warp: Warp | None
+    parent: "Entry | None" = None
+
+
+def int_of(value: jvm.Value) -> int:
+    match value:
+        case jvm.Value(type=jvm.Boolean(), value=b):
+            return 1 if b else 0
+        case jvm.Value(type=jvm.Char(), value=c):
+            return ord(c)
+        case jvm.Value(value=n):
+            return n
+
+
+def truncating_divide(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    a, b = a.astype(np.int64), b.astype(np.int64)
+    q = a // b
+    q += (a % b != 0) & ((a < 0) != (b < 0))
+    return q
+
+
+class LaneExecutor:
+    def __init__(
+        self, methodid: jvm.AbsMethodID, max_steps: int = MAX_STEPS, suite=None
+    ):
+        self.methodid = methodid
+        self.max_steps = max_steps
+        self.suite = suite or jpamb.Suite()
+        self.opcodes = list(self.suite.method_opcodes(methodid))
+        self.ipdom = postdominators(self.opcodes)
+        self.vectorized = all(
+            isinstance(tt, INT_LIKE) for tt in methodid.extension.params
+        )
+        # warp steps, lane steps and lanes handed to the interpreter
+        self.stats: Counter[str] = Counter()
+
+    def run(self, inputs: list[jpamb.Input]) -> list[str]:
+        """The outcome of every input."""
+        self.outcomes: list[str | None] = [None] * len(inputs)
+        if not self.vectorized:
+            for lane, input in enumerate(inputs):
+                self.outcomes[lane] = self.scalar(input)
+            return self.outcomes
+
+        n = len(inputs)
+        locals = {
+            i: np.array([int_of(input.values[i]) for input in inputs], np.int32)
+            for i in range(len(self.methodid.extension.params))
+        }
+        warp = Warp(np.arange(n), np.zeros(n, np.int64), locals, [])
+        self.entries = [Entry(0, None, warp)]
+        while self.entries:
+            entry = self.entries[-1]
+            if not entry.warp:
+                self.entries.pop()
+            elif entry.pc == entry.rpc:
+                self.entries.pop()
+                self.reconverge(entry)
+            else:
+                self.step(entry)
+        return self.outcomes
+
+    def reconverge(self, entry: Entry):
+        """Merge the warp of the entry into the entry it split from."""
+        parent = entry.parent
+        if parent.warp is None:
+            parent.warp = entry.warp
+        elif (merged := parent.warp.merge(entry.warp)) is not None:
+            parent.warp = merged
+        else:
+            # The lanes can not share the slots of the parent, so they go on
+            # beside it, from where it waits
+            self.entries.append(Entry(parent.pc, parent.rpc, entry.warp, parent.parent))
+
+    def finish(self, entry: Entry, mask: np.ndarray, outcome: str):
+        """The lanes of the mask end with the outcome."""
+        for lane in entry.warp.lanes[mask]:
+            self.outcomes[lane] = outcome
+        entry.warp = entry.warp.select(~mask)
+
+    def branch(self, entry: Entry, taken: np.ndarray, target: int):
+        if taken.all():
+            entry.pc = target
+            return
+        if not taken.any():
+            entry.pc += 1
+            return
+        pc, warp = entry.pc, entry.warp
+        rpc = self.ipdom[pc]
+        if rpc is None or rpc == entry.rpc:
+            # The halves merge where this entry would have, if ever
+            self.entries.pop()
+            rpc, parent = entry.rpc, entry.parent
+        else:
+            entry.pc, entry.warp = rpc, None
+            parent = entry
+        self.entries.append(Entry(pc + 1, rpc, warp.select(~taken), parent))
+        self.entries.append(Entry(target, rpc, warp.select(taken), parent))
+
+    def step(self, entry: Entry):
+        warp = entry.warp
+        exhausted = warp.steps >= self.max_steps
+        if exhausted.any():
+            self.finish(entry, exhausted, "*")
+            if not entry.warp:
+                return
+            warp = entry.warp
+
+        opr = self.opcodes[entry.pc]
+        warp.steps += 1
+        try:
+            self.execute(entry, opr)
+        except Unsupported:
+            # Nothing is changed before an opcode is found to be unsupported
+            warp.steps -= 1
+            self.stats["scalar lanes"] += len(warp)
+            for lane, state, steps in self.states(entry.pc, warp):
+                self.outcomes[lane] = self.resume(state, steps)
+            entry.warp = None
+            return
+        self.stats["warp steps"] += 1
+        self.stats["lane steps"] += len(warp)
+
+    def execute(self, entry: Entry, opr: jvm.Opcode):
+        warp = entry.warp
+        stack = warp.stack
+        match opr:
+            case jvm.Push(value=value) if isinstance(value.type, INT_LIKE):
+                stack.append(np.full(len(warp), int_of(value), np.int32))
+            case jvm.Load(type=tt, index=i) if isinstance(tt, INT_LIKE):
+                stack.append(warp.locals[i])
+            case jvm.Store(type=tt, index=i) if isinstance(tt, INT_LIKE) and isinstance(
+                stack[-1], np.ndarray
+            ):
+                warp.locals[i] = stack.pop()
+            case jvm.Incr(index=i, amount=amount):
+                warp.locals[i] = warp.locals[i] + np.int32(amount)
+            case jvm.Dup():
+                stack.append(stack[-1])
+            case jvm.Binary(type=jvm.Int(), operant=operant):
+                b, a = stack[-1], stack[-2]
+                if operant in (jvm.BinaryOpr.Div, jvm.BinaryOpr.Rem):
+                    zero = b == 0
+                    if zero.any():
+                        self.finish(entry, zero, "divide by zero")
+                        a, b = a[~zero], b[~zero]
+                        warp = entry.warp
+                        stack = warp.stack
+                    q = truncating_divide(a, b)
+                    if operant == jvm.BinaryOpr.Rem:
+                        q = a - b * q
+                    result = q.astype(np.int32)
+                else:
+                    match operant:
+                        case jvm.BinaryOpr.Add:
+                            result = a + b
+                        case jvm.BinaryOpr.Sub:
+                            result = a - b
+                        case jvm.BinaryOpr.Mul:
+                            result = a * b
+                del stack[-2:]
+                stack.append(result)
+            case jvm.Cast(from_=jvm.Int(), to_=jvm.Short()):
+                stack.append(stack.pop().astype(np.int16).astype(np.int32))
+            case jvm.Ifz(condition=condition, target=target) if (
+                condition in CONDITIONS and isinstance(stack[-1], np.ndarray)
+            ):
+                self.branch(entry, CONDITIONS[condition](stack.pop(), 0), target)
+                return
+            case jvm.If(condition=condition, target=target) if (
+                condition in CONDITIONS
+                and isinstance(stack[-1], np.ndarray)
+                and isinstance(stack[-2], np.ndarray)
+            ):
+                b, a = stack.pop(), stack.pop()
+                self.branch(entry, CONDITIONS[condition](a, b), target)
+                return
+            case jvm.Goto(target=target):
+                entry.pc = target
+                return
+            case jvm.Get(field=field) if field.extension.name == "$assertionsDisabled":
+                stack.append(np.zeros(len(warp), np.int32))
+            case jvm.New(classname=cname):
+                stack.append(Uniform(cname.name))
+            case jvm.InvokeSpecial(method=m) if not m.extension.params:
+                stack.pop()
+            case jvm.Throw() if isinstance(stack[-1], Uniform) and (
+                stack[-1].value == ASSERTION_ERROR
+            ):
+                self.finish(entry, np.ones(len(warp), bool), "assertion error")
+                return
+            case jvm.Return():
+                self.finish(entry, np.ones(len(warp), bool), "ok")
+                return
+            case _:
+                raise Unsupported(opr)
+        entry.pc += 1
+
+    def scalar(self, input: jpamb.Input) -> str:
+        try:
+            return interpreter.execute(self.methodid, input, max_steps=self.max_steps)
+        except Exception as e:
+            logger.debug(f"Could not interpret {input.encode()}: {e!r}")
+            return "unsupported"
+
+    def resume(self, state: interpreter.State, steps: int) -> str:
+        try:
+            return interpreter.run(state, max_steps=steps)
+        except Exception as e:
+            logger.debug(f"Could not interpret {state}: {e!r}")
+            return "unsupported"
+
+    def states(self, pc: int, warp: Warp):
+        """The lanes of the warp as interpreter states, with the number of
+        steps they have left."""
+        for k, lane in enumerate(warp.lanes):
+            heap = {}
+
+            def value(slot):
+                if isinstance(slot, Uniform):
+                    heap[len(heap)] = slot.value
+                    return jvm.Value.reference(len(heap) - 1)
+                return jvm.Value.int(int(slot[k]))
+
+            frame = interpreter.Frame(
+                {i: value(v) for i, v in warp.locals.items()},
+                interpreter.Stack([value(v) for v in warp.stack]),
+                interpreter.PC(self.methodid, pc),
+            )
+            state = interpreter.State(heap, len(heap), interpreter.Stack([frame]))
+            yield lane, state, self.max_steps - int(warp.steps[k])
+
+
+if __name__ == "__main__":
+    methodid = jpamb.getmethodid(
+        "lanes",
+        "1.0",
+        "The Rice Theorem Cookers",
+        ["dynamic", "python"],
+        for_science=True,
+    )
+
+    logger.remove()
+    logger.add(sys.stderr, format="[{level}] {message}", level="INFO")
+    logger.disable("interpreter")
+
+    executor = LaneExecutor(methodid)
+    if not methodid.extension.params:
+        batch = 1
+    elif executor.vectorized:
+        batch = BATCH
+    else:
+        # Every input is run by the interpreter on its own
+        batch = SCALAR_BATCH
+
+    # The inputs are drawn like the first inputs of the fuzzer, but all at once
+    fuzzer = Fuzzer(methodid)
+    try:
+        inputs = [
+            jpamb.Input(tuple(fuzzer.generate(tt) for tt in fuzzer.params))
+            for _ in range(batch)
+        ]
+    except Unfuzzable as e:
+        logger.info(f"Can not generate inputs for {methodid}: {e}")
+        inputs = None
+
+    outcomes = Counter()
+    if inputs:
+        outcomes.update(executor.run(inputs))
+        logger.info(
+            f"Ran {len(inputs)} inputs: {dict(outcomes)}, {dict(executor.stats)}"
+        )
+
+    for outcome in [
+        "ok",
+        "divide by zero",
+        "assertion error",
+        "out of bounds",
+        "null pointer",
+        "*",
+    ]:
+        if inputs is None or outcomes["unsupported"] == len(inputs):
+            likelihood = "50%"
+        elif outcome == "*" and outcome in outcomes:
+            likelihood = "30%" if fuzzer.params else "90%"
+        elif outcome in outcomes:
+            likelihood = "95%"
+        else:
+            likelihood = "10%"
+        print(f"{outcome};{likelihood}")
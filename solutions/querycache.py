@@ -0,0 +1,167 @@
+"""Feasibility queries for symbolic execution, with slicing and a cache.
+
+A query asks if a path condition, known to be satisfiable, is still
+satisfiable with one more constraint. Before it reaches z3, the query is
+sliced to the constraints which share variables with the new constraint,
+directly or through other constraints, as the rest of the path can not make
+it unsatisfiable. The slice is then answered by the cache if
+
+- the same set of constraints was decided before,
+- it contains the unsat core of an earlier query, or
+- one of the recent models satisfies it, which covers every subset of an
+  earlier satisfiable query.
+
+Only the queries the cache can not answer are sent to the solver, which is
+shared by all queries, and gets the constraints as assumptions.
+"""
+
+from collections import Counter, deque
+from dataclasses import dataclass, field
+import time
+
+import z3
+
+
+@dataclass
+class QueryStats:
+    """The number of queries, how they were answered, and the time spent in
+    the solver. The branches whose condition simplifies to true or false never
+    become queries, and are counted apart in trivial_branches."""
+
+    queries: int = 0
+    trivial_branches: int = 0
+    hits: Counter = field(default_factory=Counter)
+    solver_calls: int = 0
+    sat: int = 0
+    unsat: int = 0
+    unknown: int = 0
+    solver_time: float = 0.0
+    slowest: float = 0.0
+    constraints: int = 0
+    sliced: int = 0
+
+    def record(self, result: z3.CheckSatResult, seconds: float):
+        self.solver_calls += 1
+        self.solver_time += seconds
+        self.slowest = max(self.slowest, seconds)
+        if result == z3.sat:
+            self.sat += 1
+        elif result == z3.unsat:
+            self.unsat += 1
+        else:
+            self.unknown += 1
+
+    @property
+    def hit_rate(self) -> float:
+        return self.hits.total() / self.queries if self.queries else 0.0
+
+    def __str__(self):
+        hits = ", ".join(f"{n} {kind}" for kind, n in sorted(self.hits.items()))
+        return (
+            f"{self.queries} queries; "
+            f"{self.trivial_branches} trivially decided branches; "
+            f"cache hit rate {self.hit_rate:.0%} ({hits or 'no hits'}); "
+            f"sliced {self.constraints} constraints to {self.sliced}; "
+            f"{self.solver_calls} solver calls ({self.sat} sat, {self.unsat} unsat, "
+            f"{self.unknown} unknown)"
+        )
+
+    def timings(self) -> str:
+        """The time spent in the solver, which is kept out of __str__ as it
+        differs from run to run."""
+        mean = self.solver_time / self.solver_calls if self.solver_calls else 0.0
+        return (
+            f"{self.solver_time * 1000:.1f}ms in the solver, "
+            f"mean {mean * 1000:.2f}ms, slowest {self.slowest * 1000:.2f}ms"
+        )
+
+
+class QueryCache:
+    def __init__(self, rlimit: int, max_models: int = 8):
+        self.solver = z3.Solver()
+        # A resource limit, unlike a timeout, gives up on the same queries
+        # on every machine
+        self.solver.set("rlimit", rlimit)
+        self.stats = QueryStats()
+        self.results: dict[frozenset[int], bool] = {}
+        self.cores: list[frozenset[int]] = []
+        self.models: deque[z3.ModelRef] = deque(maxlen=max_models)
+        self.variables: dict[int, frozenset[int]] = {}
+        # The ids of z3 expressions are only unique while they are alive
+        self.alive: dict[int, z3.ExprRef] = {}
+
+    def variables_of(self, expr: z3.ExprRef) -> frozenset[int]:
+        """The ids of the uninterpreted constants in expr."""
+        key = expr.get_id()
+        if key not in self.variables:
+            if z3.is_const(expr) and expr.decl().kind() == z3.Z3_OP_UNINTERPRETED:
+                variables = frozenset([key])
+            else:
+                variables = frozenset().union(
+                    *(self.variables_of(c) for c in expr.children())
+                )
+            self.variables[key] = variables
+            self.alive[key] = expr
+        return self.variables[key]
+
+    def slice(self, path: tuple[z3.BoolRef, ...], cond: z3.BoolRef) -> list:
+        """The constraints of path which share variables with cond, directly or
+        through other constraints, together with cond."""
+        relevant = set(self.variables_of(cond))
+        sliced = [cond]
+        rest = list(path)
+        changed = True
+        while changed:
+            changed = False
+            remaining = []
+            for c in rest:
+                variables = self.variables_of(c)
+                if relevant.isdisjoint(variables):
+                    remaining.append(c)
+                else:
+                    relevant |= variables
+                    sliced.append(c)
+                    changed = True
+            rest = remaining
+        return sliced
+
+    def lookup(self, key: frozenset[int], constraints: list) -> bool | None:
+        if key in self.results:
+            self.stats.hits["exact"] += 1
+            return self.results[key]
+        for core in self.cores:
+            if core <= key:
+                self.stats.hits["unsat core"] += 1
+                return False
+        for model in self.models:
+            if all(
+                z3.is_true(model.eval(c, model_completion=True)) for c in constraints
+            ):
+                self.stats.hits["model"] += 1
+                return True
+        return None
+
+    def feasible(self, path: tuple[z3.BoolRef, ...], cond: z3.BoolRef) -> bool | None:
+        """Is the satisfiable path still satisfiable with cond, or None if the
+        solver does not know."""
+        self.stats.queries += 1
+        constraints = self.slice(path, cond)
+        self.stats.constraints += len(path) + 1
+        self.stats.sliced += len(constraints)
+
+        key = frozenset(c.get_id() for c in constraints)
+        if (cached := self.lookup(key, constraints)) is not None:
+            return cached
+
+        start = time.perf_counter()
+        result = self.solver.check(*constraints)
+        self.stats.record(result, time.perf_counter() - start)
+        if result == z3.sat:
+            self.models.appendleft(self.solver.model())
+            self.results[key] = True
+            return True
+        if result == z3.unsat:
+            self.cores.append(frozenset(c.get_id() for c in self.solver.unsat_core()))
+            self.results[key] = False
+            return False
+        return None
@@ -0,0 +1,538 @@
+#!/usr/bin/env python3
+"""A symbolic executor, which uses z3 to decide which outcomes are feasible.
+
+The executor walks the opcodes of the method depth first, keeping 32 bit
+bitvectors on the stack and in the locals. Every branch, and every check
+that can fail, like a division by zero or an array index, asks if the path
+is feasible. The queries are sliced and cached by `querycache`, and only the
+queries it can not answer reach the one solver shared by the whole method.
+
+The exploration is bounded by a number of paths, steps and queries, a
+number of steps and branches per path, and a call depth, and the solver by a
+resource limit instead of a timeout, so the report does not depend on the
+speed of the machine, only on the version of z3. If a bound is hit, or an operation is not supported, the outcomes
+that were not found are only reported as unlikely instead of impossible. As
+the paths are explored depth first, a loop can use the whole budget before
+the other side of an earlier branch is explored, like the assertion of
+`Tricky.collatz` for n <= 0.
+"""
+
+from dataclasses import dataclass, field
+import sys
+
+import z3
+from loguru import logger
+
+import jpamb
+from jpamb import jvm
+from querycache import QueryCache
+
+MAX_PATHS = 1000
+MAX_TOTAL_STEPS = 20_000
+MAX_QUERIES = 200
+MAX_STEPS = 2000
+MAX_BRANCHES = 200
+MAX_CALL_DEPTH = 4
+SOLVER_RLIMIT = 1_000_000
+
+
+@dataclass(frozen=True)
+class Ref:
+    """A reference to an array in the heap of a path."""
+
+    address: int
+
+
+@dataclass(frozen=True)
+class Obj:
+    """An object the executor does not look inside, like a string."""
+
+    classname: jvm.ClassName | None = None
+
+
+@dataclass(frozen=True)
+class SymArray:
+    length: z3.BitVecRef
+    contents: z3.ArrayRef
+
+
+@dataclass
+class Frame:
+    method: jvm.AbsMethodID
+    pc: int
+    locals: dict[int, object]
+    stack: list[object]
+
+    def copy(self) -> "Frame":
+        return Frame(self.method, self.pc, dict(self.locals), list(self.stack))
+
+
+@dataclass
+class State:
+    frames: list[Frame]
+    heap: dict[int, SymArray] = field(default_factory=dict)
+    steps: int = 0
+
+    @property
+    def frame(self) -> Frame:
+        return self.frames[-1]
+
+    def copy(self) -> "State":
+        return State([f.copy() for f in self.frames], dict(self.heap), self.steps)
+
+    def allocate(self, array: SymArray) -> Ref:
+        ref = Ref(len(self.heap))
+        self.heap[ref.address] = array
+        return ref
+
+
+def bv(value: int) -> z3.BitVecRef:
+    return z3.BitVecVal(value, 32)
+
+
+CONDITIONS = {
+    "eq": lambda a, b: a == b,
+    "ne": lambda a, b: a != b,
+    "lt": lambda a, b: a < b,
+    "ge": lambda a, b: a >= b,
+    "gt": lambda a, b: a > b,
+    "le": lambda a, b: a <= b,
+}
+
+INT_LIKE = (jvm.Int, jvm.Boolean, jvm.Char, jvm.Short, jvm.Byte)
+
+ASSERTION_ERROR = "java/lang/AssertionError"
+
+
+class Unsupported(Exception):
+    """The path uses something the executor does not model."""
+
+
+class Executor:
+    def __init__(self, suite: jpamb.Suite, methodid: jvm.AbsMethodID):
+        self.suite = suite
+        self.methodid = methodid
+        self.queries = QueryCache(SOLVER_RLIMIT)
+        self.stats = self.queries.stats
+        self.constraints: list[z3.BoolRef] = []
+        self.outcomes: set[str] = set()
+        self.paths = 0
+        self.steps = 0
+        # complete: every path was explored, so the outcomes not found are
+        # impossible; exact: no value was over-approximated, so the outcomes
+        # found are possible.
+        self.complete = True
+        self.exact = True
+        self.fresh = 0
+        self.opcodes: dict[jvm.AbsMethodID, list[jvm.Opcode]] = {}
+
+    def method_opcodes(self, method: jvm.AbsMethodID) -> list[jvm.Opcode] | None:
+        if method not in self.opcodes:
+            try:
+                self.opcodes[method] = list(self.suite.method_opcodes(method))
+            except Exception:
+                self.opcodes[method] = None
+        return self.opcodes[method]
+
+    def symbol(self, name: str) -> z3.BitVecRef:
+        self.fresh += 1
+        return z3.BitVec(f"{name}!{self.fresh}", 32)
+
+    def havoc(self, tt: jvm.Type | None) -> object:
+        """An unknown value of a type."""
+        self.exact = False
+        if isinstance(tt, INT_LIKE):
+            return self.symbol("unknown")
+        return Obj()
+
+    def initial(self) -> State:
+        state = State([Frame(self.methodid, 0, {}, [])])
+        index = 0
+        for i, tt in enumerate(self.methodid.extension.params):
+            match tt:
+                case jvm.Int():
+                    value = z3.BitVec(f"p{i}", 32)
+                case jvm.Boolean():
+                    value = z3.BitVec(f"p{i}", 32)
+                    self.constraints.append(z3.ULE(value, 1))
+                case jvm.Char():
+                    value = z3.BitVec(f"p{i}", 32)
+                    self.constraints.append(z3.ULE(value, 0xFFFF))
+                case jvm.Array(contains=jvm.Int() | jvm.Char() | jvm.Boolean()):
+                    length = z3.BitVec(f"p{i}.length", 32)
+                    self.constraints.append(length >= 0)
+                    contents = z3.Array(f"p{i}", z3.BitVecSort(32), z3.BitVecSort(32))
+                    value = state.allocate(SymArray(length, contents))
+                case jvm.Long() | jvm.Double():
+                    raise Unsupported(f"parameter of type {tt}")
+                case _:
+                    value = Obj()
+            state.frame.locals[index] = value
+            index += 1
+        return state
+
+    def simplify(self, successors: list) -> list:
+        """Drop the successors which are trivially infeasible, and remove the
+        conditions which are trivially true."""
+        live = []
+        for cond, succ in successors:
+            if cond is not None:
+                cond = z3.simplify(cond)
+                if z3.is_false(cond):
+                    self.stats.trivial_branches += 1
+                    continue
+                if z3.is_true(cond):
+                    self.stats.trivial_branches += 1
+                    cond = None
+            live.append((cond, succ))
+        return live
+
+    def check(self, path: tuple, cond: z3.BoolRef) -> bool:
+        """Check if the feasible path is still feasible together with cond."""
+        feasible = self.queries.feasible(path, cond)
+        if feasible is None:
+            # Keep the path, as it might be feasible
+            self.exact = False
+            return True
+        return feasible
+
+    def run(self):
+        try:
+            state = self.initial()
+            self.explore(state, tuple(self.constraints), 0)
+        except Unsupported as e:
+            logger.debug(f"Unsupported: {e}")
+            self.complete = False
+            self.exact = False
+
+    def explore(self, state: State, path: tuple[z3.BoolRef, ...], depth: int):
+        """Explore every path from state, where path is the condition to reach
+        it."""
+        while True:
+            if (
+                self.paths >= MAX_PATHS
+                or self.steps >= MAX_TOTAL_STEPS
+                or self.stats.queries >= MAX_QUERIES
+            ):
+                self.complete = False
+                return
+            if state.steps >= MAX_STEPS:
+                logger.debug(f"Path stopped after {MAX_STEPS} steps")
+                if depth == 0:
+                    # Every branch so far was decided without the solver, so
+                    # the path is the same for all inputs.
+                    self.outcomes.add("*")
+                self.complete = False
+                self.paths += 1
+                return
+            state.steps += 1
+            self.steps += 1
+
+            try:
+                successors = self.simplify(self.step(state))
+            except Unsupported as e:
+                logger.debug(f"Path stopped: {e}")
+                self.complete = False
+                self.paths += 1
+                return
+
+            if not successors:
+                # Only infeasible paths, like a negative array size
+                self.paths += 1
+                return
+            if len(successors) == 1 and successors[0][0] is None:
+                state = successors[0][1]
+                if isinstance(state, str):
+                    self.outcomes.add(state)
+                    self.paths += 1
+                    return
+                continue
+            break
+
+        if depth >= MAX_BRANCHES:
+            logger.debug(f"Path stopped after {MAX_BRANCHES} branches")
+            self.complete = False
+            self.paths += 1
+            return
+
+        for cond, succ in successors:
+            if cond is not None:
+                if not self.check(path, cond):
+                    continue
+                succ_path = path + (cond,)
+            else:
+                succ_path = path
+            if isinstance(succ, str):
+                self.outcomes.add(succ)
+                self.paths += 1
+            else:
+                self.explore(succ, succ_path, depth + 1)
+
+    def step(self, state: State) -> list[tuple[z3.BoolRef | None, State | str]]:
+        """The successors of state, each with the condition to reach it, or
+        None if there is a single successor."""
+        frame = state.frame
+        opcodes = self.method_opcodes(frame.method)
+        opr = opcodes[frame.pc]
+        stack = frame.stack
+
+        def next(state: State = state) -> list:
+            state.frame.pc += 1
+            return [(None, state)]
+
+        match opr:
+            case jvm.Push(value=jvm.Value(type=jvm.Int() | jvm.Boolean(), value=v)):
+                stack.append(bv(int(v)))
+                return next()
+            case jvm.Push(value=jvm.Value(type=jvm.Char(), value=v)):
+                stack.append(bv(ord(v) if isinstance(v, str) else v))
+                return next()
+            case jvm.Push(value=jvm.Value(value=None)):
+                stack.append(None)
+                return next()
+            case jvm.Push(value=jvm.Value(type=jvm.Reference(), value=str())):
+                stack.append(Obj(jvm.ClassName.decode("java/lang/String")))
+                return next()
+            case jvm.Load(index=index):
+                stack.append(frame.locals[index])
+                return next()
+            case jvm.Store(index=index):
+                frame.locals[index] = stack.pop()
+                return next()
+            case jvm.Dup(words=1):
+                stack.append(stack[-1])
+                return next()
+            case jvm.Incr(index=index, amount=amount):
+                frame.locals[index] = frame.locals[index] + amount
+                return next()
+            case jvm.Binary(type=jvm.Int(), operant=operant):
+                b, a = stack.pop(), stack.pop()
+                match operant:
+                    case jvm.BinaryOpr.Add:
+                        stack.append(a + b)
+                    case jvm.BinaryOpr.Sub:
+                        stack.append(a - b)
+                    case jvm.BinaryOpr.Mul:
+                        stack.append(a * b)
+                    case jvm.BinaryOpr.Div | jvm.BinaryOpr.Rem:
+                        # bvsdiv and bvsrem truncate like java, and wrap on
+                        # the overflow of MIN_VALUE / -1.
+                        if operant == jvm.BinaryOpr.Div:
+                            stack.append(a / b)
+                        else:
+                            stack.append(z3.SRem(a, b))
+                        state.frame.pc += 1
+                        return [(b == 0, "divide by zero"), (b != 0, state)]
+                return next()
+            case jvm.Cast(from_=jvm.Int(), to_=to_):
+                v = stack.pop()
+                match to_:
+                    case jvm.Short():
+                        stack.append(z3.SignExt(16, z3.Extract(15, 0, v)))
+                    case jvm.Byte():
+                        stack.append(z3.SignExt(24, z3.Extract(7, 0, v)))
+                    case jvm.Char():
+                        stack.append(z3.ZeroExt(16, z3.Extract(15, 0, v)))
+                    case _:
+                        raise Unsupported(f"cast to {to_}")
+                return next()
+            case jvm.Goto(target=target):
+                frame.pc = target
+                return [(None, state)]
+            case jvm.Ifz(condition=condition, target=target):
+                v = stack.pop()
+                if condition in ("is", "isnot"):
+                    return self.branch_null(state, v, condition == "is", target)
+                return self.branch(state, CONDITIONS[condition](v, bv(0)), target)
+            case jvm.If(condition=condition, target=target):
+                b, a = stack.pop(), stack.pop()
+                if condition in ("is", "isnot"):
+                    same = self.same(a, b)
+                    return self.branch(
+                        state, same if condition == "is" else z3.Not(same), target
+                    )
+                return self.branch(state, CONDITIONS[condition](a, b), target)
+            case jvm.Get(static=True, field=field) if (
+                field.extension.name == "$assertionsDisabled"
+            ):
+                stack.append(bv(0))
+                return next()
+            case jvm.Get(static=static, field=field):
+                if not static:
+                    stack.pop()
+                stack.append(self.havoc(field.extension.type))
+                return next()
+            case jvm.New(classname=classname):
+                stack.append(Obj(classname))
+                return next()
+            case jvm.Throw():
+                match stack.pop():
+                    case None:
+                        return [(None, "null pointer")]
+                    case Obj(classname=cn) if cn and cn.slashed() == ASSERTION_ERROR:
+                        return [(None, "assertion error")]
+                    case exception:
+                        raise Unsupported(f"throwing {exception}")
+            case jvm.NewArray(type=tt, dim=1) if isinstance(tt, INT_LIKE):
+                length = stack.pop()
+                stack.append(
+                    state.allocate(SymArray(length, z3.K(z3.BitVecSort(32), bv(0))))
+                )
+                state.frame.pc += 1
+                # NegativeArraySizeException is not an outcome of the suite
+                return [(length >= 0, state)]
+            case jvm.ArrayLength():
+                ref = stack.pop()
+                if ref is None:
+                    return [(None, "null pointer")]
+                if not isinstance(ref, Ref):
+                    raise Unsupported(f"length of {ref}")
+                stack.append(state.heap[ref.address].length)
+                return next()
+            case jvm.ArrayLoad():
+                index, ref = stack.pop(), stack.pop()
+                return self.access(state, ref, index, None)
+            case jvm.ArrayStore():
+                value, index, ref = stack.pop(), stack.pop(), stack.pop()
+                return self.access(state, ref, index, value)
+            case jvm.InvokeStatic(method=method) | jvm.InvokeSpecial(method=method):
+                args = self.pop_args(stack, method)
+                if isinstance(opr, jvm.InvokeSpecial):
+                    receiver = stack.pop()
+                    if method.extension.name == "<init>" and isinstance(receiver, Obj):
+                        # Constructors of exceptions only set the message
+                        name = receiver.classname.slashed()
+                        if name.endswith(("Error", "Exception")):
+                            return next()
+                    raise Unsupported(f"invoking {method}")
+                return self.call(state, method, args)
+            case (
+                jvm.InvokeVirtual(method=method)
+                | jvm.InvokeInterface(method=method)
+                | jvm.InvokeDynamic(method=method)
+            ):
+                self.pop_args(stack, method)
+                if not isinstance(opr, jvm.InvokeDynamic) and stack.pop() is None:
+                    return [(None, "null pointer")]
+                # The callee may throw, which is not explored
+                self.complete = False
+                if method.extension.return_type is not None:
+                    stack.append(self.havoc(method.extension.return_type))
+                return next()
+            case jvm.Return(type=tt):
+                value = stack.pop() if tt is not None else None
+                if len(state.frames) == 1:
+                    return [(None, "ok")]
+                state.frames.pop()
+                if tt is not None:
+                    state.frame.stack.append(value)
+                return next()
+            case _:
+                raise Unsupported(f"{opr}")
+
+    def branch(self, state: State, cond: z3.BoolRef, target: int) -> list:
+        other = state.copy()
+        state.frame.pc = target
+        other.frame.pc += 1
+        return [(cond, state), (z3.Not(cond), other)]
+
+    def branch_null(self, state: State, v, is_null: bool, target: int) -> list:
+        match v:
+            case None:
+                cond = z3.BoolVal(is_null)
+            case Ref():
+                cond = z3.BoolVal(not is_null)
+            case _:
+                self.exact = False
+                cond = z3.Bool(f"null!{id(v)}")
+        return self.branch(state, cond, target)
+
+    def same(self, a, b) -> z3.BoolRef:
+        if isinstance(a, (Ref, type(None))) and isinstance(b, (Ref, type(None))):
+            return z3.BoolVal(a == b)
+        self.exact = False
+        self.fresh += 1
+        return z3.Bool(f"same!{self.fresh}")
+
+    def access(self, state: State, ref, index, value) -> list:
+        """Load from an array, or store value in it."""
+        if ref is None:
+            return [(None, "null pointer")]
+        if not isinstance(ref, Ref):
+            raise Unsupported(f"array access on {ref}")
+        array = state.heap[ref.address]
+        if value is None:
+            state.frame.stack.append(z3.Select(array.contents, index))
+        else:
+            state.heap[ref.address] = SymArray(
+                array.length, z3.Store(array.contents, index, value)
+            )
+        state.frame.pc += 1
+        inside = z3.And(index >= 0, index < array.length)
+        return [(z3.Not(inside), "out of bounds"), (inside, state)]
+
+    def pop_args(self, stack: list, method: jvm.AbsMethodID) -> list:
+        count = len(method.extension.params)
+        args = stack[len(stack) - count :]
+        del stack[len(stack) - count :]
+        return args
+
+    def call(self, state: State, method: jvm.AbsMethodID, args: list) -> list:
+        """Inline the call, or give up on it if it can not be analysed."""
+        if len(state.frames) < MAX_CALL_DEPTH and self.method_opcodes(method):
+            # The return continues after the call
+            state.frames.append(Frame(method, 0, dict(enumerate(args)), []))
+            return [(None, state)]
+        if any(isinstance(a, (Ref, type(None))) for a in args):
+            raise Unsupported(f"calling {method} with an array")
+        self.complete = False
+        if method.extension.return_type is not None:
+            state.frame.stack.append(self.havoc(method.extension.return_type))
+        state.frame.pc += 1
+        return [(None, state)]
+
+
+def predictions(executor: Executor) -> dict[str, str]:
+    """The likelihood of each outcome, given what the executor found."""
+    result = {}
+    for outcome in ["ok", "divide by zero", "assertion error", "out of bounds"]:
+        found = outcome in executor.outcomes
+        if found:
+            result[outcome] = "95%" if executor.exact else "75%"
+        else:
+            result[outcome] = "5%" if executor.complete else "30%"
+    # Parameters are never null, so null pointers are rarely found
+    result["null pointer"] = "75%" if "null pointer" in executor.outcomes else "10%"
+    # A path running out of steps is only a hint of an infinite loop, and a
+    # weaker one if it uses unknown values
+    if "*" in executor.outcomes:
+        result["*"] = "70%" if executor.exact else "40%"
+    else:
+        result["*"] = "5%" if executor.complete else "20%"
+    return result
+
+
+if __name__ == "__main__":
+    methodid = jpamb.getmethodid(
+        "symbolic",
+        "1.0",
+        "The Rice Theorem Cookers",
+        ["symbolic", "python"],
+        for_science=True,
+    )
+
+    logger.remove()
+    logger.add(sys.stderr, format="[{level}] {message}", level="INFO")
+
+    executor = Executor(jpamb.Suite(), methodid)
+    executor.run()
+    logger.info(
+        f"Explored {executor.paths} paths, found {sorted(executor.outcomes)} "
+        f"({'complete' if executor.complete else 'incomplete'}, "
+        f"{'exact' if executor.exact else 'approximate'})"
+    )
+    logger.info(f"Solver: {executor.stats}")
+    logger.debug(f"Solver time: {executor.stats.timings()}")
+
+    for outcome, likelihood in predictions(executor).items():
+        print(f"{outcome};{likelihood}")
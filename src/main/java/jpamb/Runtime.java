@@ -1,9 +1,16 @@
 package jpamb;
 
+import java.io.BufferedReader;
+import java.io.IOException;
+import java.io.InputStreamReader;
 import java.lang.reflect.*;
 import java.util.ArrayList;
 import java.util.Arrays;
 import java.util.List;
+import java.util.concurrent.ExecutionException;
+import java.util.concurrent.FutureTask;
+import java.util.concurrent.TimeUnit;
+import java.util.concurrent.TimeoutException;
 import java.util.regex.*;
 import java.util.stream.Stream;
 import jpamb.cases.*;
@@ -13,6 +20,13 @@ import jpamb.utils.CaseContent.ResultType;
 /**
  * The runtime method runs a single test-case and print the result or the
  * exeception.
+ *
+ * With --batch it instead reads cases from stdin, one "method input" per
+ * line, and prints "method input -> result" for each, running every case in
+ * a watchdog thread with a timeout. A case that times out cannot be stopped
+ * and keeps using a CPU for the rest of the JVM, so the batch stops after
+ * MAX_STUCK such cases are still running. The caller should then run the
+ * cases without a result in a fresh JVM.
  */
 public class Runtime {
   static List<Class<?>> caseclasses = List.of(
@@ -124,8 +138,81 @@ public class Runtime {
     return rparams;
   }
 
+  static final Pattern METHOD = Pattern.compile("(.*)\\.([^.(]*):\\((.*)\\)(.*)");
+
+  public static Method findMethod(String thecase)
+      throws ClassNotFoundException, NoSuchMethodException {
+    Matcher matcher = METHOD.matcher(thecase);
+    if (!matcher.find()) {
+      throw new RuntimeException("Expected a method id, got " + thecase);
+    }
+    String cls = matcher.group(1);
+    String mth = matcher.group(2);
+    String prams = matcher.group(3);
+    Method m = Class.forName(cls).getMethod(mth, parseMethodSignature(prams));
+    if (!Modifier.isStatic(m.getModifiers())) {
+      throw new RuntimeException("Expected " + thecase + " to be static");
+    }
+    return m;
+  }
+
+  public static ResultType run(Method m, Object[] params) throws IllegalAccessException {
+    System.err.printf("Running %s with %s%n", m, Arrays.toString(params));
+    try {
+      m.invoke(null, params);
+    } catch (InvocationTargetException e) {
+      return ResultType.fromThrowable(e.getCause());
+    }
+    return ResultType.SUCCESS;
+  }
+
+  static final int MAX_STUCK = 4;
+
+  public static String runWithTimeout(
+      String thecase, String input, long timeout, List<Thread> stuck)
+      throws InterruptedException {
+    var task = new FutureTask<ResultType>(() -> run(findMethod(thecase), InputParser.parse(input)));
+    var watched = new Thread(task, thecase + " " + input);
+    watched.setDaemon(true);
+    watched.start();
+    try {
+      return task.get(timeout, TimeUnit.MILLISECONDS).toString();
+    } catch (TimeoutException e) {
+      // Threads cannot be stopped, so a case that does not terminate is left
+      // running in the background, with the lowest priority.
+      watched.setPriority(Thread.MIN_PRIORITY);
+      stuck.add(watched);
+      return ResultType.NON_TERMINATION.toString();
+    } catch (ExecutionException e) {
+      return "error: " + e.getCause();
+    }
+  }
+
+  public static void batch(long timeout) throws IOException, InterruptedException {
+    var reader = new BufferedReader(new InputStreamReader(System.in));
+    var stuck = new ArrayList<Thread>();
+    String line;
+    while ((line = reader.readLine()) != null) {
+      stuck.removeIf(t -> !t.isAlive());
+      if (stuck.size() >= MAX_STUCK) {
+        return;
+      }
+      line = line.strip();
+      if (line.isEmpty()) {
+        continue;
+      }
+      int split = line.indexOf(' ');
+      String thecase = line.substring(0, split);
+      String input = line.substring(split + 1).strip();
+      String result = runWithTimeout(thecase, input, timeout, stuck);
+      System.out.println(thecase + " " + input + " -> " + result);
+      System.out.flush();
+    }
+  }
+
   public static void main(String[] args)
-      throws ClassNotFoundException, NoSuchMethodException, IllegalAccessException {
+      throws ClassNotFoundException, NoSuchMethodException, IllegalAccessException,
+      IOException, InterruptedException {
     if (args.length == 0) {
       var mths = caseclasses.stream().flatMap(c -> Stream.of(c.getMethods())).toList();
       for (Method m : mths) {
@@ -141,28 +228,18 @@ public class Runtime {
       }
       return;
     }
-    String thecase = args[0];
-    Pattern pattern = Pattern.compile("(.*)\\.([^.(]*):\\((.*)\\)(.*)");
-    Matcher matcher = pattern.matcher(thecase);
-    if (matcher.find()) {
-      String cls = matcher.group(1);
-      String mth = matcher.group(2);
-      String prams = matcher.group(3);
-      Method m = Class.forName(cls).getMethod(mth, parseMethodSignature(prams));
-      if (!Modifier.isStatic(m.getModifiers())) {
-        throw new RuntimeException("Expected " + pattern + " to be static");
-      }
-      for (int i = 1; i < args.length; i++) {
-        Object[] params = InputParser.parse(args[i]);
-        System.err.printf("Running %s with %s%n", m, Arrays.toString(params));
-        try {
-          m.invoke(null, params);
-        } catch (InvocationTargetException e) {
-          System.out.println(ResultType.fromThrowable(e.getCause()));
-          return;
-        }
+    if (args[0].equals("--batch")) {
+      batch(args.length > 1 ? Long.parseLong(args[1]) : 2000);
+      System.exit(0);
+    }
+    Method m = findMethod(args[0]);
+    for (int i = 1; i < args.length; i++) {
+      ResultType result = run(m, InputParser.parse(args[i]));
+      if (result != ResultType.SUCCESS) {
+        System.out.println(result);
+        return;
       }
-      System.out.println(ResultType.SUCCESS);
     }
+    System.out.println(ResultType.SUCCESS);
   }
 }
@@ -0,0 +1,17 @@
+import pytest
+
+
+class Opcodes:
+    """A suite with only the opcodes of one method."""
+
+    def __init__(self, opcodes):
+        self.opcodes = opcodes
+
+    def method_opcodes(self, methodid):
+        return self.opcodes
+
+
+@pytest.fixture
+def opcodes_suite():
+    """Make a suite with only the given opcodes."""
+    return Opcodes
@@ -0,0 +1,171 @@
+import json
+import os
+import sys
+
+import pytest
+from click.testing import CliRunner
+
+from jpamb import cli
+
+FAKE_JVM2JSON = """#!{python}
+import json, sys
+from pathlib import Path
+
+source = Path(sys.argv[2])
+with open({log!r}, "a") as f:
+    f.write(str(source) + "\\n")
+if b"broken" in source.read_bytes():
+    sys.exit(1)
+print(json.dumps({{"name": source.stem, "content": source.read_text()}}))
+"""
+
+
+@pytest.fixture
+def workfolder(tmp_path, monkeypatch):
+    bin = tmp_path / "bin"
+    bin.mkdir()
+    tool = bin / "jvm2json"
+    tool.write_text(
+        FAKE_JVM2JSON.format(python=sys.executable, log=str(tmp_path / "log.txt"))
+    )
+    tool.chmod(0o755)
+    monkeypatch.setenv("PATH", f"{bin}{os.pathsep}{os.environ['PATH']}")
+
+    work = tmp_path / "work"
+    classes = work / "target" / "classes" / "jpamb" / "cases"
+    classes.mkdir(parents=True)
+    for name in ["A", "B", "C"]:
+        (classes / f"{name}.class").write_text(name)
+    return work
+
+
+def decompile(work, *args):
+    result = CliRunner().invoke(
+        cli.cli,
+        ["--workdir", str(work), "build", "--local", "--decompile", *args],
+    )
+    log = work.parent / "log.txt"
+    decompiled = log.read_text().splitlines() if log.exists() else []
+    log.unlink(missing_ok=True)
+    return result, sorted(os.path.basename(d) for d in decompiled)
+
+
+def test_decompile_is_incremental(workfolder):
+    result, decompiled = decompile(workfolder, "-j", "2")
+    assert result.exit_code == 0, result.output
+    assert decompiled == ["A.class", "B.class", "C.class"]
+
+    out = workfolder / "target" / "decompiled" / "jpamb" / "cases"
+    assert json.loads((out / "B.json").read_text()) == {"content": "B", "name": "B"}
+
+    result, decompiled = decompile(workfolder)
+    assert result.exit_code == 0 and decompiled == []
+
+    classes = workfolder / "target" / "classes" / "jpamb" / "cases"
+    (classes / "B.class").write_text("B2")
+    (classes / "C.class").unlink()
+    result, decompiled = decompile(workfolder)
+    assert result.exit_code == 0 and decompiled == ["B.class"]
+    assert json.loads((out / "B.json").read_text())["content"] == "B2"
+    assert not (out / "C.json").exists()
+
+    result, decompiled = decompile(workfolder, "--no-incremental")
+    assert decompiled == ["A.class", "B.class"]
+
+
+def test_decompile_retries_failures(workfolder):
+    classes = workfolder / "target" / "classes" / "jpamb" / "cases"
+    (classes / "B.class").write_text("broken")
+
+    result, decompiled = decompile(workfolder, "-j", "3")
+    assert result.exit_code != 0
+    assert decompiled == ["A.class", "B.class", "C.class"]
+
+    (classes / "B.class").write_text("fixed")
+    result, decompiled = decompile(workfolder, "-j", "3")
+    assert result.exit_code == 0 and decompiled == ["B.class"]
+
+
+def test_decompile_fails_a_batch_with_missing_records(workfolder, monkeypatch):
+    # Like a tool that stops after the first classfile of the batch
+    monkeypatch.setattr(cli, "DECOMPILE_BATCH", 'jvm2json -s "$1"; printf "\\036\\n"')
+    result, decompiled = decompile(workfolder, "-j", "1")
+    assert result.exit_code != 0
+    assert decompiled == ["A.class"]
+
+    manifest = workfolder / "target" / "stats" / "decompiled.json"
+    assert json.loads(manifest.read_text())["classes"] == {}
+
+
+FAKE_JAVA = """#!{python}
+import sys
+
+# Pretend every case returns ok, see jpamb.Runtime --batch, but answer in
+# reverse order and stop after {limit} cases, like a runner with stuck cases.
+assert sys.argv[-2] == "--batch"
+with open({log!r}, "a") as f:
+    f.write("java\\n")
+for line in list(sys.stdin)[::-1][:{limit}]:
+    print(line.strip(), "-> ok", flush=True)
+"""
+
+
+def fake_java(workfolder, limit=None):
+    java = workfolder.parent / "bin" / "java"
+    java.write_text(
+        FAKE_JAVA.format(
+            python=sys.executable, log=str(workfolder.parent / "log.txt"), limit=limit
+        )
+    )
+    java.chmod(0o755)
+
+
+@pytest.mark.parametrize("expected, exit_code", [("ok", 0), ("*", 1)])
+def test_build_test_runs_one_jvm(workfolder, expected, exit_code):
+    fake_java(workfolder)
+
+    stats = workfolder / "target" / "stats"
+    stats.mkdir(parents=True)
+    (stats / "cases.txt").write_text(
+        "jpamb.cases.A.f:()V () -> ok\n"
+        f"jpamb.cases.A.g:(I)V (1) -> {expected}\n"
+        "jpamb.cases.B.h:(I)V (2) -> ok\n"
+    )
+
+    result = CliRunner().invoke(
+        cli.cli, ["--workdir", str(workfolder), "build", "--local", "--test"]
+    )
+    assert result.exit_code == exit_code, result.output
+    assert (workfolder.parent / "log.txt").read_text() == "java\n"
+
+
+def test_build_test_reruns_cases_without_a_result(workfolder):
+    fake_java(workfolder, limit=2)
+
+    stats = workfolder / "target" / "stats"
+    stats.mkdir(parents=True)
+    (stats / "cases.txt").write_text(
+        "jpamb.cases.A.f:()V () -> ok\n"
+        "jpamb.cases.A.g:(I)V (1) -> ok\n"
+        "jpamb.cases.B.h:(I)V (2) -> ok\n"
+    )
+
+    result = CliRunner().invoke(
+        cli.cli, ["--workdir", str(workfolder), "build", "--local", "--test"]
+    )
+    assert result.exit_code == 0, result.output
+    assert (workfolder.parent / "log.txt").read_text() == "java\njava\n"
+
+
+def test_build_test_fails_without_any_result(workfolder):
+    fake_java(workfolder, limit=0)
+
+    stats = workfolder / "target" / "stats"
+    stats.mkdir(parents=True)
+    (stats / "cases.txt").write_text("jpamb.cases.A.f:()V () -> ok\n")
+
+    result = CliRunner().invoke(
+        cli.cli, ["--workdir", str(workfolder), "build", "--local", "--test"]
+    )
+    assert result.exit_code == 1
+    assert "jpamb build --compile" in result.output
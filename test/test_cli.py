@@ -18,6 +18,9 @@ solutions = [
     # Path("solutions") / "cheater.py",
     Path("solutions") / "syntaxer.py",
     Path("solutions") / "my_analyzer.py",
+    Path("solutions") / "symbolic.py",
+    Path("solutions") / "fuzzer.py",
+    Path("solutions") / "lanes.py",
 ]
 
 
@@ -63,3 +66,133 @@ def test_interpret_i():
     )
 
     assert result.exit_code == 0
+
+
+@pytest.mark.slow
+def test_interpret_compiled():
+    runner = CliRunner()
+    sol = Path("solutions") / "compiler.py"
+    solreport = Path("test") / "expected" / (sol.stem + ".txt")
+    result = runner.invoke(
+        cli.cli,
+        [
+            "interpret",
+            "--batch",
+            "-r",
+            str(solreport),
+            "--with-python",
+            str(sol),
+        ],
+        catch_exceptions=False,
+    )
+
+    assert result.exit_code == 0
+
+
+BATCH_INTERPRETER = """
+import jpamb
+
+methodid, inputs = jpamb.getcases()
+for input in inputs:
+    print("ok" if input.values else "*")
+"""
+
+
+def test_interpret_batch(tmp_path):
+    sol = tmp_path / "batch.py"
+    sol.write_text(BATCH_INTERPRETER)
+
+    runner = CliRunner()
+    reports = {}
+    for mode in ["--batch", "--no-batch"]:
+        reports[mode] = tmp_path / f"report{mode}.txt"
+        result = runner.invoke(
+            cli.cli,
+            [
+                "interpret",
+                mode,
+                "-f",
+                "Simple",
+                "-r",
+                str(reports[mode]),
+                "-W",
+                str(sol),
+            ],
+            catch_exceptions=False,
+        )
+        assert result.exit_code == 0
+
+    batch = reports["--batch"].read_text().splitlines()
+    single = reports["--no-batch"].read_text().splitlines()
+    assert batch[-1] == single[-1]
+    assert [l for l in batch if "Expected" in l] == [
+        l for l in single if "Expected" in l
+    ]
+
+
+HANGING_INTERPRETER = """
+import time
+import jpamb
+
+methodid, inputs = jpamb.getcases()
+for input in inputs:
+    if not input.values[0].value:
+        time.sleep(60)
+    print("ok", flush=True)
+"""
+
+
+def test_interpret_batch_keeps_results_before_a_timeout(tmp_path):
+    sol = tmp_path / "hanging.py"
+    sol.write_text(HANGING_INTERPRETER)
+
+    runner = CliRunner()
+    reports = {}
+    for mode in ["--batch", "--no-batch"]:
+        reports[mode] = tmp_path / f"report{mode}.txt"
+        result = runner.invoke(
+            cli.cli,
+            [
+                "interpret",
+                mode,
+                "--timeout",
+                "0.5",
+                "-f",
+                "assertBoolean",
+                "-r",
+                str(reports[mode]),
+                "-W",
+                str(sol),
+            ],
+            catch_exceptions=False,
+        )
+        assert result.exit_code == 0
+
+    batch = reports["--batch"].read_text().splitlines()
+    single = reports["--no-batch"].read_text().splitlines()
+    expected = [l for l in single if "Expected" in l]
+    assert [l for l in batch if "Expected" in l] == expected
+    assert any("got '*'" in l for l in expected)
+    # The case after the timeout continues in a new batch, not alone
+    assert sum("┌ Run" in l for l in batch) == 2
+
+
+def test_getcases(monkeypatch, tmp_path):
+    import io
+    import jpamb
+
+    mid = "jpamb.cases.Simple.divideByN:(I)I"
+
+    monkeypatch.setattr("sys.argv", ["prog", mid, "(1)", "(2)"])
+    methodid, inputs = jpamb.getcases()
+    assert str(methodid) == mid
+    assert [i.encode() for i in inputs] == ["(1)", "(2)"]
+
+    monkeypatch.setattr("sys.argv", ["prog", mid, "-"])
+    monkeypatch.setattr("sys.stdin", io.StringIO("(1)\n(2)\n\n"))
+    assert [i.encode() for i in jpamb.getcases()[1]] == ["(1)", "(2)"]
+
+    file = tmp_path / "inputs.txt"
+    file.write_text("(3)\n")
+    monkeypatch.setattr("sys.argv", ["prog", mid, f"@{file}"])
+    assert [i.encode() for i in jpamb.getcases()[1]] == ["(3)"]
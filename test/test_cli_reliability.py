@@ -3,7 +3,10 @@ Reliability tests for the jpamb CLI.
 Tests error handling, timeouts, crashes, and edge cases.
 """
 
+import os
 import pytest
+import subprocess
+import sys
 import tempfile
 import time
 from pathlib import Path
@@ -323,3 +326,42 @@ class TestCheckhealthCommand:
             catch_exceptions=False,
         )
         assert isinstance(result.exit_code, int)
+
+
+class TestResourceUsage:
+    """Test the resource usage collected around analysis runs."""
+
+    def test_measure_reports_usage(self):
+        """Test that cpu time and peak memory are collected for the child."""
+        out, elapsed, usage = cli.measure(
+            [sys.executable, "-c", "print(sum(range(2_000_000)))"], timeout=10
+        )
+        assert out.strip() == str(sum(range(2_000_000)))
+        assert elapsed > 0
+        if usage is None:
+            pytest.skip("resource usage is not supported on this platform")
+        assert usage.cputime == usage.utime + usage.stime
+        assert usage.cputime > 0
+        assert usage.maxrss > 0
+
+    def test_measure_timeout(self):
+        """Test that waiting for the usage still respects the timeout."""
+        with pytest.raises(subprocess.TimeoutExpired):
+            cli.measure(
+                [sys.executable, "-c", "import time; time.sleep(10)"], timeout=0.5
+            )
+
+    @pytest.mark.skipif(not hasattr(os, "wait4"), reason="needs os.wait4")
+    def test_measure_timeout_kills_and_reaps(self):
+        """Test that a child ignoring SIGTERM is killed, and its usage kept."""
+        script = (
+            "import os, signal, time;"
+            "signal.signal(signal.SIGTERM, signal.SIG_IGN);"
+            "print(os.getpid(), flush=True);"
+            "time.sleep(10)"
+        )
+        with pytest.raises(subprocess.TimeoutExpired) as e:
+            cli.measure([sys.executable, "-c", script], timeout=0.5)
+        assert e.value.usage is not None
+        with pytest.raises(ProcessLookupError):
+            os.kill(int(e.value.output), 0)
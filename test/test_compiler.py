@@ -0,0 +1,38 @@
+from jpamb import model
+
+import pytest
+
+import compiler
+import interpreter
+
+CASES = model.Suite().cases
+
+
+def outcome(execute, case, max_steps):
+    try:
+        return execute(case.methodid, case.input, max_steps=max_steps)
+    except Exception as e:
+        return type(e)
+
+
+@pytest.mark.parametrize("max_steps", [1, 7, 100, 10_000])
+def test_compiled_cases_run_like_the_interpreter(max_steps):
+    for case in CASES:
+        assert outcome(compiler.execute, case, max_steps) == outcome(
+            interpreter.execute, case, max_steps
+        ), case
+
+
+def test_compiled_cases_run_out_of_steps_like_the_interpreter():
+    # Around the step where the case ends, one step short of it runs out
+    for case in CASES:
+        try:
+            _, steps = interpreter.run_counted(
+                interpreter.initial_state(case.methodid, case.input), max_steps=10_000
+            )
+        except Exception:
+            continue
+        for max_steps in [steps - 1, steps]:
+            assert outcome(compiler.execute, case, max_steps) == outcome(
+                interpreter.execute, case, max_steps
+            ), (case, max_steps)
@@ -0,0 +1,135 @@
+from functools import reduce
+
+from hypothesis import given, strategies as st
+import pytest
+
+from jpamb import jvm, model
+from jpamb.jvm import arithmetic
+
+from abstract import Analysis
+from domains import DOMAINS, Lengths
+
+LATTICES = {**DOMAINS, "lengths": Lengths()}
+
+INTS = st.integers(arithmetic.INT_MIN, arithmetic.INT_MAX)
+# Small ints, so the values of a lattice often overlap
+SMALL = st.integers(-20, 20)
+
+
+def point(lattice, n):
+    return lattice.restrict(lattice.top(), n, n)
+
+
+def values(lattice):
+    """The joins of a few ranges of the top value, which are reduced."""
+    ranges = st.lists(st.tuples(st.one_of(SMALL, INTS), SMALL), max_size=3)
+    return ranges.map(
+        lambda rs: reduce(
+            lattice.join,
+            [lattice.restrict(lattice.top(), lo, lo + abs(d)) for lo, d in rs],
+            lattice.bottom(),
+        )
+    )
+
+
+def containing(lattice, n):
+    return values(lattice).map(lambda a: lattice.join(a, point(lattice, n)))
+
+
+def contains(lattice, a, n) -> bool:
+    return lattice.leq(point(lattice, n), a)
+
+
+lattices = pytest.mark.parametrize("lattice", LATTICES.values(), ids=LATTICES)
+
+
+@lattices
+@given(data=st.data())
+def test_join_is_an_upper_bound(lattice, data):
+    a, b = data.draw(values(lattice)), data.draw(values(lattice))
+    assert lattice.leq(a, lattice.join(a, b))
+    assert lattice.leq(b, lattice.join(a, b))
+    assert lattice.join(a, b) == lattice.join(b, a)
+
+
+@lattices
+@given(data=st.data())
+def test_leq_agrees_with_join(lattice, data):
+    a, b = data.draw(values(lattice)), data.draw(values(lattice))
+    assert lattice.leq(a, b) == (lattice.join(a, b) == b)
+    assert lattice.leq(lattice.bottom(), a) and lattice.leq(a, lattice.top())
+
+
+@lattices
+@given(data=st.data())
+def test_widen_stabilizes(lattice, data):
+    a = lattice.bottom()
+    changes = 0
+    for b in data.draw(st.lists(values(lattice), max_size=20)):
+        widened = lattice.widen(a, b)
+        assert lattice.leq(a, widened) and lattice.leq(b, widened)
+        changes += widened != a
+        a = widened
+    # Bottom, a value, widened below and above, and the same for a product
+    assert changes <= 6
+
+
+@lattices
+@given(data=st.data(), n=st.one_of(SMALL, INTS))
+def test_bounds_and_restrict_keep_the_ints(lattice, data, n):
+    if isinstance(lattice, Lengths):
+        n = abs(n)
+    a = data.draw(containing(lattice, n))
+    assert contains(lattice, a, n)
+    lo, hi = lattice.bounds(a)
+    assert lo <= n <= hi
+
+    lo, hi = n - data.draw(st.integers(0, 5)), n + data.draw(st.integers(0, 5))
+    assert contains(lattice, lattice.restrict(a, lo, hi), n)
+
+
+products = {name: d for name, d in DOMAINS.items() if "*" in name}
+
+
+@pytest.mark.parametrize("product", products.values(), ids=products)
+@given(data=st.data(), n=st.one_of(SMALL, INTS))
+def test_reduce_keeps_the_ints(product, data, n):
+    a = (
+        data.draw(containing(product.first, n)),
+        data.draw(containing(product.second, n)),
+    )
+    assert contains(product, product.reduce(a), n)
+
+
+SUITE = model.Suite()
+
+
+def unsound(case) -> bool:
+    """The analysis assumes that methods outside the suite, like
+    `String.substring`, do not throw, and does not track taint."""
+    return case.result == "vulnerable" or (
+        case.result == "out of bounds"
+        and case.methodid.extension.name.startswith("assertSubstring")
+    )
+
+
+@pytest.mark.slow
+@pytest.mark.parametrize("domain", DOMAINS.values(), ids=DOMAINS)
+def test_analysis_finds_the_outcome_of_every_case(domain):
+    for case in SUITE.cases:
+        if unsound(case):
+            continue
+        analysis = Analysis(SUITE, values=domain)
+        args = tuple(analysis.const(v) for v in case.input.values)
+        assert case.result in analysis.analyze(case.methodid, args).outcomes, case
+
+
+@pytest.mark.parametrize("domain", DOMAINS.values(), ids=DOMAINS)
+def test_analysis_of_recursion_with_top_arguments_ends(domain):
+    fib = jvm.AbsMethodID.decode("jpamb.cases.Calls.callsAssertFib:(I)V")
+    analysis = Analysis(SUITE, values=domain)
+    args = tuple(analysis.top(tt) for tt in fib.extension.params)
+    assert analysis.analyze(fib, args).outcomes == {"assertion error", "ok"}
+    # Every call of fib, whatever its arguments, is the same recursion
+    assert analysis.analyses < 100
+    assert not analysis.active and not analysis.partial
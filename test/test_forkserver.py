@@ -0,0 +1,91 @@
+import subprocess
+import sys
+
+import pytest
+
+from jpamb import cli, forkserver
+
+pytestmark = pytest.mark.skipif(
+    not forkserver.supported(), reason="fork servers are not supported"
+)
+
+SCRIPT = """
+import os
+import sys
+import time
+
+match sys.argv[1:]:
+    case ["echo", *args]:
+        print(" ".join(args))
+    case ["stdin"]:
+        print(sys.stdin.read().upper(), end="")
+    case ["stderr"]:
+        print("warning", file=sys.stderr)
+    case ["exit", code]:
+        sys.exit(int(code))
+    case ["crash"]:
+        raise RuntimeError("crash")
+    case ["sleep"]:
+        time.sleep(100)
+    case ["where"]:
+        print(os.getcwd(), os.environ.get("JPAMB_TEST"))
+"""
+
+
+@pytest.fixture
+def server(tmp_path):
+    script = tmp_path / "script.py"
+    script.write_text(SCRIPT)
+    with forkserver.ForkServer((sys.executable, str(script))) as server:
+        yield server, (sys.executable, str(script))
+
+
+def test_forkserver_runs_like_a_process(server):
+    server, program = server
+    for cmd in [("echo", "a", "b"), ("exit", "0")]:
+        out, _, usage = cli.measure(program + cmd, server=server)
+        expected, _, _ = cli.measure(program + cmd)
+        assert out == expected
+        assert usage is not None and usage.cputime >= 0
+
+
+def test_forkserver_streams(server):
+    server, program = server
+    stderr = []
+    out, _, _ = cli.measure(program + ("stderr",), logerr=stderr.append, server=server)
+    assert out == "" and stderr == ["warning"]
+
+    with open(__file__) as stdin:
+        out, _, _ = cli.measure(program + ("stdin",), stdin=stdin, server=server)
+    assert out == open(__file__).read().upper()
+
+
+def test_forkserver_failures(server):
+    server, program = server
+    with pytest.raises(subprocess.CalledProcessError) as e:
+        cli.measure(program + ("exit", "3"), server=server)
+    assert e.value.returncode == 3
+
+    with pytest.raises(subprocess.CalledProcessError) as e:
+        cli.measure(program + ("crash",), server=server)
+    assert "RuntimeError: crash" in e.value.stderr
+
+
+def test_forkserver_timeout(server):
+    server, program = server
+    with pytest.raises(subprocess.TimeoutExpired):
+        cli.measure(program + ("sleep",), timeout=0.2, server=server)
+
+    # The server is still usable after a child was killed
+    out, _, _ = cli.measure(program + ("echo", "alive"), server=server)
+    assert out == "alive\n"
+
+
+def test_forkserver_cwd_and_env(server, tmp_path):
+    server, program = server
+    cwd = tmp_path / "cwd"
+    cwd.mkdir()
+    kwargs = dict(cwd=cwd, env={"JPAMB_TEST": "yes"})
+    out, _, _ = cli.measure(program + ("where",), server=server, **kwargs)
+    expected, _, _ = cli.measure(program + ("where",), **kwargs)
+    assert out == expected == f"{cwd} yes\n"
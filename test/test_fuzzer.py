@@ -0,0 +1,31 @@
+from jpamb import jvm, model
+from jpamb.memo import Execution, MemoStore
+
+import fuzzer
+
+DIVIDE = jvm.AbsMethodID.decode("jpamb.cases.Simple.divideByN:(I)I")
+
+
+def fuzzed(memo=None):
+    f = fuzzer.Fuzzer(DIVIDE, memo=memo)
+    reason = f.fuzz(max_steps=2000)
+    return reason, f.runs, f.steps, f.corpus, f.outcomes, f.examples
+
+
+def test_fuzzing_does_not_depend_on_the_memo(tmp_path):
+    expected = fuzzed()
+    assert expected[0] == "step budget"
+
+    with MemoStore(model.Suite(), tmp_path / "memo.db") as memo:
+        # An execution left by another version of the interpreter
+        for i in range(-16, 17):
+            input = model.Input((jvm.Value.int(i),))
+            memo.store(
+                "interpreter",
+                DIVIDE,
+                input,
+                Execution("*", fuzzer.MAX_STEPS, frozenset()),
+            )
+        assert fuzzed(memo) == expected
+        assert fuzzed(memo) == expected
+        assert memo.hits > 0
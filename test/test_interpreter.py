@@ -0,0 +1,64 @@
+from jpamb import jvm, model
+
+import interpreter
+
+SUITE = model.Suite()
+CALLS = [case for case in SUITE.cases if case.methodid.classname.name == "Calls"]
+
+
+def counted(case, max_steps, calls=None):
+    coverage = set()
+    state = interpreter.initial_state(case.methodid, case.input)
+    outcome, steps = interpreter.run_counted(state, coverage, max_steps, calls)
+    return outcome, steps, coverage
+
+
+def test_pure_calls_replay_like_running_them():
+    calls = interpreter.PureCalls(SUITE)
+    # Twice, so the second round replays the calls of the first
+    for _ in range(2):
+        for case in CALLS:
+            for max_steps in [1, 5, 20, 100, 1000, 10_000]:
+                expected = counted(case, max_steps)
+                assert counted(case, max_steps, calls) == expected, (case, max_steps)
+    assert calls.hits > 0
+
+
+def constructs(classname):
+    cn = jvm.ClassName.decode(classname)
+    init = jvm.AbsMethodID.decode(f"{classname}.<init>:()V")
+    return [
+        jvm.New(0, cn),
+        jvm.Dup(1, 1),
+        jvm.InvokeSpecial(2, init, False),
+        jvm.Throw(3),
+    ]
+
+
+def test_only_errors_are_constructed_in_pure_methods(opcodes_suite):
+    method = jvm.AbsMethodID.decode("jpamb.cases.Calls.f:()V")
+    error = interpreter.PureCalls(opcodes_suite(constructs("java/lang/AssertionError")))
+    assert error.pure(method)
+    # The constructor of any other class may read or write the heap
+    other = interpreter.PureCalls(opcodes_suite(constructs("jpamb/cases/Calls")))
+    assert not other.pure(method)
+
+
+def test_calls_are_summarized_soundly():
+    for case in CALLS:
+        analysis = interpreter.Analysis(SUITE)
+        result = interpreter.execute_A(case.methodid, case.input, analysis)
+        assert case.result in result.outcomes, case
+        # Every recursion has reached its fixpoint
+        assert not analysis.active and not analysis.partial
+
+
+def test_recursive_summary_is_a_fixpoint():
+    analysis = interpreter.Analysis(SUITE)
+    fib = jvm.AbsMethodID.decode("jpamb.cases.Calls.fib:(I)I")
+    args = (analysis.top(jvm.Int()),)
+    summary = analysis.summary(fib, args)
+    assert summary.returns
+    # Another round, with the summary of the recursive calls, adds nothing
+    again = analysis.analyze(fib, args).summary
+    assert analysis.join_summaries(summary, again) == summary
@@ -0,0 +1,122 @@
+import ctypes
+from fractions import Fraction
+import math
+import timeit
+
+import pytest
+from hypothesis import given, strategies as st
+
+from jpamb.jvm import arithmetic as ar
+
+ints = st.integers(ar.INT_MIN, ar.INT_MAX)
+longs = st.integers(ar.LONG_MIN, ar.LONG_MAX)
+edges = st.sampled_from([0, 1, -1, 2, -2, ar.INT_MIN, ar.INT_MAX])
+ints = ints | edges
+longs = longs | edges | st.sampled_from([ar.LONG_MIN, ar.LONG_MAX])
+
+
+def c_int(n):
+    return ctypes.c_int32(n).value
+
+
+def c_long(n):
+    return ctypes.c_int64(n).value
+
+
+def java_div(a, b):
+    return math.trunc(Fraction(a, b))
+
+
+@given(ints, ints)
+def test_int_arithmetic(a, b):
+    assert ar.int_add(a, b) == c_int(a + b)
+    assert ar.int_sub(a, b) == c_int(a - b)
+    assert ar.int_mul(a, b) == c_int(a * b)
+    assert ar.int_neg(a) == c_int(-a)
+    if b != 0:
+        assert ar.int_div(a, b) == c_int(java_div(a, b))
+        assert ar.int_rem(a, b) == c_int(a - b * java_div(a, b))
+
+
+@given(longs, longs)
+def test_long_arithmetic(a, b):
+    assert ar.long_add(a, b) == c_long(a + b)
+    assert ar.long_sub(a, b) == c_long(a - b)
+    assert ar.long_mul(a, b) == c_long(a * b)
+    assert ar.long_neg(a) == c_long(-a)
+    if b != 0:
+        assert ar.long_div(a, b) == c_long(java_div(a, b))
+        assert ar.long_rem(a, b) == c_long(a - b * java_div(a, b))
+
+
+@given(ints, st.integers(-100, 100))
+def test_int_shifts(a, s):
+    assert ar.int_shl(a, s) == c_int(a << (s % 32))
+    assert ar.int_shr(a, s) == a >> (s % 32)
+    assert ar.int_ushr(a, s) == c_int(ctypes.c_uint32(a).value >> (s % 32))
+
+
+@given(longs, st.integers(-200, 200))
+def test_long_shifts(a, s):
+    assert ar.long_shl(a, s) == c_long(a << (s % 64))
+    assert ar.long_shr(a, s) == a >> (s % 64)
+    assert ar.long_ushr(a, s) == c_long(ctypes.c_uint64(a).value >> (s % 64))
+
+
+@given(longs)
+def test_conversions(a):
+    assert ar.l2i(a) == c_int(a)
+    assert ar.i2l(ar.l2i(a)) == c_int(a)
+    assert ar.i2b(a) == ctypes.c_int8(a).value
+    assert ar.i2s(a) == ctypes.c_int16(a).value
+    assert ar.i2c(a) == ctypes.c_uint16(a).value
+
+
+def test_narrowing_is_exhaustive():
+    for a in range(-(2**17), 2**17):
+        assert ar.i2b(a) == ctypes.c_int8(a).value
+        assert ar.i2s(a) == ctypes.c_int16(a).value
+        assert ar.i2c(a) == ctypes.c_uint16(a).value
+
+
+def test_java_examples():
+    assert ar.int_add(ar.INT_MAX, 1) == ar.INT_MIN
+    assert ar.int_div(ar.INT_MIN, -1) == ar.INT_MIN
+    assert ar.int_rem(ar.INT_MIN, -1) == 0
+    assert ar.int_div(-7, 2) == -3
+    assert ar.int_rem(-7, 2) == -1
+    assert ar.int_rem(7, -2) == 1
+    assert ar.int_shl(1, 33) == 2
+    assert ar.int_ushr(-1, 28) == 15
+    assert ar.i2s(40000) == -25536
+    assert ar.i2c(-1) == 65535
+    with pytest.raises(ZeroDivisionError):
+        ar.int_div(1, 0)
+
+
+@pytest.mark.slow
+def test_benchmark_against_numpy_scalars():
+    """The values of the interpreter are python ints, so doing the arithmetic
+    with numpy scalars means converting to and from them."""
+    np = pytest.importorskip("numpy")
+    pairs = [(a * 7919 - 2**30, a * 104729 + 1) for a in range(1000)]
+
+    def helpers():
+        for a, b in pairs:
+            ar.int_add(a, b)
+            ar.int_mul(a, b)
+            ar.int_div(a, b)
+            ar.i2s(a)
+
+    def numpy_scalars():
+        for a, b in pairs:
+            int(np.int32(a) + np.int32(b))
+            int(np.int32(a) * np.int32(b))
+            int(np.int32(a) // np.int32(b))
+            int(np.int32(a).astype(np.int16))
+
+    with np.errstate(over="ignore"):
+        fast = min(timeit.repeat(helpers, number=10, repeat=5)) / 10
+        slow = min(timeit.repeat(numpy_scalars, number=10, repeat=5)) / 10
+    # The helpers are several times faster, so twice is a safe margin
+    assert fast * 2 < slow
@@ -0,0 +1,55 @@
+import pytest
+
+from jpamb import jvm, model
+
+from fuzzer import Fuzzer, Unfuzzable
+import interpreter
+import lanes
+
+SUITE = model.Suite()
+
+METHOD = jvm.AbsMethodID.decode("jpamb.cases.Simple.divideByN:(I)I")
+ERROR = jvm.ClassName.decode("java/lang/AssertionError")
+
+
+def test_halves_that_can_not_merge_reconverge(opcodes_suite):
+    # The branch falls through to where the halves reconverge, and the taken
+    # half leaves an object where the other leaves an int
+    opcodes = [
+        jvm.Push(0, jvm.Value.int(7)),
+        jvm.Load(1, jvm.Int(), 0),
+        jvm.Ifz(2, "ne", 4),
+        jvm.Return(3, jvm.Int()),
+        jvm.Store(4, jvm.Int(), 1),
+        jvm.New(5, ERROR),
+        jvm.Goto(6, 3),
+    ]
+    executor = lanes.LaneExecutor(METHOD, suite=opcodes_suite(opcodes))
+    assert executor.ipdom[2] == 3
+
+    inputs = [model.Input((jvm.Value.int(i),)) for i in range(-2, 3)]
+    assert executor.run(inputs) == ["ok"] * len(inputs)
+
+
+def interpreted(methodid, input, max_steps):
+    try:
+        return interpreter.execute(methodid, input, max_steps=max_steps)
+    except Exception:
+        return "unsupported"
+
+
+@pytest.mark.parametrize("max_steps", [20, 300])
+def test_lanes_run_like_the_interpreter(max_steps):
+    for methodid in {case.methodid for case in SUITE.cases}:
+        fuzzer = Fuzzer(methodid)
+        try:
+            inputs = [
+                model.Input(tuple(fuzzer.generate(tt) for tt in fuzzer.params))
+                for _ in range(32)
+            ]
+        except Unfuzzable:
+            continue
+        executor = lanes.LaneExecutor(methodid, max_steps=max_steps, suite=SUITE)
+        assert executor.run(inputs) == [
+            interpreted(methodid, input, max_steps) for input in inputs
+        ], methodid
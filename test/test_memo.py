@@ -0,0 +1,104 @@
+from jpamb import jvm, model
+from jpamb.memo import Execution, MemoStore, method_hash
+
+import pytest
+
+FIB = jvm.AbsMethodID.decode("jpamb.cases.Calls.fib:(I)I")
+DIVIDE = jvm.AbsMethodID.decode("jpamb.cases.Simple.divideByN:(I)I")
+CALLS_FIB = jvm.AbsMethodID.decode("jpamb.cases.Calls.callsAssertFib:(I)V")
+
+
+def inputs(n):
+    return [model.Input((jvm.Value.int(i),)) for i in range(n)]
+
+
+def test_method_hash_follows_calls(tmp_path, monkeypatch):
+    suite = model.Suite()
+    assert method_hash(suite, FIB) == method_hash(suite, FIB)
+    assert method_hash(suite, FIB) != method_hash(suite, DIVIDE)
+
+    before = method_hash(suite, CALLS_FIB)
+    findmethod = suite.findmethod
+
+    def changed(methodid):
+        # The callee returns one opcode earlier
+        method = findmethod(methodid)
+        # The calls in the bytecode name the class with slashes
+        if methodid.extension == FIB.extension:
+            code = method["code"]
+            return {**method, "code": {**code, "bytecode": code["bytecode"][:-1]}}
+        return method
+
+    monkeypatch.setattr(suite, "findmethod", changed)
+    assert method_hash(suite, CALLS_FIB) != before
+    with MemoStore(suite, tmp_path / "memo.db") as store:
+        assert store.hash(CALLS_FIB) == method_hash(suite, CALLS_FIB)
+
+
+def test_store_and_lookup(tmp_path):
+    (input,) = inputs(1)
+    edges = frozenset({((FIB, 0), (FIB, 1)), ((FIB, 1), (DIVIDE, 0))})
+    with MemoStore(model.Suite(), tmp_path / "memo.db") as store:
+        assert store.lookup("interpreter", FIB, input, 100) is None
+        store.store("interpreter", FIB, input, Execution("ok", 10))
+        assert store.lookup("interpreter", FIB, input, 100) == Execution("ok", 10)
+        # Another executor, and not enough steps
+        assert store.lookup("compiler", FIB, input, 100) is None
+        assert store.lookup("interpreter", FIB, input, 9) is None
+        # The coverage was not recorded
+        assert store.lookup("interpreter", FIB, input, 100, coverage=True) is None
+        store.store("interpreter", FIB, input, Execution("ok", 10, edges))
+        assert (
+            store.lookup("interpreter", FIB, input, 10, coverage=True).coverage == edges
+        )
+        assert (store.hits, store.misses) == (2, 4)
+
+    # The executions persist
+    with MemoStore(model.Suite(), tmp_path / "memo.db") as store:
+        assert store.lookup("interpreter", FIB, input, 100) == Execution(
+            "ok", 10, edges
+        )
+
+
+@pytest.mark.parametrize(
+    "max_steps, coverage, answered",
+    [
+        (5, False, True),
+        (10, False, True),
+        (11, False, False),
+        (10, True, True),
+        (5, True, False),
+    ],
+)
+def test_running_out_of_steps(tmp_path, max_steps, coverage, answered):
+    (input,) = inputs(1)
+    with MemoStore(model.Suite(), tmp_path / "memo.db") as store:
+        store.store("interpreter", FIB, input, Execution("*", 10, frozenset()))
+        found = store.lookup("interpreter", FIB, input, max_steps, coverage)
+        assert (found is not None) == answered
+
+
+def test_evicts_least_recently_used(tmp_path):
+    first, *rest = inputs(10)
+    with MemoStore(model.Suite(), tmp_path / "memo.db", max_entries=5) as store:
+        for input in [first, *rest]:
+            store.store("interpreter", FIB, input, Execution("ok", 1))
+        assert store.lookup("interpreter", FIB, first, 1)
+
+    with MemoStore(model.Suite(), tmp_path / "memo.db", max_entries=5) as store:
+        assert [count for _, _, count, _ in store.summary()] == [5]
+        assert store.lookup("interpreter", FIB, first, 1)
+        assert store.lookup("interpreter", FIB, rest[-1], 1)
+        assert not store.lookup("interpreter", FIB, rest[0], 1)
+
+
+def test_clear(tmp_path):
+    (input,) = inputs(1)
+    with MemoStore(model.Suite(), tmp_path / "memo.db") as store:
+        store.store("interpreter", FIB, input, Execution("ok", 1))
+        store.store("interpreter", DIVIDE, input, Execution("divide by zero", 1))
+        store.store("compiler", FIB, input, Execution("ok", 1))
+        assert store.clear(methods=[FIB], executors=["compiler"]) == 1
+        assert store.clear(methods=[FIB]) == 1
+        assert store.clear() == 1
+        assert store.summary() == []
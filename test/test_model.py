@@ -1,4 +1,5 @@
 from jpamb import model, jvm
+from collections import Counter
 from pathlib import Path
 
 import pytest
@@ -35,6 +36,17 @@ def test_checkhealth():
     model.Suite().checkhealth(failfast=True)
 
 
+def test_checkhealth_jobs():
+    suite = model.Suite()
+    sequential = suite.checkhealth()
+    parallel = suite.checkhealth(jobs=2)
+    assert [(r, ok) for r, _, ok in sequential] == [(r, ok) for r, _, ok in parallel]
+
+    quick = suite.checkhealth(quick=True)
+    assert {r for r, _, _ in quick} < {r for r, _, _ in sequential}
+    assert not any(r.startswith("The method") for r, _, _ in quick)
+
+
 def test_classlookup():
     path = Path("../").absolute()
     suite = model.Suite(path)
@@ -47,3 +59,130 @@ def test_classlookup():
         assert suite.sourcefile(cn) in sourcefiles
         assert suite.classfile(cn) in classfiles
         assert suite.decompiledfile(cn) in decompiledfiles
+
+
+def test_decompiled_manifest_is_not_a_class(tmp_path):
+    suite = model.Suite(tmp_path)
+    decompiled = suite.decompiled_folder / "jpamb" / "Runtime.json"
+    decompiled.parent.mkdir(parents=True)
+    decompiled.write_text("{}")
+    suite.decompiled_manifest.parent.mkdir(parents=True, exist_ok=True)
+    suite.decompiled_manifest.write_text("{}")
+    assert list(suite.decompiledfiles()) == [decompiled]
+
+
+def test_decompiled_manifest_checks_the_hashes(tmp_path):
+    import json
+    import os
+
+    suite = model.Suite(tmp_path)
+    cn = jvm.ClassName.decode("jpamb.cases.A")
+    suite.classfile(cn).parent.mkdir(parents=True)
+    suite.classfile(cn).write_text("class")
+    suite.decompiledfile(cn).parent.mkdir(parents=True)
+    suite.decompiledfile(cn).write_text("{}")
+    os.utime(suite.decompiledfile(cn), (0, 0))
+
+    # Without a manifest, the timestamps do not tell whether it changed
+    assert suite._check_decompiled_manifest([cn]) == []
+
+    suite.decompiled_manifest.parent.mkdir(parents=True)
+    suite.decompiled_manifest.write_text(json.dumps({"classes": {cn.encode(): ""}}))
+    assert suite._check_decompiled_manifest([cn]) == [
+        "jpamb.cases.A changed since it was decompiled"
+    ]
+
+
+def test_suite_keeps_cache():
+    suite = model.Suite()
+    cases = suite.cases
+    assert model.Suite().cases is cases, "should not reparse the cases"
+    suite.invalidate_cache()
+    assert suite.cases is not cases
+    assert suite.cases == cases
+
+
+def test_case_index():
+    suite = model.Suite()
+
+    for methodid, results in suite.case_methods():
+        cases = suite.method_cases(methodid)
+        assert {c.result for c in cases} == results
+        assert methodid in suite.class_methods(methodid.classname)
+
+    for case in suite.cases:
+        assert case in suite.class_cases(case.methodid.classname)
+        assert case in suite.result_cases(case.result)
+
+    assert sum(len(suite.result_cases(r)) for r in model.QUERIES) == len(suite.cases)
+
+
+def test_case_query():
+    suite = model.Suite()
+
+    assert suite.query() == suite.cases
+    assert "LOOP" in suite.tags()
+
+    for result in model.QUERIES:
+        assert suite.query(results=[result]) == suite.result_cases(result)
+
+    loops = suite.query(tags=["LOOP"])
+    assert loops, "there should be cases tagged with LOOP"
+    for case in loops:
+        assert "LOOP" in suite.method_tags(case.methodid)
+
+    both = suite.query(tags=["LOOP"], results=["*"])
+    assert set(both) == {c for c in loops if c.result == "*"}
+
+    for methodid, _ in suite.case_methods():
+        assert suite.query(methods=[methodid]) == suite.method_cases(methodid)
+        break
+
+    assert suite.query(tags=["NOT A TAG"]) == ()
+
+
+def test_case_query_stats_the_suite_once(monkeypatch):
+    suite = model.Suite()
+    suite.query()
+    calls = []
+    monkeypatch.setattr(suite, "decompiledfiles", lambda: calls.append(1) or [])
+    suite.query(results=["ok"])
+    suite.tags()
+    assert calls == []
+    suite.invalidate_cache()
+    suite._case_db_stamp()
+    assert calls == [1]
+    suite.invalidate_cache()
+
+
+def test_case_db_builds_at_once(tmp_path):
+    from concurrent.futures import ThreadPoolExecutor
+    from jpamb import casedb
+
+    suite = model.Suite()
+    path = tmp_path / "cases.db"
+    with ThreadPoolExecutor(4) as pool:
+        for future in [
+            pool.submit(casedb.build, path, suite.cases, {}, str(i)) for i in range(8)
+        ]:
+            future.result()
+    assert any(casedb.is_current(path, str(i)) for i in range(8))
+    assert [p.name for p in tmp_path.iterdir()] == ["cases.db"]
+
+
+def test_opcode_histogram():
+    suite = model.Suite()
+    histogram = suite.opcode_histogram()
+    assert suite.opcode_histogram() is histogram, "should only decode once"
+
+    assert set(histogram.by_method) == {m for m, _ in suite.case_methods()}
+    expected = Counter(op.mnemonic() for op in suite.case_opcodes())
+    assert histogram.total() == expected
+    assert set(histogram.examples) == set(expected)
+
+    for cn, mnemonics in histogram.by_class().items():
+        assert mnemonics == {
+            op.mnemonic()
+            for m in suite.class_methods(cn)
+            for op in suite.method_opcodes(m)
+        }
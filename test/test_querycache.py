@@ -0,0 +1,54 @@
+import z3
+
+from querycache import QueryCache
+
+x, y, z, w = z3.Ints("x y z w")
+
+
+def cache():
+    return QueryCache(rlimit=1_000_000)
+
+
+def test_slice_follows_shared_variables():
+    path = (x > 0, y > 0, z > 0, y < w)
+    sliced = cache().slice(path, x < y)
+    assert {c.get_id() for c in sliced} == {
+        c.get_id() for c in (x < y, x > 0, y > 0, y < w)
+    }
+
+
+def test_exact_hit():
+    queries = cache()
+    assert queries.feasible((x > 0,), x < 5)
+    assert queries.feasible((x > 0,), x < 5)
+    assert queries.stats.hits == {"exact": 1}
+    assert queries.stats.solver_calls == 1
+
+
+def test_unsat_core_answers_a_superset():
+    queries = cache()
+    assert not queries.feasible((x > 0,), x < 0)
+    assert queries.lookup(frozenset([(x > 0).get_id()]), [x > 0]) is None
+
+    assert not queries.feasible((x > 0, y > x), x < 0)
+    assert queries.stats.hits == {"unsat core": 1}
+    assert queries.stats.solver_calls == 1
+
+
+def test_model_answers_a_subset():
+    queries = cache()
+    assert queries.feasible((x > 0,), z3.And(x > 5, x < 7))
+
+    assert queries.feasible((x > 0,), x > 5)
+    assert queries.stats.hits == {"model": 1}
+    assert queries.stats.solver_calls == 1
+    assert queries.stats.queries == 2
+
+
+def test_queries_are_sliced_before_the_cache():
+    queries = cache()
+    assert queries.feasible((x > 0,), x < 5)
+    # The constraint on y is not part of the query
+    assert queries.feasible((x > 0, y > 0), x < 5)
+    assert queries.stats.hits == {"exact": 1}
+    assert (queries.stats.constraints, queries.stats.sliced) == (5, 4)
@@ -0,0 +1,96 @@
+import pytest
+from hypothesis import given, strategies as st
+
+from jpamb.shards import Shard, partition, runtimes, summarize, merge
+
+
+def test_shard_roundtrip():
+    assert Shard.decode("2/4") == Shard(2, 4)
+    assert Shard(2, 4).encode() == "2/4"
+
+
+@pytest.mark.parametrize("shard", ["0/4", "5/4", "1", "a/b", "1/2/3"])
+def test_shard_invalid(shard):
+    with pytest.raises(ValueError):
+        Shard.decode(shard)
+
+
+@given(
+    st.sets(st.text(min_size=1), max_size=30),
+    st.integers(min_value=1, max_value=8),
+    st.dictionaries(st.text(min_size=1), st.floats(min_value=0, max_value=1e6)),
+)
+def test_partition_covers_methods(methods, count, weights):
+    shards = partition(methods, count, weights)
+    assert len(shards) == count
+    assert sorted(m for s in shards for m in s) == sorted(methods)
+    assert shards == partition(reversed(sorted(methods)), count, weights)
+
+
+def test_partition_balances_by_weight():
+    weights = {"slow": 10.0, "a": 1.0, "b": 1.0, "c": 1.0, "d": 1.0}
+    assert partition(weights, 2) == [["a", "c", "slow"], ["b", "d"]]
+    assert partition(weights, 2, weights) == [["slow"], ["a", "b", "c", "d"]]
+
+
+def method(score, time, cputime=1.0, maxrss=10, iterations=1):
+    return {
+        "score": score,
+        "time": time,
+        "relative": time / 10,
+        "cputime": cputime,
+        "maxrss": maxrss,
+        "iterations": [{}] * iterations,
+    }
+
+
+def report(**bymethod):
+    return {
+        "info": {"name": "test"},
+        "bymethod": bymethod,
+        **summarize(bymethod),
+        "kernel": "sieve",
+        "calibrations": 1,
+        "drifts": 0,
+    }
+
+
+def test_runtimes():
+    assert runtimes(report(a=method(1, 2.0, iterations=3))) == {"a": 6.0}
+
+
+def test_merge_is_like_single_report():
+    full = report(a=method(1, 2.0), b=method(-1, 4.0, maxrss=20), c=method(0.5, 1.0))
+    merged = merge(
+        [
+            report(c=method(0.5, 1.0)),
+            report(a=method(1, 2.0), b=method(-1, 4.0, maxrss=20)),
+        ],
+        order=["a", "b", "c"],
+    )
+    assert list(merged) == list(full)
+    assert list(merged["bymethod"]) == ["a", "b", "c"]
+    assert merged["score"] == full["score"] == 0.5
+    assert merged["time"] == full["time"]
+    assert merged["maxrss"] == 20
+    assert merged["calibrations"] == 2
+
+
+def test_merge_without_usage():
+    merged = merge([report(a=method(1, 2.0)), report(b=method(1, 2.0, None, None))])
+    assert merged["cputime"] is None and merged["maxrss"] is None
+
+
+def test_merge_reports_from_before_usage():
+    def old(**bymethod):
+        for m in bymethod.values():
+            del m["cputime"], m["maxrss"]
+        return {"info": {"name": "test"}, "bymethod": bymethod}
+
+    merged = merge([old(a=method(1, 2.0)), old(b=method(1, 2.0))])
+    assert merged["cputime"] is None and merged["maxrss"] is None
+
+
+def test_merge_rejects_overlapping_reports():
+    with pytest.raises(ValueError):
+        merge([report(a=method(1, 2.0)), report(a=method(1, 2.0))])
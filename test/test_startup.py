@@ -0,0 +1,50 @@
+"""
+These test, check that importing jpamb and starting the command line tool
+stays fast, by not loading heavy dependencies before they are needed.
+"""
+
+import subprocess
+import sys
+
+import pytest
+
+HEAVY_MODULES = ["matplotlib", "numpy", "yaml", "tree_sitter", "z3", "pandas"]
+
+# The budget in microseconds for the cumulative import time of jpamb,
+# generous enough to not fail on slow CI machines.
+IMPORT_BUDGET = 1_000_000
+
+
+def importtime(*args) -> dict[str, int]:
+    """Run python with -X importtime, and return the cumulative import time
+    of each imported module in microseconds."""
+    res = subprocess.run(
+        [sys.executable, "-X", "importtime", *args],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in res.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+@pytest.mark.parametrize(
+    "args",
+    [
+        ["-c", "import jpamb"],
+        ["-m", "jpamb.cli", "--help"],
+    ],
+    ids=["import jpamb", "jpamb --help"],
+)
+def test_startup_is_lazy(args):
+    times = importtime(*args)
+    assert "jpamb" in times
+    for module in HEAVY_MODULES:
+        assert module not in times, f"{module} should be imported lazily"
+    assert times["jpamb"] < IMPORT_BUDGET, f"importing jpamb took {times['jpamb']}us"
@@ -0,0 +1,58 @@
+import pytest
+
+from jpamb import jvm, model
+
+from symbolic import Executor, predictions
+
+SUITE = model.Suite()
+
+
+def explore(method: str) -> Executor:
+    executor = Executor(SUITE, jvm.AbsMethodID.decode(f"jpamb.cases.{method}"))
+    executor.run()
+    return executor
+
+
+@pytest.mark.parametrize(
+    "method, outcomes",
+    [
+        ("Simple.divideByZero:()I", {"divide by zero"}),
+        ("Simple.divideByN:(I)I", {"divide by zero", "ok"}),
+        # The assertion is only reached when the argument is 0
+        ("Simple.checkBeforeDivideByN:(I)I", {"assertion error", "ok"}),
+        ("Simple.checkBeforeDivideByN2:(I)I", {"ok"}),
+        ("Simple.multiError:(Z)I", {"assertion error", "divide by zero"}),
+        ("Arrays.arraySometimesNull:(I)V", {"null pointer", "out of bounds"}),
+        ("Calls.callsAssertIf:(Z)V", {"assertion error", "ok"}),
+    ],
+)
+def test_executor_finds_every_outcome(method, outcomes):
+    executor = explore(method)
+    assert executor.complete and executor.exact
+    assert executor.outcomes == outcomes
+
+
+def test_executor_reports_a_loop_that_runs_out_of_steps():
+    executor = explore("Loops.forever:()V")
+    assert executor.outcomes == {"*"}
+    assert not executor.complete
+
+
+def test_complete_executions_find_the_outcome_of_every_case():
+    methods = {}
+    for case in SUITE.cases:
+        methods.setdefault(case.methodid, set()).add(case.result)
+    for methodid, results in methods.items():
+        executor = Executor(SUITE, methodid)
+        executor.run()
+        if executor.complete:
+            assert results <= executor.outcomes, methodid
+
+
+def test_executor_finds_outcomes_within_the_budget():
+    # The loop over the array runs out of the budget, but the empty array
+    # already reached the assertion, so it is found on every machine.
+    executor = explore("Arrays.arraySumIsLarge:([I)V")
+    assert not executor.complete
+    assert executor.outcomes == {"assertion error", "ok"}
+    assert predictions(executor)["assertion error"] == "75%"
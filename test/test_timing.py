@@ -0,0 +1,116 @@
+import math
+
+import pytest
+from hypothesis import given, strategies as st
+
+from jpamb.timing import Summary, Calibrator, t95
+
+
+def test_t95_approaches_normal():
+    assert t95(1) == pytest.approx(12.706)
+    assert t95(30) > t95(100) == pytest.approx(1.96)
+
+
+def test_summary_single_sample():
+    s = Summary.of([10.0])
+    assert s.median == s.mean == 10.0
+    assert s.mad == 0
+    assert s.rel_ci == math.inf
+    assert s.to_json()["ci"] is None
+
+
+def test_summary_constant_samples_are_precise():
+    s = Summary.of([5.0, 5.0, 5.0])
+    assert s.ci == (5.0, 5.0)
+    assert s.rel_ci == 0
+
+
+def test_summary_median_and_mad():
+    s = Summary.of([1.0, 2.0, 3.0, 4.0, 100.0])
+    assert s.median == 3.0
+    assert s.mad == 1.0
+
+
+@given(st.lists(st.floats(min_value=1, max_value=1e9), min_size=2, max_size=50))
+def test_summary_ci_contains_mean(samples):
+    s = Summary.of(samples)
+    assert s.ci[0] <= s.mean * (1 + 1e-9) and s.mean <= s.ci[1] * (1 + 1e-9)
+    assert s.rel_ci >= 0
+
+
+class FakeMachine:
+    def __init__(self, speed=100):
+        self.now = 0.0
+        self.speed = speed
+        self.calls = 0
+
+    def clock(self):
+        return self.now
+
+    def sample(self):
+        self.calls += 1
+        return self.speed
+
+
+def test_calibrator_amortizes_samples():
+    m = FakeMachine()
+    c = Calibrator(interval=1.0, sample=m.sample, clock=m.clock)
+    for _ in range(10):
+        c.tick()
+        m.now += 0.25
+    assert m.calls == 3
+    assert c.estimate() == 100
+
+
+def test_calibrator_zero_interval_samples_every_tick():
+    m = FakeMachine()
+    c = Calibrator(interval=0, sample=m.sample, clock=m.clock)
+    for _ in range(4):
+        c.tick()
+    assert m.calls == 4
+
+
+def test_calibrator_detects_drift():
+    m = FakeMachine()
+    c = Calibrator(interval=0, window=3, sample=m.sample, clock=m.clock)
+    for _ in range(3):
+        c.tick()
+    m.speed = 200
+    c.tick()
+    assert c.drifts == 1
+    assert c.estimate() == 200
+    assert len(c.samples) == 1
+
+
+def test_kernels():
+    from jpamb import timer
+
+    assert timer.sieve(1000) == 7919
+    assert timer.chase(1000, 1000) == 0, (
+        "should follow a single cycle back to the start"
+    )
+    assert timer.chase(10) != 0
+    assert timer.branchy(10) == 0 + 1 + 7 + 2 + 5 + 8 + 16 + 3 + 19
+    assert timer.allocate(100) == 100
+
+
+def test_profile_fingerprint():
+    from jpamb.timing import profile, KERNELS
+
+    fp = profile(repeat=1)
+    assert set(fp["kernels"]) == set(KERNELS)
+    assert all(t > 0 for t in fp["kernels"].values())
+
+
+def test_calibrator_nearest_is_the_latest_sample():
+    m = FakeMachine()
+    c = Calibrator(interval=0, window=3, sample=m.sample, clock=m.clock)
+    for speed in [100, 110, 105]:
+        m.speed = speed
+        c.tick()
+    assert c.nearest() == 105
+    assert c.estimate() == 105
+    m.speed = 120
+    c.tick()
+    assert c.nearest() == 120
+    assert c.estimate() == 110
@@ -0,0 +1,131 @@
+import json
+import os
+from pathlib import Path
+
+from jpamb.workqueue import WorkQueue
+
+
+def test_queue_roundtrip(tmp_path):
+    queue = WorkQueue(tmp_path / "queue")
+    queue.setup({"setting": 1})
+    assert queue.config() == {"setting": 1}
+
+    for i in range(3):
+        queue.enqueue(f"{i:05d}", {"task": i})
+    assert queue.remaining() == 3
+
+    claimed = []
+    while task := queue.claim():
+        claimed.append(task)
+    assert claimed == [(f"{i:05d}", {"task": i}) for i in range(3)]
+    assert queue.remaining() == 3, "claimed tasks are not done"
+
+    for name, task in reversed(claimed):
+        queue.complete(name, {"result": task["task"] * 2})
+    assert queue.remaining() == 0
+    assert list(queue.results()) == [(f"{i:05d}", {"result": i * 2}) for i in range(3)]
+
+
+def test_queue_claims_once(tmp_path):
+    queue = WorkQueue(tmp_path)
+    queue.setup({})
+    queue.enqueue("task", {})
+
+    other = WorkQueue(tmp_path)
+    assert queue.claim() == ("task", {})
+    assert other.claim() is None
+
+
+def test_queue_requeues_stale_claims(tmp_path):
+    queue = WorkQueue(tmp_path)
+    queue.setup({})
+    queue.enqueue("stale", {})
+    queue.enqueue("fresh", {})
+    queue.claim()
+    queue.claim()
+
+    old = queue.claimed_folder / "stale.json"
+    os.utime(old, (0, 0))
+
+    assert queue.requeue(lease=60) == ["stale"]
+    assert queue.claim() == ("stale", {})
+    assert queue.requeue(lease=60) == []
+
+
+def test_queue_setup_clears_old_tasks(tmp_path):
+    queue = WorkQueue(tmp_path)
+    queue.setup({})
+    queue.enqueue("old", {})
+    queue.setup({})
+    assert queue.claim() is None
+
+
+def test_queue_claim_is_fresh(tmp_path):
+    queue = WorkQueue(tmp_path)
+    queue.setup({}, {"task": {}})
+    os.utime(queue.todo_folder / "task.json", (0, 0))
+    assert queue.claim() == ("task", {})
+    assert queue.requeue(lease=60) == [], "a task enqueued long ago was just claimed"
+
+
+def test_queue_skips_tasks_claimed_after_the_glob(tmp_path, monkeypatch):
+    queue = WorkQueue(tmp_path)
+    queue.setup({}, {"a": {"task": "a"}, "b": {"task": "b"}})
+
+    glob = Path.glob
+
+    def claimed_by_another(self, pattern):
+        files = list(glob(self, pattern))
+        # Another worker claims the first task between the glob and the claim
+        files[0].rename(queue.claimed_folder / files[0].name)
+        return files
+
+    monkeypatch.setattr(Path, "glob", claimed_by_another)
+    assert queue.claim() == ("b", {"task": "b"})
+    monkeypatch.undo()
+
+    assert not (queue.todo_folder / "a.json").exists()
+    with open(queue.claimed_folder / "a.json") as f:
+        assert json.load(f) == {"task": "a"}
+
+
+def test_queue_setup_writes_the_config_last(tmp_path):
+    queue = WorkQueue(tmp_path)
+    assert not queue.ready()
+    queue.setup({"setting": 1}, {"a": {"task": 1}, "b": {"task": 2}})
+    assert queue.ready()
+    assert queue.remaining() == 2
+    config = queue.config_file.stat().st_mtime_ns
+    assert all(f.stat().st_mtime_ns <= config for f in queue.todo_folder.iterdir())
+
+
+def test_worker_waits_for_the_queue(tmp_path):
+    from threading import Timer
+
+    from click.testing import CliRunner
+
+    from jpamb import cli
+
+    folder = tmp_path / "queue"
+    runner = CliRunner()
+    result = runner.invoke(cli.cli, ["worker", "--queue", str(folder)])
+    assert result.exit_code != 0 and "No queue" in result.output
+
+    config = {
+        "program": ["true"],
+        "timeout": 1.0,
+        "iterations": 1,
+        "adaptive": False,
+        "precision": 0.1,
+        "max_iterations": 1,
+        "max_time": 1.0,
+        "kernel": "sieve",
+        "calibration_interval": 1.0,
+    }
+    timer = Timer(0.2, lambda: WorkQueue(folder).setup(config))
+    timer.start()
+    result = runner.invoke(
+        cli.cli, ["worker", "--queue", str(folder), "--wait", "--poll", "0.05"]
+    )
+    timer.join()
+    assert result.exit_code == 0, result.output